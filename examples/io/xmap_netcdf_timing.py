@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+time decoding xMAP mapping buffers from netCDF files, as written
+for each row of an XRF map, for full spectra and ROI mapping modes
+"""
+import os
+import time
+import tempfile
+import numpy as np
+from scipy.io import netcdf_file
+from larch.io import read_xrf_netcdf
+
+MODPIXS = 124
+
+def write_xmap(fname, narrays, nmodules=1, mapmode=1, nchans=2048):
+    "write narrays full buffers of random xMAP data"
+    blocksize = 256 + 4*nchans if mapmode == 1 else 256
+    buffersize = 256 + MODPIXS*blocksize
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 2**12, size=(narrays, nmodules, buffersize)).astype(np.int16)
+    data[:, :, 0:4] = [0x55aa, 0xaa55, 256, mapmode]
+    data[:, :, 8] = MODPIXS
+    data[:, :, 9:11] = 0
+    data[:, :, 20:24] = nchans
+    pixels = data[:, :, 256:].reshape(narrays, nmodules, MODPIXS, blocksize)
+    pixels[..., 3] = mapmode
+    pixels[..., 8:12] = nchans
+    with netcdf_file(fname, 'w') as fh:
+        fh.createDimension('narrays', narrays)
+        fh.createDimension('nmodules', nmodules)
+        fh.createDimension('buffersize', buffersize)
+        var = fh.createVariable('array_data', 'h', ('narrays', 'nmodules', 'buffersize'))
+        var[:] = data
+
+tmpdir = tempfile.mkdtemp()
+for label, narrays, nmodules, mapmode, nchans in (('full spectra', 8, 1, 1, 2048),
+                                                  ('full spectra', 16, 2, 1, 2048),
+                                                  ('ROIs', 200, 1, 2, 16)):
+    fname = os.path.join(tmpdir, 'xmap.nc')
+    write_xmap(fname, narrays, nmodules=nmodules, mapmode=mapmode, nchans=nchans)
+    size = os.stat(fname).st_size / 2.0**20
+    nrepeat = 10
+    t0 = time.time()
+    for i in range(nrepeat):
+        xmapdat = read_xrf_netcdf(fname)
+    dt = (time.time() - t0) / nrepeat
+    print('%-12s %d modules: %7.1f Mb, %6d pixels in %6.1f msec: %7.1f Mb/s, %9.0f pixels/s' %
+          (label, nmodules, size, xmapdat.numPixels, 1000*dt, size/dt, xmapdat.numPixels/dt))
+    os.unlink(fname)
+os.rmdir(tmpdir)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+time calculating XRD structure factors for all CIFs in the
+bundled AMCSD database
+"""
+import os
+import time
+import numpy as np
+from larch.xrd import xrd_cif
+from larch.xrd.cifdb import get_cifdb
+
+dbname = os.path.join(os.path.dirname(xrd_cif.__file__), 'amcsd_cif0.db')
+cifdb = get_cifdb(dbname=dbname)
+ciftexts = [row.cif for row in cifdb.query(cifdb.ciftbl).all()]
+
+t0 = time.time()
+cifs = [xrd_cif.create_xrdcif(text=text) for text in ciftexts]
+t1 = time.time()
+npeaks, nfail = 0, 0
+for cif in cifs:
+    try:
+        sfact = cif.structure_factors(wavelength=1.0, qmin=0.2, qmax=10.2)
+    except Exception:   # unknown elements
+        nfail += 1
+        continue
+    npeaks += len(sfact.q)
+t2 = time.time()
+nq = sum(len(cif.calc_q()) for cif in cifs)
+t3 = time.time()
+
+print('Read %d CIFs in %.3f sec (%d without structure factors)' %
+      (len(cifs), t1-t0, nfail))
+print('structure_factors: %.3f sec (%d peaks, %.2f msec per CIF)' %
+      (t2-t1, npeaks, 1000*(t2-t1)/len(cifs)))
+print('calc_q:            %.3f sec (%d q values, %.2f msec per CIF)' %
+      (t3-t2, nq, 1000*(t3-t2)/len(cifs)))
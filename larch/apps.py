@@ -222,6 +222,28 @@ def run_larch_server():
     from .xmlrpc_server import larch_server_cli
     larch_server_cli()
 
+PROFILE_STARTUP = """
+import time
+t0 = time.perf_counter()
+import larch
+t1 = time.perf_counter()
+_larch = larch.Interpreter()
+t2 = time.perf_counter()
+print('Larch startup times (sec):')
+print(f'  {"import larch":28s} {t1-t0:8.3f}')
+print(f'  {"create Interpreter":28s} {t2-t1:8.3f}')
+print('load on first use (including imports not already done):')
+for modname in list(_larch.lazy_builtins):
+    t0 = time.perf_counter()
+    _larch.load_builtins(modname)
+    print(f'  {modname:28s} {time.perf_counter()-t0:8.3f}')
+"""
+
+def profile_startup():
+    """print times to import larch, create an Interpreter, and load
+    each core module of builtins, measured in a new Python process"""
+    check_call([sys.executable, '-c', PROFILE_STARTUP])
+
 ## main larch cli or wxgui
 def run_larch():
     """
@@ -258,6 +280,10 @@ def run_larch():
     parser.add_argument("-p", "--port", dest="port", default='4966',
                         help="port number for remote server")
 
+    parser.add_argument("--profile-startup", dest="profile_startup",
+                        action="store_true", default=False,
+                        help="show times for startup and loading builtins")
+
     parser.add_argument('scripts', nargs='*',
                         help='larch or python scripts to run on startup')
 
@@ -269,6 +295,10 @@ def run_larch():
             print(vinfo.message)
         return
 
+    if args.profile_startup:
+        profile_startup()
+        return
+
     with_wx = HAS_WXPYTHON and (not args.nowx)
 
     # create desktop icons
@@ -12,19 +12,11 @@ from .larchlib import parse_group_args, Journal
 from .symboltable import isgroup as sym_isgroup
 from .version import show_version
 
-from . import math
-from . import io
-from . import fitting
-from . import xray
-from . import xrf
-from . import xafs
-from . import xrd
-from . import xrmmap
 from . import wxlib
 
 from .utils import physical_constants
 
-__core_modules = [math, fitting, io, xray, xrf, xafs, xrd, xrmmap, wxlib]
+__core_modules = [wxlib]
 
 try:
     from . import epics
@@ -337,6 +329,107 @@ _main_builtins.update(utils._larch_builtins)
 _main_builtins.update(show_builtins)
 
 
+# builtin symbols of core modules that are imported only when one of
+# their symbols is first used, as {module: {group: names}}.  These
+# must match the module's _larch_builtins (and any symbols set by its
+# _larch_init), and later modules override earlier ones.
+lazy_builtins = {
+    'larch.math': {
+        '_math': (
+            'as_ndarray', 'boxcar', 'breit_wigner', 'complex_phase',
+            'damped_oscillator', 'deriv', 'doniach', 'erf', 'erfc', 'expgaussian',
+            'fit_peak', 'gammaln', 'gaussian', 'glinbroad', 'gridxyz',
+            'groups2matrix', 'hypermet', 'index_nearest', 'index_of', 'interp',
+            'interp1d', 'lasso_predict', 'lasso_train', 'lincombo_fit',
+            'lincombo_fit_batch', 'lincombo_fitall', 'linregress', 'logistic',
+            'lognormal', 'lorentzian', 'nmf_train', 'pca_fit', 'pca_fit_batch',
+            'pca_train', 'pca_train_array', 'pearson7', 'pls_predict', 'pls_train',
+            'polyfit', 'pvoigt', 'read_pca_model', 'realimag', 'remove_dups',
+            'remove_nans2', 'save_pca_model', 'savitzky_golay', 'skewed_voigt',
+            'smooth', 'spline_eval', 'spline_rep', 'students_t', 'voigt', 'wofz'),
+        '_math.transforms': (
+            'affine_matrix_from_points', 'angle_between_vectors', 'clip_matrix',
+            'compose_matrix', 'decompose_matrix', 'euler_from_matrix',
+            'euler_from_quaternion', 'euler_matrix', 'identity_matrix',
+            'inverse_matrix', 'orthogonalization_matrix', 'projection_from_matrix',
+            'projection_matrix', 'quaternion_about_axis', 'quaternion_conjugate',
+            'quaternion_from_euler', 'quaternion_from_matrix', 'quaternion_imag',
+            'quaternion_inverse', 'quaternion_matrix', 'quaternion_multiply',
+            'quaternion_real', 'quaternion_slerp', 'reflection_from_matrix',
+            'reflection_matrix', 'rotation_from_matrix', 'rotation_matrix',
+            'scale_from_matrix', 'scale_matrix', 'shear_from_matrix',
+            'shear_matrix', 'superimposition_matrix', 'translation_from_matrix',
+            'translation_matrix', 'unit_vector', 'vector_norm', 'vector_product')},
+    'larch.fitting': {
+        '_math': (
+            'BreitWignerModel', 'ComplexConstantModel', 'ConstantModel',
+            'DampedHarmonicOscillatorModel', 'DampedOscillatorModel',
+            'DoniachModel', 'ExponentialGaussianModel', 'ExponentialModel',
+            'ExpressionModel', 'GaussianModel', 'Interpreter', 'LinearModel',
+            'LognormalModel', 'LorentzianModel', 'MoffatModel', 'ParabolicModel',
+            'Parameter', 'Parameters', 'Pearson7Model', 'PolynomialModel',
+            'PowerLawModel', 'PseudoVoigtModel', 'QuadraticModel',
+            'RectangleModel', 'SkewedGaussianModel', 'StepModel', 'StudentsTModel',
+            'VoigtModel', 'chi2_map', 'confidence_intervals', 'confidence_report',
+            'f_test', 'fit_report', 'guess', 'is_param', 'isparam',
+            'lm_load_model', 'lm_load_modelresult', 'lm_minimize', 'lm_save_model',
+            'lm_save_modelresult', 'minimize', 'param', 'param_group', 'ufloat')},
+    'larch.io': {
+        '_io': (
+            'asciikeys', 'clear_parse_cache', 'clear_session', 'create_athena',
+            'export_modelresult', 'extract_athenagroup', 'fix_filename',
+            'fix_varname', 'get_timestamp', 'groups2csv', 'gsescan_dtcorrect',
+            'gsexdi_deadtime_correct', 'guess_filereader', 'h5file', 'h5group',
+            'increment_filename', 'load_session', 'look_for_nans', 'merge_groups',
+            'nativepath', 'netcdf_file', 'netcdf_group', 'new_dirname',
+            'new_filename', 'parse_cache_info', 'pathOf', 'read_ascii',
+            'read_ascii_chunks', 'read_athena', 'read_csv', 'read_fdmnes',
+            'read_groups', 'read_gsemca', 'read_gsescan', 'read_gsexdi',
+            'read_mda', 'read_session', 'read_specfile', 'read_stepscan',
+            'read_tiff', 'read_xdi', 'read_xrd_hdf5', 'read_xrd_netcdf',
+            'read_xrf_netcdf', 'read_xsp3_hdf5', 'save_groups', 'save_session',
+            'set_array_labels', 'set_parse_cache', 'specfile', 'str2rng',
+            'strip_quotes', 'unixpath', 'winpath', 'write_ascii', 'write_group')},
+    'larch.xray': {
+        '_xray': (
+            'add_material', 'atomic_density', 'atomic_mass', 'atomic_number',
+            'atomic_symbol', 'chantler_energies', 'chemparse', 'ck_probability',
+            'coherent_xsec', 'core_width', 'f0', 'f0_ions', 'f1_chantler',
+            'f2_chantler', 'fluo_yield', 'fluor_yield', 'get_material',
+            'guess_edge', 'incoherent_xsec', 'material_add', 'material_get',
+            'material_mu', 'material_mu_components', 'mu_chantler', 'mu_elam',
+            'xray_delta_beta', 'xray_edge', 'xray_edges', 'xray_line',
+            'xray_lines', '_atomic_symbols', '_materials', '_xraydb')},
+    'larch.xrf': {
+        '_xrf': (
+            'create_mca', 'create_roi', 'xrf_background', 'xrf_calib_apply',
+            'xrf_calib_compute', 'xrf_calib_fitrois', 'xrf_calib_init_roi',
+            'xrf_fitresult', 'xrf_model', 'xrf_peak')},
+    'larch.xafs': {
+        '_xafs': (
+            'autobk', 'autobk_batch', 'cauchy_wavelet', 'diffkk', 'estimate_noise',
+            'etok', 'feff6l', 'feff8_xafs', 'feff8l', 'feffit', 'feffit_dataset',
+            'feffit_report', 'feffit_transform', 'feffpath', 'feffrunner',
+            'ff2chi', 'find_e0', 'fluo_corr', 'ftwindow', 'get_feff_pathinfo',
+            'gnxas', 'guess_energy_units', 'ktoe', 'mback', 'mback_norm',
+            'path2chi', 'pre_edge', 'pre_edge_baseline', 'prepeaks_fit',
+            'prepeaks_setup', 'rebin_xafs', 'sigma2_debye', 'sigma2_eins',
+            'sort_xafs', 'use_feffpath', 'xas_convolve', 'xas_deconvolve', 'xftf',
+            'xftf_fast', 'xftf_prep', 'xftr', 'xftr_fast', '_feff8_executable',
+            '_feff_executable')},
+    'larch.xrd': {
+        '_xrd': (
+            'E_from_lambda', 'cif_match', 'create_xrd', 'create_xrd1d', 'd_from_q',
+            'd_from_twth', 'find_cifs', 'generate_hkl', 'get_amscifdb', 'get_cif',
+            'get_cifdb', 'instrumental_fit_uvw', 'integrate_xrd', 'lambda_from_E',
+            'peakfilter', 'peakfinder', 'peakfitter', 'peaklocater', 'q_from_d',
+            'q_from_twth', 'read_cif', 'twth_from_d', 'twth_from_q',
+            'xrd_background', 'xy_file_reader')},
+    'larch.xrmmap': {
+        '_io': (
+            'process_mapfolder', 'read_xrmmap')},
+}
+
 # names to fill in the larch namespace at startup
 init_builtins = dict(_builtin=_main_builtins)
 
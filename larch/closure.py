@@ -30,7 +30,7 @@ class Closure(object):
             self.__name__ = self.func.__name__
 
         self._larch = None
-        argspec = inspect.getfullargspec(self.func)
+        argspec = inspect.getfullargspec(inspect.unwrap(self.func))
         self._haskwargs  = argspec.varkw is not None
         self._hasvarargs = argspec.varargs is not None
         self._argvars    = argspec.args
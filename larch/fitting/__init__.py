@@ -89,10 +89,10 @@ class ParameterGroup(Group):
             val.skip = skip
         elif hasattr(self, '__params__') and not name.startswith('__'):
             self.__params__._asteval.symtable[name] = val
-        self.__dict__[name] = val
+        Group.__setattr__(self, name, val)
 
     def __delattr__(self, name):
-        self.__dict__.pop(name)
+        Group.__delattr__(self, name)
         if name in self.__params__:
             self.__params__.pop(name)
 
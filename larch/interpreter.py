@@ -10,11 +10,13 @@ import os
 import sys
 import types
 import ast
+import importlib
 import math
 import numpy
+from collections import OrderedDict
 
 from . import site_config
-from .symboltable import SymbolTable, Group, isgroup
+from .symboltable import SymbolTable, Group, LazyGroup, isgroup
 from .inputText import InputText, BLANK_TEXT
 from .larchlib import (LarchExceptionHolder, ReturnedNone,
                        Procedure, StdWriter)
@@ -60,6 +62,47 @@ OPERATORS = {
     ast.UAdd:   lambda a: +a,
     ast.USub:   lambda a: -a}
 
+# expression nodes that can be lowered to Python code objects: operators,
+# subscripts, and attributes of names and constants, but not calls,
+# comprehensions, or anything that assigns to or deletes a symbol.
+LOWERABLE_NODES = (ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare,
+                   ast.IfExp, ast.Subscript, ast.Slice, ast.Attribute,
+                   ast.Name, ast.Constant, ast.Tuple, ast.List,
+                   ast.operator, ast.unaryop, ast.boolop, ast.cmpop,
+                   ast.Load)
+
+LOWERABLE_TOPNODES = (ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare,
+                      ast.IfExp, ast.Subscript, ast.Attribute)
+
+# number of times an expression is run before it is lowered
+LOWER_AFTER = 2
+
+def lowerable(node):
+    """whether an expression node can be lowered to a code object"""
+    if not isinstance(node, LOWERABLE_TOPNODES):
+        return False
+    for tnode in ast.walk(node):
+        if not isinstance(tnode, LOWERABLE_NODES):
+            return False
+        if isinstance(tnode, ast.Compare) and len(tnode.ops) > 1:
+            return False  # chained comparisons differ for arrays
+        if isinstance(tnode, ast.Attribute) and tnode.attr in UNSAFE_ATTRS:
+            return False
+        ctx = getattr(tnode, 'ctx', None)
+        if ctx is not None and not isinstance(ctx, ast.Load):
+            return False
+        if not hasattr(tnode, 'lineno') and isinstance(tnode, ast.expr):
+            return False  # not from parse(), as for augmented assignment
+    return True
+
+def lower_expr(node):
+    """lower an expression node to (code object, names used)"""
+    code = compile(ast.Expression(body=node), '<larch>', 'eval')
+    names = tuple(set(tnode.id for tnode in ast.walk(node)
+                      if isinstance(tnode, ast.Name)))
+    return code, names
+
+
 PYTHON_RESERVED_WORDS = ('and', 'as', 'assert', 'break', 'class',
                          'continue', 'def', 'del', 'elif', 'else',
                          'except', 'exec', 'finally', 'for', 'from',
@@ -82,6 +125,13 @@ class Interpreter:
       Exec, Lambda, Class, Global, Generators, Yield, Decorators
 
   In addition, Function is greatly altered so as to allow a Larch procedure.
+
+  Parsed statements are kept in an LRU cache (of size maxcache) keyed by
+  their text.  Expressions that use only operators, subscripts, and
+  attributes are lowered to Python code objects once they are run again,
+  as in loops and procedures.  If a lowered expression raises an
+  exception, it is re-run node-by-node so that errors are reported the
+  same way.
   """
 
     supported_nodes = ('arg', 'assert', 'assign', 'attribute', 'augassign',
@@ -97,7 +147,7 @@ class Interpreter:
                        'unaryop', 'while')
 
     def __init__(self, symtable=None, input=None, writer=None,
-                 historyfile=None, maxhistory=5000):
+                 historyfile=None, maxhistory=5000, maxcache=2000):
         self.symtable   = symtable or SymbolTable(larch=self)
 
         self.input      = input or InputText(_larch=self,
@@ -112,6 +162,8 @@ class Interpreter:
         self.func       = None
         self.fname      = '<stdin>'
         self.lineno     = 0
+        self.maxcache   = maxcache
+        self.parse_cache = OrderedDict()
         builtingroup    = self.symtable._builtin
         mathgroup       = self.symtable._math
         setattr(mathgroup, 'j', 1j)
@@ -141,20 +193,29 @@ class Interpreter:
             setattr(mathgroup, name, value)
 
         core_groups = ['_main', '_sys', '_builtin', '_math']
+        # register symbols of core modules, to be imported on first use
+        self.lazy_builtins = {}
+        for modname, groups in builtins.lazy_builtins.items():
+            for groupname, names in groups.items():
+                if '.' in groupname:
+                    groupname, subgroup = groupname.split('.', 1)
+                    names = (subgroup,)
+                if groupname not in core_groups:
+                    core_groups.append(groupname)
+                if self.symtable.has_group(groupname):
+                    group = getattr(self.symtable, groupname, None)
+                else:
+                    group = self.symtable.set_symbol(groupname,
+                                                     value=LazyGroup(name=groupname))
+                group._lazy_add(names, modname, self.load_builtins)
+                groupnames = self.lazy_builtins.setdefault(modname, [])
+                if groupname not in groupnames:
+                    groupnames.append(groupname)
+
         for groupname, entries in builtins.init_builtins.items():
             if groupname not in core_groups:
                 core_groups.append(groupname)
-            if self.symtable.has_group(groupname):
-                group = getattr(self.symtable, groupname, None)
-            else:
-                group = self.symtable.set_symbol(groupname,
-                                                 value=Group(__name__=groupname))
-            for fname, fcn in list(entries.items()):
-                if callable(fcn):
-                    setattr(group, fname,
-                            Closure(func=fcn, _larch=self, _name=fname))
-                else:
-                    setattr(group, fname, fcn)
+            self.add_builtins(groupname, entries)
 
         self.symtable._sys.core_groups = core_groups
         self.symtable._fix_searchGroups(force=True)
@@ -178,6 +239,55 @@ class Interpreter:
                                    for node in self.supported_nodes))
 
 
+    def add_builtins(self, groupname, entries):
+        """add builtin symbols to a group, creating the group if needed.
+        callable entries are wrapped as Closures of this interpreter"""
+        if self.symtable.has_group(groupname):
+            group = getattr(self.symtable, groupname, None)
+        else:
+            group = self.symtable.set_symbol(groupname,
+                                             value=Group(__name__=groupname))
+        for fname, fcn in list(entries.items()):
+            if callable(fcn):
+                setattr(group, fname,
+                        Closure(func=fcn, _larch=self, _name=fname))
+            else:
+                setattr(group, fname, fcn)
+        return group
+
+    def load_builtins(self, modname):
+        """import a core module declared in builtins.lazy_builtins,
+        adding its builtin symbols and running its _larch_init.
+
+        This is called when one of the module's symbols is first used.
+        Symbols that a later module also declares are left to that module.
+        """
+        groupnames = self.lazy_builtins.pop(modname, None)
+        if groupnames is None:
+            return
+        owned = {}
+        for groupname in groupnames:
+            group = getattr(self.symtable, groupname)
+            owned[groupname] = group._lazy_pop(modname)
+
+        module = importlib.import_module(modname)
+        for groupname, entries in getattr(module, '_larch_builtins', {}).items():
+            if '.' not in groupname:
+                entries = {key: val for key, val in entries.items()
+                           if key in owned.get(groupname, ())}
+            self.add_builtins(groupname, entries)
+
+        init_fcn = getattr(module, '_larch_init', None)
+        if callable(init_fcn):
+            init_fcn(_larch=self)
+
+        doc = getattr(module, '__DOC__', None)
+        if doc is not None:
+            groupname = getattr(module, '_larch_name', modname)
+            groupname = groupname.replace('larch.', '_')
+            if self.symtable.has_group(groupname):
+                self.symtable.get_group(groupname).__doc__ = doc
+
     def unimplemented(self, node):
         "unimplemented nodes"
         self.raise_exception(node, exc=NotImplementedError,
@@ -214,8 +324,12 @@ class Interpreter:
     def parse(self, text, fname=None, lineno=-1):
         """parse statement/expression to Ast representation    """
         self.expr  = text
+        node = self.parse_cache.get(text, None)
+        if node is not None:
+            self.parse_cache.move_to_end(text)
+            return node
         try:
-            return ast.parse(text)
+            node = ast.parse(text)
         except:
             etype, exc, tb = sys.exc_info()
             if (isinstance(exc, SyntaxError) and
@@ -232,6 +346,12 @@ class Interpreter:
    %s"""  %  (rwords)
             self.raise_exception(None, exc=SyntaxError, msg='Syntax Error',
                                  expr=text, fname=fname, lineno=lineno)
+            return None
+        if self.maxcache > 0:
+            self.parse_cache[text] = node
+            if len(self.parse_cache) > self.maxcache:
+                self.parse_cache.popitem(last=False)
+        return node
 
     def run(self, node, expr=None, func=None,
             fname=None, lineno=None, with_raise=False):
@@ -263,6 +383,27 @@ class Interpreter:
         if node.__class__.__name__.lower() not in self.node_handlers:
             return self.unimplemented(node)
         handler = self.node_handlers[node.__class__.__name__.lower()]
+
+        # run a lowered expression, or count runs until it can be lowered.
+        # on any error, fall through to the handler to report it.
+        lowered = getattr(node, '_larch_lowered', None)
+        if lowered is None:
+            lowered = 1 if lowerable(node) else False
+            node._larch_lowered = lowered
+        elif isinstance(lowered, int) and lowered is not False:
+            lowered += 1
+            if lowered >= LOWER_AFTER:
+                lowered = lower_expr(node)
+            node._larch_lowered = lowered
+        if isinstance(lowered, tuple):
+            code, names = lowered
+            try:
+                getsym = self.symtable.get_symbol
+                return eval(code, {'__builtins__': {}},
+                            {name: getsym(name) for name in names})
+            except Exception:
+                pass
+
         # run the handler:  this will likely generate
         # recursive calls into this run method.
         try:
@@ -11,13 +11,15 @@ from .fileutils import (increment_filename, new_filename, new_dirname,
                         winpath, nativepath, strip_quotes, get_timestamp,
                         gformat, asciikeys)
 
-from .columnfile import (read_ascii, write_ascii, write_group, set_array_labels,
-                         guess_filereader, look_for_nans, read_fdmnes)
+from .columnfile import (read_ascii, read_ascii_chunks, write_ascii, write_group,
+                         set_array_labels, guess_filereader, look_for_nans,
+                         read_fdmnes)
+from .parsecache import parse_cache_info, clear_parse_cache, set_parse_cache
 from .xdi import read_xdi, XDIFile, XDIFileException
 from .mda import read_mda
 from .hdf5group import h5file, h5group, netcdf_file, netcdf_group
 from .xsp3_hdf5 import read_xsp3_hdf5
-from .xrf_netcdf import read_xrf_netcdf
+from .xrf_netcdf import read_xrf_netcdf, decode_xmap_buffers
 from .xrd_netcdf import read_xrd_netcdf
 from .xrd_hdf5 import read_xrd_hdf5
 from .xdi import read_xdi
@@ -32,7 +34,7 @@ from .save_restore import (save_session, load_session, read_session,
 from . import tifffile
 from .tifffile import TIFFfile
 from .athena_project import (is_athena_project, read_athena, AthenaProject,
-                             create_athena, extract_athenagroup,
+                             AthenaGroups, create_athena, extract_athenagroup,
                              make_hashkey)
 
 from .xafs_beamlines import guess_beamline
@@ -63,7 +65,11 @@ __exports__ = dict(increment_filename=increment_filename,
                    get_timestamp=get_timestamp,
                    asciikeys=asciikeys,
                    read_ascii=read_ascii,
+                   read_ascii_chunks=read_ascii_chunks,
                    look_for_nans=look_for_nans,
+                   parse_cache_info=parse_cache_info,
+                   clear_parse_cache=clear_parse_cache,
+                   set_parse_cache=set_parse_cache,
                    set_array_labels=set_array_labels,
                    guess_filereader=guess_filereader,
                    write_ascii=write_ascii,
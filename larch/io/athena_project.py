@@ -6,13 +6,17 @@ Code to read and write Athena Project files
 
 import os
 import io
+import ast
 import sys
 import time
 import json
 import platform
+import warnings
 from fnmatch import fnmatch
 from gzip import GzipFile
 from collections import OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor
 from copy import deepcopy
 import numpy as np
 from numpy.random import randint
@@ -20,6 +24,7 @@ from numpy.random import randint
 from larch import Group
 from larch import __version__ as larch_version
 from larch.utils.strutils import bytes2str, str2bytes, fix_varname, asfloat
+from .parsecache import parse_cached
 
 from xraydb import guess_edge
 import asteval
@@ -28,6 +33,7 @@ hexopen = '\\x{'
 hexclose = '}'
 
 alist2json = str.maketrans("();'\n", "[] \" ")
+_array_seps = str.maketrans("',\"", "   ")
 
 def plarray2json(text):
     return json.loads(text.split('=', 1)[1].strip().translate(alist2json))
@@ -289,13 +295,101 @@ def text2list(text):
     return txt
 
 
-def parse_perlathena(text, filename):
+def _athena_aeval():
+    "asteval Interpreter for values in perl-style Athena files"
+    aout = io.StringIO()
+    return asteval.Interpreter(minimal=True, writer=aout, err_writer=aout,
+                               max_statement_length=12543000)
+
+
+def _athena_value(text, aeval):
+    "evaluate a literal value from a perl-style Athena file"
+    try:
+        return ast.literal_eval(text)
+    except Exception:
+        return aeval(text)
+
+
+def _athena_array(value):
+    """decode an array of an Athena record: either a list of values
+    from a JSON file or an unparsed line from a perl-style file"""
+    if not isinstance(value, str):
+        return np.array(value, dtype='float64')
+    words = value[value.find('(')+1:value.rfind(')')]
+    nwords = words.count(',') + 1 if len(words.strip()) > 0 else 0
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            arr = np.fromstring(words.translate(_array_seps), sep=' ')
+        if len(arr) == nwords:
+            return arr
+    except Exception:
+        pass
+    values = _athena_value(text2list(value), _athena_aeval())
+    return np.array([float(x) for x in values])
+
+
+def _athena_record(name, args, arrays):
+    """index record for an Athena group, from its Athena name, a list of
+    (key, value) args, and its arrays, which are not yet decoded
     """
-    parse old athena file format to Group of Groups
+    label = name
+    params = Group(id=name, bkg=Group(), fft=Group())
+    attrs = OrderedDict()
+    for key, val in args:
+        if key.startswith('bkg_'):
+            setattr(params.bkg, key[4:], asfloat(val))
+        elif key.startswith('fft_'):
+            setattr(params.fft, key[4:], asfloat(val))
+        elif key == 'label':
+            label = attrs['label'] = val
+        elif key in ('valence', 'lasso_yvalue', 'epsk', 'epsr'):
+            attrs[key] = asfloat(val)
+        elif key in ('atsym', 'edge'):
+            attrs[key] = val
+        else:
+            setattr(params, key, asfloat(val))
+    gname = fix_varname(label)
+    if gname.startswith('_'):
+        gname = 'd' + gname
+    return {'name': gname, 'key': name, 'label': label, 'athena_params': params,
+            'attrs': attrs, 'arrays': arrays}
+
+
+def _athena_record_group(rec):
+    "build Group for an Athena record, decoding its arrays"
+    arrays = rec['arrays']
+    this = Group(energy=_athena_array(arrays['x']), mu=_athena_array(arrays['y']),
+                 athena_params=rec['athena_params'])
+    for key in ('i0', 'signal', 'stddev'):
+        if key in arrays:
+            setattr(this, key, _athena_array(arrays[key]))
+    for key, val in rec['attrs'].items():
+        setattr(this, key, val)
+    this.__doc__ = """Athena Group Name %s (key='%s')""" % (rec['label'], rec['key'])
+    return this
+
+
+def _athena_records_group(header, journal, records, filename):
+    "build Group of Groups for all Athena records"
+    out = Group()
+    out.__doc__ = """XAFS Data from Athena Project File %s""" % (filename)
+    out.journal = journal
+    out.group_names = []
+    out.header = header
+    for rec in records:
+        setattr(out, rec['name'], _athena_record_group(rec))
+        out.group_names.append(rec['name'])
+    return out
+
+
+def _perlathena_records(text, filename):
+    """index groups in an old athena file format, without decoding arrays
+
+    Returns:
+        header, journal, and list of records for each group
     """
-    aout = io.StringIO()
-    aeval = asteval.Interpreter(minimal=True, writer=aout, err_writer=aout,
-                                max_statement_length=12543000)
+    aeval = _athena_aeval()
 
     lines = text.split('\n')
     athenagroups = []
@@ -320,9 +414,7 @@ def parse_perlathena(text, filename):
     header = [vline]
     journal = ['']
     is_header = True
-    ix = 0
     for t in lines:
-        ix += 1
         if t.startswith('#') or len(t) < 2 or 'undef' in t:
             if is_header:
                 header.append(t)
@@ -331,7 +423,7 @@ def parse_perlathena(text, filename):
         key = t.split(' ')[0].strip()
         key = key.replace('$', '').replace('@', '').replace('%', '').strip()
         if key == 'old_group':
-            raw['name'] = aeval(text2list(t))
+            raw['name'] = _athena_value(text2list(t), aeval)
         elif key == '[record]':
             athenagroups.append(raw)
             raw = {'name':''}
@@ -345,55 +437,32 @@ def parse_perlathena(text, filename):
                 journal = text2list(t)
 
         elif key == 'args':
-            raw['args'] = aeval(text2list(t))
+            raw['args'] = _athena_value(text2list(t), aeval)
         elif key == 'xdi':
             raw['xdi'] = t
         elif key in ('x', 'y', 'i0', 'signal', 'stddev'):
-            raw[key] = np.array([float(x) for x in aeval(text2list(t))])
+            raw[key] = t
         elif key in ('1;', 'indicator', 'lcf_data', 'plot_features'):
             pass
         else:
             print(" do not know what to do with key '%s' at '%s'" % (key, raw['name']))
 
-    out = Group()
-    out.__doc__ = """XAFS Data from Athena Project File %s""" % (filename)
-    out.journal = '\n'.join(journal)
-    out.group_names = []
-    out.header = '\n'.join(header)
+    records = []
     for dat in athenagroups:
-        label = dat.get('name', 'unknown')
-        this = Group(energy=dat['x'], mu=dat['y'],
-                     athena_params=Group(id=label, bkg=Group(), fft=Group()))
+        args = dat.get('args', [])
+        args = [(args[2*i], args[2*i+1]) for i in range(len(args)//2)]
+        arrays = {key: dat[key] for key in ('x', 'y', 'i0', 'signal', 'stddev')
+                  if key in dat}
+        records.append(_athena_record(dat.get('name', 'unknown'), args, arrays))
+    return '\n'.join(header), '\n'.join(journal), records
 
-        if 'i0' in dat:
-            this.i0 = dat['i0']
-        if 'signal' in dat:
-            this.signal = dat['signal']
-        if 'stddev' in dat:
-            this.stddev = dat['stddev']
-        if 'args' in dat:
-            for i in range(len(dat['args'])//2):
-                key = dat['args'][2*i]
-                val = dat['args'][2*i+1]
-                if key.startswith('bkg_'):
-                    setattr(this.athena_params.bkg, key[4:], asfloat(val))
-                elif key.startswith('fft_'):
-                    setattr(this.athena_params.fft, key[4:], asfloat(val))
-                elif key == 'label':
-                    label = this.label = val
-                elif key in ('valence', 'lasso_yvalue', 'epsk', 'epsr'):
-                    setattr(this, key, asfloat(val))
-                elif key in ('atsym', 'edge'):
-                    setattr(this, key, val)
-                else:
-                    setattr(this.athena_params, key, asfloat(val))
-        this.__doc__ = """Athena Group Name %s (key='%s')""" % (label, dat['name'])
-        name = fix_varname(label)
-        if name.startswith('_'):
-            name = 'd' + name
-        setattr(out, name, this)
-        out.group_names.append(name)
-    return out
+
+def parse_perlathena(text, filename):
+    """
+    parse old athena file format to Group of Groups
+    """
+    header, journal, records = _perlathena_records(text, filename)
+    return _athena_records_group(header, journal, records, filename)
 
 
 def parse_perlathena_old(text, filename):
@@ -491,12 +560,13 @@ def parse_perlathena_old(text, filename):
     return out
 
 
-def parse_jsonathena(text, filename):
-    """parse a JSON-style athena file"""
-    jsdict = json.loads(text)
+def _jsonathena_records(text, filename):
+    """index groups in a JSON-style athena file, without decoding arrays
 
-    out = Group()
-    out.__doc__ = """XAFS Data from Athena Project File %s""" % (filename)
+    Returns:
+        header, journal, and list of records for each group
+    """
+    jsdict = json.loads(text)
 
     header = []
     athena_names = []
@@ -508,44 +578,149 @@ def parse_jsonathena(text, filename):
         elif key.startswith('_____order'):
             athena_names = val
 
-    out.journal = journal
-    out.header = '\n'.join(header)
-    out.group_names  = []
+    records = []
     for name in athena_names:
-        label = name
         dat = jsdict[name]
-        x = np.array(dat['x'], dtype='float64')
-        y = np.array(dat['y'], dtype='float64')
-        this = Group(energy=x, mu=y,
-                     athena_params=Group(id=name, bkg=Group(), fft=Group()))
+        arrays = {key: dat[key] for key in ('x', 'y', 'i0', 'signal', 'stddev')
+                  if key in dat}
+        records.append(_athena_record(name, dat.get('args', {}).items(), arrays))
+    return '\n'.join(header), journal, records
 
-        if 'i0' in dat:
-            this.i0 = np.array(dat['i0'], dtype='float64')
-        if 'signal' in dat:
-            this.signal = np.array(dat['signal'], dtype='float64')
-        if 'stddev' in dat:
-            this.stddev = np.array(dat['stddev'], dtype='float64')
-        if 'args' in dat:
-            for key, val in dat['args'].items():
-                if key.startswith('bkg_'):
-                    setattr(this.athena_params.bkg, key[4:], asfloat(val))
-                elif key.startswith('fft_'):
-                    setattr(this.athena_params.fft, key[4:], asfloat(val))
-                elif key == 'label':
-                    label = this.label = val
-                elif key in ('valence', 'lasso_yvalue', 'epsk', 'epsr'):
-                    setattr(this, key, asfloat(val))
-                elif key in ('atsym', 'edge'):
-                    setattr(this, key, val)
-                else:
-                    setattr(this.athena_params, key, asfloat(val))
-        this.__doc__ = """Athena Group Name %s (key='%s')""" % (label, name)
-        name = fix_varname(label)
-        if name.startswith('_'):
-            name = 'd' + name
-        setattr(out, name, this)
-        out.group_names.append(name)
-    return out
+
+def parse_jsonathena(text, filename):
+    """parse a JSON-style athena file"""
+    header, journal, records = _jsonathena_records(text, filename)
+    return _athena_records_group(header, journal, records, filename)
+
+
+def _athena_records(text, filename):
+    """index groups of JSON or perl-style athena file
+
+    Returns:
+        header, journal, and list of records for each group
+    """
+    if  '____header' in text[:500]:
+        try:
+            return _jsonathena_records(text, filename)
+        except Exception:
+            pass
+    return _perlathena_records(text, filename)
+
+
+def _read_athena_record(rec, do_preedge=True, do_bkg=False, do_fft=False,
+                        _larch=None):
+    """build Group for an Athena record, decoding the arrays and doing
+    XAFS processing with the parameters saved in the project file.
+    Processing is done only for mu(E) data and if do_preedge or do_bkg.
+    """
+    from larch.xafs import pre_edge, autobk, xftf
+    this = _athena_record_group(rec)
+
+    is_xmu = bool(int(getattr(this.athena_params, 'is_xmu', 1.0)))
+    is_chi = bool(int(getattr(this.athena_params, 'is_chi', 0.0)))
+    is_xmu = is_xmu and not is_chi
+    for aname in ('is_xmudat', 'is_bkg', 'is_diff',
+                  'is_proj', 'is_pixel', 'is_rsp'):
+        val = bool(int(getattr(this.athena_params, aname, 0.0)))
+        is_xmu = is_xmu and not val
+
+    if is_xmu and (do_preedge or do_bkg):
+        pars = clean_bkg_params(this.athena_params.bkg)
+        pre_edge(this,  e0=float(pars.e0),
+                 pre1=float(pars.pre1), pre2=float(pars.pre2),
+                 norm1=float(pars.nor1), norm2=float(pars.nor2),
+                 nnorm=float(pars.nnorm),
+                 make_flat=bool(pars.flatten), _larch=_larch)
+        if do_bkg and hasattr(pars, 'rbkg'):
+            autobk(this, _larch=_larch, e0=float(pars.e0),
+                   rbkg=float(pars.rbkg), kmin=float(pars.spl1),
+                   kmax=float(pars.spl2), kweight=float(pars.kw),
+                   dk=float(pars.dk), clamp_lo=float(pars.clamp1),
+                   clamp_hi=float(pars.clamp2))
+            if do_fft:
+                pars = clean_fft_params(this.athena_params.fft)
+                kweight=2
+                if hasattr(pars, 'kw'):
+                    kweight = float(pars.kw)
+                xftf(this, _larch=_larch, kmin=float(pars.kmin),
+                     kmax=float(pars.kmax), kweight=kweight,
+                     window=pars.kwindow, dk=float(pars.dk))
+    if is_chi:
+        this.k = this.energy*1.0
+        this.chi = this.mu*1.0
+        del this.energy
+        del this.mu
+
+    # add a selection flag
+    this.sel = 1
+    return this
+
+
+class AthenaGroups(MutableMapping):
+    """ordered mapping of names to Groups for datasets in an Athena Project,
+    reading each Group from its project file record when first used.
+
+    Groups are processed as set by the do_preedge, do_bkg, and do_fft
+    options when read.  Use load() to read many groups at once, optionally
+    in a pool of processes.
+    """
+    def __init__(self, records=None, do_preedge=True, do_bkg=False,
+                 do_fft=False, _larch=None):
+        self._groups = OrderedDict()
+        if records is not None:
+            self._groups.update(records)
+        self._larch = _larch
+        self._opts = dict(do_preedge=do_preedge, do_bkg=do_bkg, do_fft=do_fft)
+
+    def __getitem__(self, name):
+        group = self._groups[name]
+        if not isinstance(group, Group):
+            group = self._groups[name] = _read_athena_record(group, _larch=self._larch,
+                                                             **self._opts)
+        return group
+
+    def __setitem__(self, name, group):
+        self._groups[name] = group
+
+    def __delitem__(self, name):
+        del self._groups[name]
+
+    def __iter__(self):
+        return iter(self._groups)
+
+    def __len__(self):
+        return len(self._groups)
+
+    def __repr__(self):
+        return f'<AthenaGroups: {len(self.loaded())} of {len(self)} groups loaded>'
+
+    def loaded(self):
+        "list of names of Groups that have been read"
+        return [name for name, group in self._groups.items()
+                if isinstance(group, Group)]
+
+    def load(self, names=None, workers=1):
+        """read Groups that have not yet been read
+
+        Arguments:
+            names (list or None): names of groups to read [None, all groups]
+            workers (int): number of processes to use to read groups [1]
+
+        Notes:
+            with workers > 1, processing is done without the Larch session.
+        """
+        if names is None:
+            names = list(self._groups)
+        names = [n for n in names if not isinstance(self._groups[n], Group)]
+        if workers > 1 and len(names) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_read_athena_record, self._groups[n], **self._opts)
+                           for n in names]
+                for name, future in zip(names, futures):
+                    self._groups[name] = future.result()
+        else:
+            for name in names:
+                self[name]
 
 
 class AthenaGroup(Group):
@@ -566,21 +741,24 @@ class AthenaGroup(Group):
     def _repr_html_(self):
         """HTML representation for Jupyter notebook"""
 
-        _has_sel = any([hasattr(g, 'sel') for g in self.groups.values()])
+        groups = self._loaded_groups()
+        _has_sel = (len(groups) < len(self.groups) or
+                    any([hasattr(g, 'sel') for g in groups.values()]))
         html = ["<table>"]
         html.append("<tr>")
         html.append("<td><b>Group</b></td>")
         if self.show_sel and _has_sel:
             html.append("<td><b>Sel</b></td>")
         html.append("</tr>")
-        for name, grp in self.groups.items():
-            try:
-                if grp.sel == 1:
-                    sel = "\u2714"
-                else:
+        for name in self.groups:
+            # groups not yet read will be selected
+            sel = "\u2714"
+            if name in groups:
+                try:
+                    if groups[name].sel != 1:
+                        sel = ""
+                except AttributeError:
                     sel = ""
-            except AttributeError:
-                sel = ""
             html.append("<tr>")
             html.append(f"<td>{name}</td>")
             if self.show_sel and _has_sel:
@@ -589,6 +767,29 @@ class AthenaGroup(Group):
         html.append("</table>")
         return ''.join(html)
 
+    def __getattr__(self, name):
+        groups = self.__dict__.get('_athena_groups', None)
+        if isinstance(groups, AthenaGroups) and name in groups:
+            group = groups[name]
+            setattr(self, name, group)
+            return group
+        raise AttributeError(f"'{self.__class__.__name__}' has no member '{name}'")
+
+    def __dir__(self):
+        "return list of member names, including groups not yet read"
+        out = Group.__dir__(self)
+        groups = self.__dict__.get('_athena_groups', None)
+        if isinstance(groups, AthenaGroups):
+            out.extend([name for name in groups if name not in out])
+        return out
+
+    def _loaded_groups(self):
+        "dict of groups that have been read"
+        groups = self.groups
+        if isinstance(groups, AthenaGroups):
+            return {name: groups[name] for name in groups.loaded()}
+        return groups
+
     @property
     def groups(self):
         return self._athena_groups
@@ -715,7 +916,7 @@ class AthenaProject(object):
         fh.close()
 
     def read(self, filename=None, match=None, do_preedge=True, do_bkg=False,
-             do_fft=False, use_hashkey=False):
+             do_fft=False, use_hashkey=False, lazy=False, workers=1):
         """
         read Athena project to group of groups, one for each Athena dataset
         in the project file.  This supports both gzipped and unzipped files
@@ -729,6 +930,8 @@ class AthenaProject(object):
             do_fft (bool): whether to do XAFS Fast Fourier transform [False]
             use_hashkey (bool): whether to use Athena's hash key as the
                            group name instead of the Athena label [False]
+            lazy (bool): whether to read each group only when first used [False]
+            workers (int): number of processes to read groups with [1]
         Returns:
             None, fills in attributes `header`, `journal`, `filename`, `groups`
 
@@ -742,6 +945,13 @@ class AthenaProject(object):
                the parameters saved in the project file.
             2. use_hashkey=True will name groups from the internal 5 character
                string used by Athena, instead of the group label.
+            4. with lazy=True, the project file is indexed, and `groups` is an
+               AthenaGroups mapping that decodes the arrays and does the
+               processing for each group when it is first used.  Use
+               groups.load(names, workers=n) to read many groups at once.
+            5. with workers > 1, groups are read and processed in a pool of
+               processes, which is faster for large projects, especially with
+               do_bkg=True.
 
         Example:
             1. read in all groups from a project file:
@@ -755,8 +965,6 @@ class AthenaProject(object):
         if not os.path.exists(self.filename):
             raise IOError("%s '%s': cannot find file" % (ERR_MSG, self.filename))
 
-        from larch.xafs import pre_edge, autobk, xftf
-
         if not os.path.exists(filename):
             raise IOError("file '%s' not found" % filename)
 
@@ -767,72 +975,32 @@ class AthenaProject(object):
         if not _test_athena_text(text):
             raise ValueError("%s '%s': invalid Athena File" % (ERR_MSG, filename))
 
-        # decode JSON or Perl format
-        data = None
-        if  '____header' in text[:500]:
-            try:
-                data = parse_jsonathena(text, self.filename)
-            except Exception:
-                pass
-
-        if data is None:
-            data = parse_perlathena(text, self.filename)
-
-        if data is None:
-            raise ValueError("cannot read file '%s' as Athena Project File" % (self.filename))
-
-        self.header = data.header
-        self.journal = data.journal
-        self.group_names = data.group_names
-
-        for gname in data.group_names:
-            oname = gname
-            if match is not None:
-                if not fnmatch(gname.lower(), match):
-                    continue
-            this = getattr(data, gname)
-
-            if use_hashkey:
-                oname = this.athena_params.id
-            is_xmu = bool(int(getattr(this.athena_params, 'is_xmu', 1.0)))
-            is_chi = bool(int(getattr(this.athena_params, 'is_chi', 0.0)))
-            is_xmu = is_xmu and not is_chi
-            for aname in ('is_xmudat', 'is_bkg', 'is_diff',
-                          'is_proj', 'is_pixel', 'is_rsp'):
-                val = bool(int(getattr(this.athena_params, aname, 0.0)))
-                is_xmu = is_xmu and not val
-
-            if is_xmu and (do_preedge or do_bkg) and (self._larch is not None):
-                pars = clean_bkg_params(this.athena_params.bkg)
-                pre_edge(this,  e0=float(pars.e0),
-                         pre1=float(pars.pre1), pre2=float(pars.pre2),
-                         norm1=float(pars.nor1), norm2=float(pars.nor2),
-                         nnorm=float(pars.nnorm),
-                         make_flat=bool(pars.flatten), _larch=self._larch)
-                if do_bkg and hasattr(pars, 'rbkg'):
-                    autobk(this, _larch=self._larch, e0=float(pars.e0),
-                           rbkg=float(pars.rbkg), kmin=float(pars.spl1),
-                           kmax=float(pars.spl2), kweight=float(pars.kw),
-                           dk=float(pars.dk), clamp_lo=float(pars.clamp1),
-                           clamp_hi=float(pars.clamp2))
-                    if do_fft:
-                        pars = clean_fft_params(this.athena_params.fft)
-                        kweight=2
-                        if hasattr(pars, 'kw'):
-                            kweight = float(pars.kw)
-                        xftf(this, _larch=self._larch, kmin=float(pars.kmin),
-                             kmax=float(pars.kmax), kweight=kweight,
-                             window=pars.kwindow, dk=float(pars.dk))
-            if is_chi:
-                this.k = this.energy*1.0
-                this.chi = this.mu*1.0
-                del this.energy
-                del this.mu
-
-            # add a selection flag
-            this.sel = 1
-
-            self.groups[oname] = this
+        # index JSON or Perl format, decoding arrays only for selected groups
+        header, journal, records = _athena_records(text, self.filename)
+        del text
+
+        self.header = header
+        self.journal = journal
+        self.group_names = [rec['name'] for rec in records]
+
+        selected = OrderedDict()
+        for rec in records:
+            if match is None or fnmatch(rec['name'].lower(), match):
+                selected[rec['name']] = rec
+        if use_hashkey:
+            selected = OrderedDict((rec['athena_params'].id, rec)
+                                   for rec in selected.values())
+
+        if self._larch is None:
+            do_preedge = do_bkg = False
+        groups = AthenaGroups(selected, do_preedge=do_preedge, do_bkg=do_bkg,
+                              do_fft=do_fft, _larch=self._larch)
+        if lazy:
+            self.groups = groups
+        else:
+            groups.load(workers=workers)
+            for name, group in groups.items():
+                self.groups[name] = group
 
     def as_group(self):
         """convert AthenaProject to Larch group"""
@@ -842,8 +1010,11 @@ class AthenaProject(object):
         out._athena_header = self.header
         out._athena_groups = self.groups
 
-        for name, group in self.groups.items():
-            setattr(out, name, group)
+        names = self.groups
+        if isinstance(self.groups, AthenaGroups):
+            names = self.groups.loaded()
+        for name in names:
+            setattr(out, name, self.groups[name])
         return out
 
     def as_dict(self):
@@ -871,8 +1042,9 @@ class AthenaProject(object):
         return out
 
 
+@parse_cached
 def read_athena(filename, match=None, do_preedge=True, do_bkg=False, do_fft=False,
-                use_hashkey=False,  _larch=None):
+                use_hashkey=False, lazy=False, workers=1, _larch=None):
     """read athena project file
     returns a Group of Groups, one for each Athena Group in the project file
 
@@ -884,6 +1056,8 @@ def read_athena(filename, match=None, do_preedge=True, do_bkg=False, do_fft=Fals
         do_fft (bool): whether to do XAFS Fast Fourier transform [False]
         use_hashkey (bool): whether to use Athena's hash key as the
                        group name instead of the Athena label [False]
+        lazy (bool): whether to read each group only when first used [False]
+        workers (int): number of processes to read groups with [1]
 
     Returns:
         group of groups each named according the label used by Athena.
@@ -898,6 +1072,13 @@ def read_athena(filename, match=None, do_preedge=True, do_bkg=False, do_fft=Fals
            the parameters saved in the project file.
         3. use_hashkey=True will name groups from the internal 5 character
            string used by Athena, instead of the group label.
+        4. with lazy=True, the arrays for each group are decoded, and the
+           processing done, when the group is first used.  The `groups`
+           attribute is then an AthenaGroups mapping, with a load() method
+           to read many groups at once.  Lazily read projects are not saved
+           in the parse cache.
+        5. with workers > 1, groups are read and processed in a pool of
+           processes.
 
     Example:
         1. read in all groups from a project file:
@@ -912,7 +1093,7 @@ def read_athena(filename, match=None, do_preedge=True, do_bkg=False, do_fft=Fals
 
     aprj = AthenaProject(_larch=_larch)
     aprj.read(filename, match=match, do_preedge=do_preedge, do_bkg=do_bkg,
-              do_fft=do_fft, use_hashkey=use_hashkey)
+              do_fft=do_fft, use_hashkey=use_hashkey, lazy=lazy, workers=workers)
     return aprj.as_group()
 
 
@@ -5,7 +5,9 @@
 import os
 import sys
 import time
+import mmap
 import string
+import warnings
 from collections import namedtuple
 import numpy as np
 from dateutil.parser import parse as dateparse
@@ -15,6 +17,7 @@ from larch.symboltable import isgroup
 from ..utils import read_textfile
 from .fileutils import fix_varname
 from .xafs_beamlines import guess_beamline
+from .parsecache import parse_cached
 
 nanresult = namedtuple('NanResult', ('file_ok', 'message', 'nan_rows',
                                      'nan_cols', 'inf_rows', 'inf_cols'))
@@ -22,9 +25,21 @@ nanresult = namedtuple('NanResult', ('file_ok', 'message', 'nan_rows',
 
 MODNAME = '_io'
 TINY = 1.e-7
-MAX_FILESIZE = 100*1024*1024  # 100 Mb limit
+MAX_FILESIZE = 100*1024*1024  # 100 Mb: larger files are memory-mapped
+CHUNKSIZE = 16*1024*1024  # bytes of text per chunk for large files
 COMMENTCHARS = '#;%*!$'
 
+# classes of bytes in lines of numbers: 0 for whitespace and commas, 1 for
+# digits, 2 for '.', 3 for 'e' and 'E', 4 for signs, 5 for all others.
+# lines with 5s, or with words of 1-4s that are not numbers for float()
+# (see _not_numbers), are checked with getfloats() to find the header.
+_BYTE_CLASS = np.full(256, 5, dtype=np.uint8)
+_BYTE_CLASS[list(b' \t\r\n\x0b\x0c,')] = 0
+_BYTE_CLASS[list(b'0123456789')] = 1
+_BYTE_CLASS[list(b'.')] = 2
+_BYTE_CLASS[list(b'eE')] = 3
+_BYTE_CLASS[list(b'+-')] = 4
+
 def look_for_nans(path):
     """
     look for Nans and Infs in an ASCII data file
@@ -173,6 +188,225 @@ def parse_labelline(labelline, header):
     pass
 
 
+def _read_ascii_lines(text):
+    """split text into header, data, and footer, parsing each line
+    with getfloats().  returns (headers, data, footers)"""
+    lines = text.split('\n')
+
+    ncol = None
+    data, footers, headers = [], [], []
+
+    lines.reverse()
+    section = 'FOOTER'
+
+    for line in lines:
+        line = line.strip()
+        if len(line) < 1:
+            continue
+        # look for section transitions (going from bottom to top)
+        if section == 'FOOTER' and not None in getfloats(line):
+            section = 'DATA'
+        elif section == 'DATA' and None in getfloats(line):
+            section = 'HEADER'
+
+        # act of current section:
+        if section == 'FOOTER':
+            footers.append(line)
+        elif section == 'HEADER':
+            headers.append(line)
+        elif section == 'DATA':
+            rowdat  = getfloats(line)
+            if ncol is None:
+                ncol = len(rowdat)
+            elif ncol > len(rowdat):
+                rowdat.extend([np.nan]*(ncol-len(rowdat)))
+            elif ncol < len(rowdat):
+                for i in data:
+                    i.extend([np.nan]*(len(rowdat)-ncol))
+                ncol = len(rowdat)
+            data.append(rowdat)
+
+    # reverse header, footer, data, convert to arrays
+    footers.reverse()
+    headers.reverse()
+    data.reverse()
+    return headers, np.array(data).transpose(), footers
+
+
+def _decode_lines(buff):
+    "list of stripped, non-blank lines from bytes"
+    lines = buff.decode('utf-8', errors='surrogatepass').split('\n')
+    return [line for line in (line.strip() for line in lines) if len(line) > 0]
+
+
+def _not_numbers(block):
+    """offsets of bytes in a block of text (uint8 array) that are in words
+    that may not be numbers: words with bytes of class 5, and words like
+    '1e', 'e5', '-', '1.2.3' or '1-2' that do not match [+-]digits[.digits]
+    with an optional e[+-]digits exponent."""
+    bclass = np.zeros(len(block) + 2, dtype=np.uint8)
+    bclass[1:-1] = _BYTE_CLASS[block]
+    check = np.flatnonzero(bclass > 1)
+    this, prev, nxt = bclass[check], bclass[check-1], bclass[check+1]
+    # signs start a word or an exponent, and are followed by a digit
+    # (or a '.' at the start of a word), '.' must be next to a digit,
+    # and an exponent follows a digit or '.' and is followed by a
+    # digit or a sign
+    bad = ((this == 5) |
+           ((this == 4) & ~(((prev == 0) & ((nxt == 1) | (nxt == 2))) |
+                            ((prev == 3) & (nxt == 1)))) |
+           ((this == 2) & (prev != 1) & (nxt != 1)) |
+           ((this == 3) & ~(((prev == 1) | (prev == 2)) &
+                            ((nxt == 1) | (nxt == 4)))))
+    # at most one '.' and one exponent in a word, with the '.' first:
+    # check successive '.', exponents, and whitespace
+    marks = np.flatnonzero((bclass == 0) | (bclass == 2) | (bclass == 3))
+    mclass = bclass[marks]
+    pairs = np.flatnonzero((mclass[:-1] != 0) & (mclass[1:] != 0) &
+                           ~((mclass[:-1] == 2) & (mclass[1:] == 3)))
+    return np.union1d(check[bad], marks[pairs + 1]) - 1
+
+
+def _ascii_sections(buff, blocksize=CHUNKSIZE):
+    """find the header, data, and footer sections of ASCII column data,
+    as read_ascii(): going up from the end of the text, the data starts
+    at the first line of numbers, and the header at the next line that is
+    not all numbers.
+
+    Arguments:
+      buff (bytes or mmap): text of file
+      blocksize (int):      size of blocks to search for the header
+
+    Returns:
+      headers, start, end, footers: lists of header and footer lines,
+      and the offsets of the data in buff.
+    """
+    footers = []
+    end = len(buff)
+    while end > 0:
+        lstart = buff.rfind(b'\n', 0, end) + 1
+        line = buff[lstart:end].decode('utf-8', errors='surrogatepass').strip()
+        if len(line) > 0:
+            if None not in getfloats(line):
+                break
+            footers.append(line)
+        end = max(0, lstart - 1)
+    footers.reverse()
+    if end == 0:
+        return [], 0, 0, footers
+
+    # search back for the header, only checking lines that may not be
+    # all numbers (see _not_numbers)
+    start = 0
+    pos = end
+    while pos > 0 and start == 0:
+        bstart = 0
+        if pos > blocksize:
+            bstart = buff.rfind(b'\n', 0, pos - blocksize) + 1
+        block = np.frombuffer(buff, dtype=np.uint8, count=pos-bstart,
+                              offset=bstart)
+        newlines = np.flatnonzero(block == 10)
+        check = np.unique(np.searchsorted(newlines, _not_numbers(block)))
+        for iline in check[::-1]:
+            lstart = 0 if iline == 0 else newlines[iline-1] + 1
+            lend = newlines[iline] if iline < len(newlines) else len(block)
+            line = buff[bstart+lstart:bstart+lend]
+            line = line.decode('utf-8', errors='surrogatepass').strip()
+            if None in getfloats(line):
+                start = bstart + lend + 1
+                break
+        del block
+        pos = bstart
+    return _decode_lines(buff[:start]), start, end, footers
+
+
+def _parse_numbers(buff):
+    """parse bytes of text of lines of numbers with np.fromstring(),
+    giving an array of shape (ncolumns, nrows), with short rows padded
+    with NaN.
+
+    Returns None if the text cannot be parsed this way.
+    """
+    lines = buff.split(b'\n')
+    has_commas = b',' in buff
+    if has_commas:
+        # rows of only commas are rows of NaN
+        lines = [line.replace(b',', b' ') for line in lines if line.strip()]
+        buff = buff.replace(b',', b' ')
+    counts = np.fromiter(map(len, map(bytes.split, lines)), dtype=np.int64,
+                         count=len(lines))
+    if not has_commas:
+        counts = counts[counts > 0]
+    if len(counts) == 0:
+        return None
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        try:
+            values = np.fromstring(buff, sep=' ')
+        except (ValueError, DeprecationWarning):
+            return None
+    if values.size != counts.sum():
+        return None
+    ncol = counts.max()
+    if (counts == ncol).all():
+        return values.reshape((len(counts), ncol)).transpose()
+    data = np.full((len(counts), ncol), np.nan)
+    data[np.arange(ncol) < counts[:, None]] = values
+    return data.transpose()
+
+
+def _iter_ascii_chunks(buff, start, end, chunksize=CHUNKSIZE):
+    "iterate over arrays of data in buff[start:end] for read_ascii_chunks"
+    while start < end:
+        cend = end
+        if end - start > chunksize:
+            cend = buff.find(b'\n', start + chunksize, end)
+            if cend < 0:
+                cend = end
+        text = buff[start:cend]
+        data = _parse_numbers(text)
+        if data is None:
+            rows = [[np.nan if v is None else v for v in getfloats(line)]
+                    for line in _decode_lines(text)]
+            ncol = max([len(r) for r in rows], default=0)
+            data = np.array([r + [np.nan]*(ncol-len(r)) for r in rows],
+                            dtype=np.float64).reshape((len(rows), ncol))
+            data = data.transpose()
+        if data.shape[1] > 0:
+            yield data
+        start = cend + 1
+
+
+def read_ascii_chunks(filename, chunksize=CHUNKSIZE):
+    """iterate over the numerical data of an ASCII column file in chunks,
+    using a memory-mapped file, as for files too large for read_ascii().
+
+    Arguments:
+      filename (str):   name of file to read
+      chunksize (int):  approximate size in bytes of text for each chunk [16 Mb]
+
+    Yields:
+      2-dimensional arrays (ncolumns, nrows) of consecutive rows of data,
+      with the same header, data, and footer sections as read_ascii().
+
+    Notes:
+      1. short rows are padded with NaN within each chunk, so chunks of
+         a file with varying numbers of columns can have different shapes.
+      2. the file must use an ASCII-compatible encoding.
+      3. values that cannot be read as numbers are NaN.
+    """
+    if not os.path.isfile(filename):
+        raise OSError("File not found: '%s'" % filename)
+    with open(filename, 'rb') as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buff:
+            headers, start, end, footers = _ascii_sections(buff)
+            for data in _iter_ascii_chunks(buff, start, end, chunksize=chunksize):
+                yield data
+
+
+@parse_cached
 def read_ascii(filename, labels=None, simple_labels=False,
                sort=False, sort_column=0):
     """read a column ascii column file, returning a group
@@ -210,7 +444,10 @@ def read_ascii(filename, labels=None, simple_labels=False,
       2. sorting.  Data can be sorted to be in increasing order of any column,
          by giving the column index (starting from 0).
 
-      3. header parsing. If header lines are of the forms of
+      3. files larger than MAX_FILESIZE (100 Mb) are memory-mapped and read in
+         chunks, as with `read_ascii_chunks()`.
+
+      4. header parsing. If header lines are of the forms of
 
            | KEY : VAL
            | KEY = VAL
@@ -232,55 +469,31 @@ def read_ascii(filename, labels=None, simple_labels=False,
         xmu: array<shape=(412,), type=dtype('float64')>
 
     See Also:
-        read_xdi, write_ascii
+        read_xdi, write_ascii, read_ascii_chunks
 
     """
     if not os.path.isfile(filename):
         raise OSError("File not found: '%s'" % filename)
-    if os.stat(filename).st_size > MAX_FILESIZE:
-        raise OSError("File '%s' too big for read_ascii()" % filename)
-
-    text = read_textfile(filename)
-    lines = text.split('\n')
-
-    ncol = None
-    data, footers, headers = [], [], []
 
-    lines.reverse()
-    section = 'FOOTER'
-
-    for line in lines:
-        line = line.strip()
-        if len(line) < 1:
-            continue
-        # look for section transitions (going from bottom to top)
-        if section == 'FOOTER' and not None in getfloats(line):
-            section = 'DATA'
-        elif section == 'DATA' and None in getfloats(line):
-            section = 'HEADER'
-
-        # act of current section:
-        if section == 'FOOTER':
-            footers.append(line)
-        elif section == 'HEADER':
-            headers.append(line)
-        elif section == 'DATA':
-            rowdat  = getfloats(line)
-            if ncol is None:
-                ncol = len(rowdat)
-            elif ncol > len(rowdat):
-                rowdat.extend([np.nan]*(ncol-len(rowdat)))
-            elif ncol < len(rowdat):
-                for i in data:
-                    i.extend([np.nan]*(len(rowdat)-ncol))
-                ncol = len(rowdat)
-            data.append(rowdat)
-
-    # reverse header, footer, data, convert to arrays
-    footers.reverse()
-    headers.reverse()
-    data.reverse()
-    data = np.array(data).transpose()
+    if os.stat(filename).st_size > MAX_FILESIZE:
+        with open(filename, 'rb') as fh:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buff:
+                headers, start, end, footers = _ascii_sections(buff)
+                chunks = list(_iter_ascii_chunks(buff, start, end))
+        ncol = max([c.shape[0] for c in chunks], default=0)
+        data = np.full((ncol, sum(c.shape[1] for c in chunks)), np.nan)
+        irow = 0
+        for chunk in chunks:
+            data[:chunk.shape[0], irow:irow+chunk.shape[1]] = chunk
+            irow += chunk.shape[1]
+    else:
+        text = read_textfile(filename)
+        buff = text.encode('utf-8', errors='surrogatepass')
+        headers, start, end, footers = _ascii_sections(buff)
+        data = _parse_numbers(buff[start:end])
+        if data is None:
+            headers, data, footers = _read_ascii_lines(text)
+    ncol = len(data)
 
     # try to parse attributes from header text
     header_attrs = {}
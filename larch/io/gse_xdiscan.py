@@ -14,7 +14,8 @@ from ..utils.strutils import bytes2str
 
 from . import XDIFile, XDIFileException
 
-from .xsp3_hdf5 import XSPRESS3_TAUS, estimate_icr
+from ..xrf.deadtime import detector_taus, solve_icr
+from .xsp3_hdf5 import XSPRESS3_TAUS
 
 def read_gsexdi(fname, _larch=None, nmca=128, bad=None, **kws):
     """Read GSE XDI Scan Data to larch group,
@@ -124,8 +125,8 @@ def read_gsexdi(fname, _larch=None, nmca=128, bad=None, **kws):
             icr = 1.0*ocr
             dtc_mode = 'none'
             if is_old_xsp3:
-                tau = dtc_taus[i]
-                icr = estimate_icr(ocr*1.00, tau, niter=7)
+                tau = detector_taus(dtc_taus, i+1)[i]
+                icr = solve_icr(ocr, tau, method='lambertw')[0]
                 dtc_mode = 'saved_taus'
         ocrs.append(ocr)
         icrs.append(icr)
@@ -0,0 +1,322 @@
+#!/usr/bin/env python
+"""
+  on-disk cache of Groups read from data files
+
+  Groups returned by readers such as read_ascii() and read_athena() are
+  saved as .npz files in the user's larch directory, keyed by the reader,
+  the path, size, and modification time of the file, and the reader
+  options.  Arrays are stored as binary arrays, and all other values
+  (Groups, lists, dicts, strings, numbers) as JSON.  Results that have
+  other values are not cached.
+"""
+import os
+import json
+import hashlib
+import importlib
+import inspect
+from functools import wraps
+from collections import OrderedDict
+
+import numpy as np
+
+from larch import Group, isgroup
+from larch import __version__ as larch_version
+from larch import site_config
+
+PARSE_CACHE = Group(name='parse cache settings',
+                    enabled=os.environ.get('LARCH_PARSE_CACHE', '1') != '0',
+                    directory=os.path.join(site_config.user_larchdir, 'parse_cache'),
+                    maxsize=500*1024*1024, minsize=32*1024)
+
+META = '__meta__'
+
+
+class NotCacheable(TypeError):
+    "value that cannot be saved in the parse cache"
+
+
+class _Encoder:
+    """encode a value as JSON-able data and a dict of arrays"""
+    def __init__(self):
+        self.arrays = {}
+        self.groups = {}
+
+    def array(self, value):
+        key = f'a{len(self.arrays)}'
+        self.arrays[key] = value
+        return {'__array__': key}
+
+    def encode(self, value):
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, np.ndarray):
+            if value.dtype.hasobject:
+                raise NotCacheable('object array')
+            return self.array(value)
+        if isinstance(value, np.generic):
+            return {'__scalar__': self.array(np.asarray(value))['__array__']}
+        if isinstance(value, complex):
+            return {'__complex__': [value.real, value.imag]}
+        if isinstance(value, bytes):
+            return {'__bytes__': value.decode('latin-1')}
+        if isinstance(value, list):
+            return [self.encode(v) for v in value]
+        if isinstance(value, tuple) and not hasattr(value, '_fields'):
+            return {'__tuple__': [self.encode(v) for v in value]}
+        if type(value) in (dict, OrderedDict):
+            return {'__dict__': [[self.encode(k), self.encode(v)]
+                                 for k, v in value.items()],
+                    'ordered': isinstance(value, OrderedDict)}
+        if isgroup(value):
+            gid = str(id(value))
+            if gid not in self.groups:
+                cls = value.__class__
+                self.groups[gid] = None
+                self.groups[gid] = {'class': f'{cls.__module__}:{cls.__qualname__}',
+                                    'attrs': {key: self.encode(val) for key, val
+                                              in value.__dict__.items()}}
+            return {'__group__': gid}
+        raise NotCacheable(f'cannot cache {type(value).__name__}')
+
+
+class _Decoder:
+    """decode values encoded by _Encoder"""
+    def __init__(self, groups, arrays):
+        self.groups = groups
+        self.arrays = arrays
+        self.objects = {}
+
+    def decode(self, value):
+        if isinstance(value, list):
+            return [self.decode(v) for v in value]
+        if not isinstance(value, dict):
+            return value
+        if '__array__' in value:
+            return self.arrays[value['__array__']]
+        if '__scalar__' in value:
+            return self.arrays[value['__scalar__']][()]
+        if '__complex__' in value:
+            return complex(*value['__complex__'])
+        if '__bytes__' in value:
+            return value['__bytes__'].encode('latin-1')
+        if '__tuple__' in value:
+            return tuple(self.decode(v) for v in value['__tuple__'])
+        if '__dict__' in value:
+            out = OrderedDict() if value['ordered'] else {}
+            for key, val in value['__dict__']:
+                out[self.decode(key)] = self.decode(val)
+            return out
+        gid = value['__group__']
+        if gid not in self.objects:
+            gdat = self.groups[gid]
+            modname, clsname = gdat['class'].split(':')
+            cls = getattr(importlib.import_module(modname), clsname)
+            if not issubclass(cls, Group):
+                raise TypeError(f'{cls} is not a Group')
+            obj = self.objects[gid] = cls.__new__(cls)
+            for key, val in gdat['attrs'].items():
+                obj.__dict__[key] = self.decode(val)
+        return self.objects[gid]
+
+
+def _cache_key(reader, filename, options):
+    """return key and description for a file and reader options,
+    or None if the file is not to be cached"""
+    if not PARSE_CACHE.enabled or not isinstance(filename, (str, os.PathLike)):
+        return None, None
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None, None
+    if stat.st_size < PARSE_CACHE.minsize:
+        return None, None
+    desc = {'reader': reader, 'filename': os.path.abspath(filename),
+            'size': stat.st_size, 'mtime': stat.st_mtime_ns,
+            'options': repr(sorted(options.items())),
+            'version': larch_version}
+    key = hashlib.sha1(json.dumps(desc, sort_keys=True).encode('utf-8'))
+    return key.hexdigest(), desc
+
+
+def _cache_path(key):
+    return os.path.join(PARSE_CACHE.directory, f'{key}.npz')
+
+
+def load_cached(key):
+    """return value saved in the parse cache for a key, or None"""
+    path = _cache_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {k: npz[k] for k in npz.files}
+        meta = json.loads(str(arrays.pop(META)))
+        value = _Decoder(meta['groups'], arrays).decode(meta['value'])
+        os.utime(path)
+    except Exception:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        return None
+    return value
+
+
+def save_cached(key, desc, value):
+    """save a value to the parse cache, returning whether it was saved"""
+    encoder = _Encoder()
+    try:
+        meta = {'desc': desc, 'value': encoder.encode(value),
+                'groups': encoder.groups}
+    except NotCacheable:
+        return False
+    arrays = encoder.arrays
+    arrays[META] = np.array(json.dumps(meta))
+    try:
+        os.makedirs(PARSE_CACHE.directory, exist_ok=True)
+        path = _cache_path(key)
+        tmpfile = f'{path}.{os.getpid()}.tmp'
+        with open(tmpfile, 'wb') as fh:
+            np.savez(fh, **arrays)
+        os.replace(tmpfile, path)
+    except OSError:
+        return False
+    _evict(keep=path)
+    return True
+
+
+def _cache_files():
+    "list of (path, size, mtime) for cache files, oldest first"
+    out = []
+    if os.path.isdir(PARSE_CACHE.directory):
+        for entry in os.scandir(PARSE_CACHE.directory):
+            if entry.name.endswith('.npz'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                out.append((entry.path, stat.st_size, stat.st_mtime))
+    return sorted(out, key=lambda x: x[2])
+
+
+def _evict(keep=None):
+    "remove least recently used cache files to keep under maxsize"
+    files = _cache_files()
+    total = sum(f[1] for f in files)
+    for path, size, mtime in files:
+        if total <= PARSE_CACHE.maxsize:
+            break
+        if path != keep:
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def parse_cached(reader):
+    """decorator for file readers, using the parse cache for the Group
+    read from a file with the same reader options.
+
+    The first argument of the reader must be the file name.  For arguments
+    starting with '_' (such as _larch), only whether they are None is used
+    as a reader option.
+    """
+    sig = inspect.signature(reader)
+
+    @wraps(reader)
+    def cached_reader(*args, **kws):
+        bound = sig.bind(*args, **kws)
+        bound.apply_defaults()
+        options = OrderedDict(bound.arguments)
+        filename = options.pop(next(iter(sig.parameters)))
+        options = {k: (v is not None) if k.startswith('_') else v
+                   for k, v in options.items()}
+        key, desc = _cache_key(reader.__name__, filename, options)
+        if key is not None:
+            out = load_cached(key)
+            if out is not None:
+                return out
+        out = reader(*args, **kws)
+        if key is not None:
+            save_cached(key, desc, out)
+        return out
+    return cached_reader
+
+
+def parse_cache_info():
+    """show information about the cache of Groups read from data files
+
+    Returns:
+      Group with directory, enabled, maxsize, minsize, nfiles, size, and
+      files: a list of (reader, filename, cache size) for cached files,
+      most recently used last.
+    """
+    files = []
+    for path, size, mtime in _cache_files():
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                desc = json.loads(str(npz[META]))['desc']
+            files.append((desc['reader'], desc['filename'], size))
+        except Exception:
+            pass
+    return Group(name='parse cache', directory=PARSE_CACHE.directory,
+                 enabled=PARSE_CACHE.enabled, maxsize=PARSE_CACHE.maxsize,
+                 minsize=PARSE_CACHE.minsize, nfiles=len(files),
+                 size=sum(f[2] for f in files), files=files)
+
+
+def clear_parse_cache(filename=None):
+    """clear the cache of Groups read from data files
+
+    Arguments:
+      filename (str or None):  name of data file to remove cached Groups
+                               for, or None to remove all [None]
+
+    Returns:
+      number of cached Groups removed
+    """
+    if filename is not None:
+        filename = os.path.abspath(filename)
+    count = 0
+    for path, size, mtime in _cache_files():
+        if filename is not None:
+            try:
+                with np.load(path, allow_pickle=False) as npz:
+                    desc = json.loads(str(npz[META]))['desc']
+            except Exception:
+                continue
+            if desc['filename'] != filename:
+                continue
+        try:
+            os.unlink(path)
+            count += 1
+        except OSError:
+            pass
+    return count
+
+
+def set_parse_cache(enabled=None, maxsize=None, minsize=None, directory=None):
+    """set options for the cache of Groups read from data files
+
+    Arguments:
+      enabled (bool or None):  whether to use the cache
+      maxsize (int or None):   maximum total size in bytes of cached files,
+                               removing the least recently used [500 Mb]
+      minsize (int or None):   minimum size in bytes of data files to cache [32 kb]
+      directory (str or None): directory for cached files [parse_cache in
+                               the user larch directory]
+
+    Notes:
+      The cache can be disabled by setting the environmental variable
+      LARCH_PARSE_CACHE to '0'.
+    """
+    if enabled is not None:
+        PARSE_CACHE.enabled = bool(enabled)
+    if maxsize is not None:
+        PARSE_CACHE.maxsize = int(maxsize)
+        _evict()
+    if minsize is not None:
+        PARSE_CACHE.minsize = int(minsize)
+    if directory is not None:
+        PARSE_CACHE.directory = os.path.abspath(directory)
@@ -32,6 +32,7 @@ from larch import Group
 from larch.utils.strutils import bytes2str
 from larch.math.normalization import norm1D
 from larch.math.deglitch import remove_spikes_medfilt1d
+from .parsecache import parse_cached
 
 #: Python 3.8+ compatibility
 try:
@@ -1024,6 +1025,7 @@ def open_specfile(filename):
     return DataSourceSpecH5(filename)
 
 
+@parse_cached
 def read_specfile(filename, scan=None):
     """simple mapping of a Spec/BLISS file to a Larch group"""
     df = DataSourceSpecH5(filename)
@@ -13,6 +13,7 @@ from .. import Group
 from ..larchlib import get_dll
 from ..utils.strutils import bytes2str, str2bytes
 from ..utils.physical_constants import RAD2DEG, PLANCK_HC
+from .parsecache import parse_cached
 
 class XDIFileStruct(Structure):
     "emulate XDI File"
@@ -249,6 +250,7 @@ class XDIFile(object):
                 self.irefer = self.itrans * exp(-self.murefer)
 
 
+@parse_cached
 def read_xdi(filename, labels=None):
     """read an XDI File into a Group
 
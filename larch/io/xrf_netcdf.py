@@ -64,104 +64,143 @@ class xMAPData(object):
 
 CLOCKTICK = 0.320  # xmap clocktick = 320 ns
 
+BUFFER_HEADER_SIZE = 256
+PIXEL_HEADER_SIZE = 256
+
+def xmap_pixel_dtype(blocksize):
+    """numpy dtype for one pixel block of an xMAP mapping buffer of 16-bit words:
+    pixel header, acquisition times and i/o counts (as pairs of words, low word
+    first, for 4 values each of the 4 channels), and data"""
+    return np.dtype([('header', '>i2', (32,)),
+                     ('times',  '>u2', (4, 4, 2)),
+                     ('data',   '>i2', (blocksize-64,))])
+
+def xmap_buffer_dtype(buffersize, modpixs):
+    """numpy dtype for an xMAP mapping buffer of 16-bit words:
+    buffer header and modpixs pixel blocks"""
+    blocksize = (buffersize - BUFFER_HEADER_SIZE) // modpixs
+    return np.dtype([('header', '>i2', (BUFFER_HEADER_SIZE,)),
+                     ('pixels', xmap_pixel_dtype(blocksize), (modpixs,))])
+
+def _words2long(words):
+    "convert (..., 2) array of 16-bit words, low word first, to int32"
+    words = np.ascontiguousarray(words, dtype='<u2')
+    return words.view('<i4')[..., 0].astype(np.int32, copy=False)
+
+def _pixel_values(field, use, dtype):
+    """copy a field of the pixel blocks, with shape (narrays, nmodules,
+    modpixs, ...), for the pixels in use to an array of dtype with shape
+    (npixels, nmodules, ...)"""
+    shape = field.shape
+    out = np.empty((shape[0], shape[2], shape[1]) + shape[3:], dtype=dtype)
+    out[...] = field.swapaxes(1, 2)
+    out = out.reshape((shape[0]*shape[2], shape[1]) + shape[3:])
+    use = use.ravel()
+    npix = use.sum()
+    if use[:npix].all():
+        return out[:npix]
+    return out[use]
+
+def decode_xmap_buffers(array_data):
+    """decode array of xMAP mapping buffers, as read from the
+    array_data variable of a netCDF file, to xMAPData
+
+    array_data can be 1d, 2d, or 3d (narrays, nmodules, buffersize) and
+    may be a memory-mapped array.  The buffers are viewed with a structured
+    dtype, and counts and times are copied for all buffers at once.
+    """
+    # array_data will normally be 3d:
+    #  shape = (narrays, nmodules, buffersize)
+    # but nmodules and narrays could be 1, so that
+    # array_data could be 1d or 2d.
+    #
+    # here we force the data to be 3d
+    array_data = np.asarray(array_data)
+    if array_data.ndim == 1:
+        array_data = array_data.reshape((1, 1, array_data.shape[0]))
+    elif array_data.ndim == 2:
+        array_data = array_data.reshape((1,) + array_data.shape)
+    array_data = np.ascontiguousarray(array_data, dtype='>i2')
+    narrays, nmodules, buffersize = array_data.shape
+    modpixs = int(max(124, array_data[0, 0, 8]))
+    buffers = array_data.view(xmap_buffer_dtype(buffersize, modpixs))[..., 0]
+    pixels = buffers['pixels']
+
+    # pixels in use in the buffers for each array, from module 0
+    npix = buffers['header'][:, 0, 8].astype(int)
+    use = np.arange(modpixs) < npix[:, np.newaxis]
+    npix_total = int(use.sum())
+
+    # mapping mode and number of channels (or ROIs for ROI mode)
+    # from the first pixel and buffer
+    mapmode = array_data[0, 0, BUFFER_HEADER_SIZE+3]
+    if mapmode == 1:  # mapping, full spectra
+        nchans = int(array_data[0, 0, 20])
+    elif mapmode == 2:  # ROI mode
+        # Note:  nchans = number of ROIS !!
+        nchans = int(max(array_data[0, 0, 264:268]))
+    else:
+        raise ValueError('unsupported xMAP mapping mode %d' % mapmode)
+
+    xmapdat = xMAPData(0, nmodules, nchans)
+    xmapdat.firstPixel = int(_words2long(array_data[0, 0, 9:11]))
+    xmapdat.numPixels = npix_total
+    ndet = 4*nmodules
+
+    # acquistion times and i/o counts data are stored
+    # as longs in pixel header words 32:64
+    times = _words2long(_pixel_values(pixels['times'], use, '<u2'))
+    times = times.reshape(npix_total, ndet, 4)
+    xmapdat.realTime     = CLOCKTICK * times[:, :, 0].astype('i8')
+    xmapdat.liveTime     = CLOCKTICK * times[:, :, 1].astype('i8')
+    xmapdat.inputCounts  = times[:, :, 2].copy()
+    xmapdat.outputCounts = times[:, :, 3].copy()
+
+    # the data, starting at pixel word 256 for spectra,
+    # or pixel word 64 for ROIs (as longs)
+    data = pixels['data']
+    if mapmode == 1:
+        offset = PIXEL_HEADER_SIZE - 64
+        counts = _pixel_values(data[..., offset:offset+4*nchans], use, 'i2')
+    else:
+        counts = _pixel_values(data[..., :8*nchans], use, '<u2')
+        counts = _words2long(counts.reshape(npix_total, nmodules, 4*nchans, 2))
+        counts = counts.astype('i2')
+    xmapdat.counts = counts.reshape(npix_total, ndet, nchans)
+    return xmapdat
+
 def read_xrf_netcdf(fname, npixels=None, verbose=False):
     # Reads a netCDF file created with the DXP xMAP driver
     # with the netCDF plugin buffers
     if verbose:
         print( ' reading ', fname)
     t0 = time.time()
-    # read data from array_data variable of netcdf file
-    read_ok = False
+    # read data from array_data variable of netcdf file,
+    # memory-mapped if possible
     fh = None
-    try:
-        fh = netcdf_open(fname,'r')
-        read_ok = True
-    except:
-        time.sleep(0.010)
+    for mmap in (True, False, False):
         try:
-            fh = netcdf_open(fname,'r')
-            read_ok = True
+            fh = netcdf_open(fname, 'r', mmap=mmap)
+            break
         except:
-            pass
-
-    if not read_ok or fh is None:
-        if fh is not None:
-            fh.close()
+            time.sleep(0.010)
+    if fh is None:
         return None
 
-    array_data = fh.variables['array_data']
+    array_data = fh.variables['array_data'].data
     t1 = time.time()
-
-    # array_data will normally be 3d:
-    #  shape = (narrays, nmodules, buffersize)
-    # but nmodules and narrays could be 1, so that
-    # array_data could be 1d or 2d.
-    #
-    # here we force the data to be 3d
-    shape = array_data.shape
-    if len(shape) == 1:
-        array_data.shape = (1, 1, shape[0])
-    elif len(shape) == 2:
-        array_data.shape = (1, shape[0], shape[1])
-
-    narrays, nmodules, buffersize = array_data.shape
-    modpixs    = int(max(124, array_data[0, 0, 8]))
-    npix_total = 0
-    # real / live times are returned in microseconds.
-    for array in range(narrays):
-        for module in range(nmodules):
-            d   = array_data[array,module, :]
-            bh  = xMAPBufferHeader(d)
-            #if verbose and array==0:
-            dat = d[256:].reshape(modpixs, int((d.size-256)/modpixs ))
-
-            npix = bh.numPixels
-            if module == 0:
-                npix_total += npix
-                if array == 0:
-                    # first time through, (array,module)=(0,0) we
-                    # read mapping mode, set up how to slice the
-                    # data, and build data arrays in xmapdat
-                    mapmode = dat[0, 3]
-                    if mapmode == 1:  # mapping, full spectra
-                        nchans = d[20]
-                        data_slice = slice(256, 8448)
-                    elif mapmode == 2:  # ROI mode
-                        # Note:  nchans = number of ROIS !!
-                        nchans     = max(d[264:268])
-                        data_slice = slice(64, 64+8*nchans)
-                    xmapdat = xMAPData(narrays*modpixs, nmodules, nchans)
-                    xmapdat.firstPixel = bh.startingPixel
-
-            # acquistion times and i/o counts data are stored
-            # as longs in locations 32:64
-            t_times = aslong(dat[:npix, 32:64]).reshape(npix, 4, 4)
-            p1 = npix_total - npix
-            p2 = npix_total
-            xmapdat.realTime[p1:p2, :]     = t_times[:, :, 0]
-            xmapdat.liveTime[p1:p2, :]     = t_times[:, :, 1]
-            xmapdat.inputCounts[p1:p2, :]  = t_times[:, :, 2]
-            xmapdat.outputCounts[p1:p2, :] = t_times[:, :, 3]
-
-            # the data, extracted as per data_slice and mapmode
-            t_data = dat[:npix, data_slice]
-            if mapmode == 2:
-                t_data = aslong(t_data)
-            xmapdat.counts[p1:p2, :, :] = t_data.reshape(npix, 4, nchans)
+    try:
+        xmapdat = decode_xmap_buffers(array_data)
+    finally:
+        del array_data
+        fh.close()
 
     t2 = time.time()
-    xmapdat.numPixels = npix_total
-    xmapdat.counts    = xmapdat.counts[:npix_total]
-    xmapdat.realTime = CLOCKTICK * xmapdat.realTime[:npix_total]
-    xmapdat.liveTime = CLOCKTICK * xmapdat.liveTime[:npix_total]
-    xmapdat.inputCounts  = xmapdat.inputCounts[:npix_total]
-    xmapdat.outputCounts = xmapdat.outputCounts[:npix_total]
     if verbose:
         print('   time to read file    = %5.1f ms' % ((t1-t0)*1000))
         print('   time to extract data = %5.1f ms' % ((t2-t1)*1000))
-        print('   read %i pixels ' %  npix_total)
+        print('   read %i pixels ' %  xmapdat.numPixels)
         print('   data shape:    ' ,  xmapdat.counts.shape)
-    fh.close()
     return xmapdat
 
 def test_read(fname):
@@ -11,25 +11,17 @@ import os
 
 from .. import Group
 
+from ..xrf.deadtime import DEADTIME_TAUS, detector_taus, solve_icr
+
 # Default tau values for xspress3
 
 ## XSPRESS3_TAUS = [109.e-9, 91.e-9, 99.e-9, 98.e-9]
-XSPRESS3_TAUS = [100.e-9, 100.e-9, 100.e-9, 100.e-9]
+XSPRESS3_TAUS = DEADTIME_TAUS['xspress3']
 
 def estimate_icr(ocr, tau, niter=3):
-    "estimate icr from ocr and tau"
-    maxicr = 1.0/tau
-    maxocr = 1/(tau*np.exp(1.0))
-    ocr[np.where(ocr>2*maxocr)[0]] = 2*maxocr
-    icr = 1.0*ocr
-    for c in range(niter):
-        delta = (icr - ocr*np.exp(icr*tau))/(icr*tau - 1)
-        delta[np.where(delta < 0)[0]] = 0.0
-        icr = icr + delta
-        icr[np.where(icr>5*maxicr)[0]] = 5*maxicr
-    #endfor
-    return icr
-#enddef
+    """estimate icr from ocr and tau, using the closed form solution
+    of larch.xrf.deadtime.solve_icr (niter is not used)"""
+    return solve_icr(ocr, tau, method='lambertw')[0]
 
 
 class XSP3Data(object):
@@ -187,10 +179,11 @@ def read_xsp3_hdf5(fname, npixels=None, verbose=False,
         dtfactor = clock_ticks/denom
         out.inputCounts[:, i] = dtfactor * ocounts
 
-        if estimate_dtc:
-            ocr = ocounts/(rtime*1.e-6)
-            icr = estimate_icr(ocr, dtc_taus[i], niter=3)
-            out.inputCounts[:, i] = icr * (rtime*1.e-6)
+    if estimate_dtc:
+        rtime = out.realTime*1.e-6
+        icr, converged = solve_icr(out.outputCounts/rtime, detector_taus(dtc_taus, ndet),
+                                   method='lambertw')
+        out.inputCounts = icr * rtime
 
     h5file.close()
     t2 = time.time()
@@ -15,8 +15,10 @@ from .lineshapes import (gaussian, lorentzian, voigt, pvoigt, hypermet,
 
 from .fitpeak import fit_peak
 from .convolution1D import glinbroad
-from .lincombo_fitting import lincombo_fit, lincombo_fitall, groups2matrix
-from .pca import pca_train, pca_fit, nmf_train, save_pca_model, read_pca_model
+from .lincombo_fitting import (lincombo_fit, lincombo_fitall, lincombo_fit_batch,
+                               groups2matrix)
+from .pca import (pca_train, pca_train_array, pca_fit, pca_fit_batch, nmf_train,
+                  save_pca_model, read_pca_model)
 from .learn_regress import pls_train, pls_predict, lasso_train, lasso_predict
 from .gridxyz import gridxyz
 from .spline import spline_rep, spline_eval
@@ -34,7 +36,9 @@ _larch_builtins = {'_math': dict(linregress=linregress, polyfit=np.polyfit,
                                  smooth=smooth, boxcar=boxcar,
                                  glinbroad=glinbroad, gridxyz=gridxyz,
                                  pca_train=pca_train,
+                                 pca_train_array=pca_train_array,
                                  pca_fit=pca_fit,
+                                 pca_fit_batch=pca_fit_batch,
                                  save_pca_model=save_pca_model,
                                  read_pca_model=read_pca_model,
                                  nmf_train=nmf_train,
@@ -46,6 +50,7 @@ _larch_builtins = {'_math': dict(linregress=linregress, polyfit=np.polyfit,
                                  fit_peak=fit_peak,
                                  lincombo_fit=lincombo_fit,
                                  lincombo_fitall=lincombo_fitall,
+                                 lincombo_fit_batch=lincombo_fit_batch,
                                  spline_rep=spline_rep,
                                  spline_eval=spline_eval,
                                  gaussian=gaussian,
@@ -9,6 +9,7 @@ import json
 import copy
 
 from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
 from collections import OrderedDict
 from glob import glob
 
@@ -147,6 +148,19 @@ def lincombo_fit(group, components, weights=None, minvals=None,
 
     ydat   = yall[0, :]
     ycomps = yall[1:, :].transpose()
+    labels = [get_label(comp) for comp in components]
+    return _lincombo_fit_arrays(xdat, ydat, ycomps, labels, weights=weights,
+                                minvals=minvals, maxvals=maxvals,
+                                arrayname=arrayname, xmin=xmin, xmax=xmax,
+                                sum_to_one=sum_to_one, vary_e0=vary_e0)
+
+def _lincombo_fit_arrays(xdat, ydat, ycomps, labels, weights=None,
+                         minvals=None, maxvals=None, arrayname='norm',
+                         xmin=-np.inf, xmax=np.inf, sum_to_one=True,
+                         vary_e0=False):
+    """linear combination fit of ydat with the columns of ycomps,
+    as for lincombo_fit() but with data already on a common x grid"""
+    ncomps = len(labels)
 
     # second use unconstrained linear algebra to estimate weights
     ls_out = np.linalg.lstsq(ycomps, ydat, rcond=-1)
@@ -190,7 +204,7 @@ def lincombo_fit(group, components, weights=None, minvals=None,
     params, fcomps = OrderedDict(), OrderedDict()
     params['e0_shift'] = copy.deepcopy(result.params['e0_shift'])
     for i in range(ncomps):
-        label = get_label(components[i])
+        label = labels[i]
         weights[label] = result.params['c%i' % i].value
         params[label] = copy.deepcopy(result.params['c%i' % i])
         weights_lstsq[label] = ls_vals[i]
@@ -213,10 +227,101 @@ def lincombo_fit(group, components, weights=None, minvals=None,
                  arrayname=arrayname, rfactor=rfactor,
                  xmin=xmin, xmax=xmax)
 
+def _lincombo_qp(gram, gvec, minvals, maxvals, sum_to_one=True, maxiter=None):
+    """bounded least-squares weights from a Gram matrix, by an active-set
+    method:  minimize  w.gram.w/2 - gvec.w  for  minvals <= w <= maxvals,
+    with sum(w) = 1 if sum_to_one.
+
+    returns weights, or None if the bounds cannot be met
+    """
+    ncomps = len(gvec)
+    lo = np.asarray(minvals, dtype=float)
+    hi = np.asarray(maxvals, dtype=float)
+    if maxiter is None:
+        maxiter = 20*(ncomps+1)
+
+    # feasible starting point
+    if sum_to_one:
+        w = np.clip(np.ones(ncomps)/ncomps, lo, hi)
+        resid = 1.0 - w.sum()
+        for i in range(ncomps):
+            step = min(resid, hi[i]-w[i]) if resid > 0 else max(resid, lo[i]-w[i])
+            w[i] += step
+            resid -= step
+        if abs(resid) > 1.e-12:
+            return None
+    else:
+        w = np.clip(np.zeros(ncomps), lo, hi)
+
+    active = {}  # index: +1 at upper bound, -1 at lower bound
+    for _ in range(maxiter):
+        free = [i for i in range(ncomps) if i not in active]
+        fixd = list(active.keys())
+        # solve equality-constrained problem for free weights
+        wfree = w[free]
+        if len(free) > 0:
+            rhs = gvec[free] - gram[np.ix_(free, fixd)].dot(w[fixd])
+            gff = gram[np.ix_(free, free)]
+            if sum_to_one:
+                nfree = len(free)
+                kkt = np.ones((nfree+1, nfree+1))
+                kkt[:nfree, :nfree] = gff
+                kkt[nfree, nfree] = 0.0
+                rhs = np.append(rhs, 1.0 - w[fixd].sum())
+                wfree = np.linalg.lstsq(kkt, rhs, rcond=None)[0][:nfree]
+            else:
+                wfree = np.linalg.lstsq(gff, rhs, rcond=None)[0]
+        step = wfree - w[free]
+
+        if np.abs(step).max(initial=0) <= 1.e-13*(1+np.abs(w).max()):
+            # check multipliers for bounds in the active set
+            grad = gram.dot(w) - gvec
+            tol = 1.e-10*(1 + np.abs(grad).max())
+            nu = 0.0
+            if sum_to_one:
+                if len(free) > 0:
+                    nu = grad[free].mean()
+                else:
+                    glo = [grad[i] for i in fixd if active[i] < 0]
+                    ghi = [grad[i] for i in fixd if active[i] > 0]
+                    if len(glo) > 0 and len(ghi) > 0:
+                        nu = (min(glo) + max(ghi))/2.0
+                    elif len(glo) > 0:
+                        nu = min(glo)
+                    elif len(ghi) > 0:
+                        nu = max(ghi)
+            worst, lmin = None, -tol
+            for i in fixd:
+                lam = -active[i]*(grad[i] - nu)
+                if lam < lmin:
+                    worst, lmin = i, lam
+            if worst is None:
+                return w
+            active.pop(worst)
+            continue
+
+        # step towards solution, stopping at the first bound hit
+        alpha, block = 1.0, None
+        for j, i in enumerate(free):
+            if step[j] < 0 and lo[i] > -np.inf:
+                a, bound = (lo[i] - w[i])/step[j], -1
+            elif step[j] > 0 and hi[i] < np.inf:
+                a, bound = (hi[i] - w[i])/step[j], 1
+            else:
+                continue
+            if a < alpha:
+                alpha, block = max(a, 0.0), (i, bound)
+        w[free] += alpha*step
+        if block is not None:
+            i, bound = block
+            w[i] = hi[i] if bound > 0 else lo[i]
+            active[i] = bound
+    return w
+
 def lincombo_fitall(group, components, weights=None, minvals=None, maxvals=None,
                     arrayname='norm', xmin=-np.inf, xmax=np.inf,
                     max_ncomps=None, sum_to_one=True, vary_e0=False,
-                    min_weight=0.0005, max_output=16):
+                    min_weight=0.0005, max_output=16, workers=1):
     """perform linear combination fittings for a group with all combinations
     of 2 or more of the components given
 
@@ -235,6 +340,7 @@ def lincombo_fitall(group, components, weights=None, minvals=None, maxvals=None,
       vary_e0     bool, whether to vary e0 for data in fit [False]
       min_weight  float, minimum weight for each component to save result [0.0005]
       max_output  int, max number of outputs, sorted by reduced chi-square [16]
+      workers     int, number of processes for fits with vary_e0 [1]
     Returns
     -------
      list of groups with resulting weights and fit statistics, ordered by
@@ -245,6 +351,12 @@ def lincombo_fitall(group, components, weights=None, minvals=None, maxvals=None,
      1.  The names of Group members for the components must match those of the
          group to be fitted.
      2.  arrayname can be one of `norm` or `dmude`
+     3.  The data and all components are put on a common x grid once.
+         Without vary_e0, the weights for each combination are found by
+         bounded least-squares from the Gram matrix of the components, and
+         only the best combinations are refined with lmfit to give the
+         output groups.  With vary_e0, each combination is fit with lmfit,
+         in a pool of `workers` processes if workers > 1.
     """
 
     ncomps = len(components)
@@ -259,40 +371,176 @@ def lincombo_fitall(group, components, weights=None, minvals=None, maxvals=None,
         minvals = -np.inf * np.ones(ncomps)
     if maxvals in (None, [None]*ncomps):
         maxvals = np.inf * np.ones(ncomps)
+    minvals = [-np.inf if v is None else v for v in minvals]
+    maxvals = [np.inf if v is None else v for v in maxvals]
 
+    labels = [get_label(c) for c in components]
     for i in range(ncomps):
-        _save[get_label(components[i])] = (weights[i], minvals[i], maxvals[i])
+        _save[labels[i]] = (weights[i], minvals[i], maxvals[i])
 
     if max_ncomps is None:
         max_ncomps = ncomps
     elif max_ncomps > 0:
         max_ncomps = int(min(max_ncomps, ncomps))
+
+    allgroups = [group]
+    allgroups.extend(components)
+    xdat, yall = groups2matrix(allgroups, yname=arrayname,
+                               xname='energy', xmin=xmin, xmax=xmax)
+    ydat   = yall[0, :]
+    ycomps = yall[1:, :].transpose()
+    npts = len(ydat)
+
+    opts = dict(arrayname=arrayname, xmin=xmin, xmax=xmax,
+                sum_to_one=sum_to_one, vary_e0=vary_e0)
+    def fit_args(icomps):
+        return (xdat, ydat, ycomps[:, icomps], [labels[i] for i in icomps])
+
+    def fit_kws(icomps, wts):
+        kws = dict(weights=wts, minvals=[minvals[i] for i in icomps],
+                   maxvals=[maxvals[i] for i in icomps])
+        kws.update(opts)
+        return kws
+
+    combos = []
+    for nx in range(2, int(max_ncomps)+1):
+        combos.extend(combinations(range(ncomps), nx))
+
     out = []
     nrejected = 0
     comps_kept = []
-    for nx in range(2, int(max_ncomps)+1):
-        for comps in combinations(components, nx):
-            labs = [get_label(c) for c in comps]
-            _wts = [1.0/nx for lab in labs]
-            _min = [_save[lab][1] for lab in labs]
-            _max = [_save[lab][2] for lab in labs]
-
-            ret = lincombo_fit(group, comps, weights=_wts,
-                               arrayname=arrayname, minvals=_min,
-                               maxvals=_max, xmin=xmin, xmax=xmax,
-                               sum_to_one=sum_to_one, vary_e0=vary_e0)
-
-            _sig_comps = []
-            for key, wt in ret.weights.items():
-                if wt > min_weight:
-                    _sig_comps.append(key)
-            _sig_comps.sort()
+    if vary_e0:
+        jobs = [(fit_args(c), fit_kws(c, [1.0/len(c)]*len(c)))
+                for c in combos]
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_lincombo_fit_arrays, *args, **kws)
+                           for args, kws in jobs]
+                results = [f.result() for f in futures]
+        else:
+            results = [_lincombo_fit_arrays(*args, **kws) for args, kws in jobs]
+        for ret in results:
+            _sig_comps = sorted([key for key, wt in ret.weights.items()
+                                 if wt > min_weight])
             if _sig_comps not in comps_kept:
                 comps_kept.append(_sig_comps)
                 out.append(ret)
             else:
                 nrejected += 1
+        return sorted(out, key=lambda x: x.redchi)[:max_output]
+
+    gram = ycomps.T.dot(ycomps)
+    gvec = ycomps.T.dot(ydat)
+    ysq  = ydat.dot(ydat)
+    for icomps in combos:
+        sel = list(icomps)
+        wts = _lincombo_qp(gram[np.ix_(sel, sel)], gvec[sel],
+                           [minvals[i] for i in sel],
+                           [maxvals[i] for i in sel], sum_to_one=sum_to_one)
+        if wts is None:   # bounds cannot be met, use lmfit
+            ret = _lincombo_fit_arrays(*fit_args(sel),
+                                       **fit_kws(sel, [1.0/len(sel)]*len(sel)))
+            wts = np.array(list(ret.weights.values()))
+        chisqr = max(0.0, wts.dot(gram[np.ix_(sel, sel)]).dot(wts) -
+                     2*wts.dot(gvec[sel]) + ysq)
+        nvarys = len(sel) - 1 if sum_to_one else len(sel)
+        redchi = chisqr / max(1, npts - nvarys)
+        _sig_comps = sorted([labels[i] for i, wt in zip(sel, wts)
+                             if wt > min_weight])
+        if _sig_comps not in comps_kept:
+            comps_kept.append(_sig_comps)
+            out.append((redchi, sel, wts))
+        else:
+            nrejected += 1
 
+    # refine best combinations with lmfit, starting from the solution
+    out = sorted(out, key=lambda x: x[0])[:max_output]
+    out = [_lincombo_fit_arrays(*fit_args(sel), **fit_kws(sel, list(wts)))
+           for redchi, sel, wts in out]
     # sort outputs by reduced chi-square
     # print("lin combo : ", len(out), nrejected, max_output)
-    return sorted(out, key=lambda x: x.redchi)[:max_output]
+    return sorted(out, key=lambda x: x.redchi)
+
+def lincombo_fit_batch(groups, components, minvals=None, maxvals=None,
+                       arrayname='norm', xmin=-np.inf, xmax=np.inf,
+                       sum_to_one=True):
+    """perform linear combination fitting for many groups with the
+    same set of components
+
+    Arguments
+    ---------
+      groups      list of Groups to be fitted
+      components  list of groups to use as components
+      minvals     array of min weights (or None to mean -inf)
+      maxvals     array of max weights (or None to mean +inf)
+      arrayname   string of array name to be fit ['norm']
+      xmin        x-value for start of fit range [-inf]
+      xmax        x-value for end of fit range [+inf]
+      sum_to_one  bool, whether to force weights to sum to 1.0 [True]
+
+    Returns
+    -------
+     group with a table of results, with members
+        labels      list of labels for the groups fitted
+        components  list of labels for the components
+        weights     array (ngroups, ncomps) of weights
+        chisqr      array (ngroups,) of chi-square
+        redchi      array (ngroups,) of reduced chi-square
+        rfactor     array (ngroups,) of R-factor
+        xdata       x array for the fit
+        ydata       array (ngroups, npts) of data fitted
+        ycomps      array (npts, ncomps) of components
+
+    Notes
+    -----
+     1.  All groups and components are interpolated onto the x array of the
+         first group, between xmin and xmax.
+     2.  The component matrix is factored once, and the weights for all groups
+         are found together.  Groups for which those weights are outside the
+         bounds are solved by bounded least-squares.
+     3.  No uncertainties are given for the weights: use lincombo_fit() for
+         individual groups.
+    """
+    ngroups, ncomps = len(groups), len(components)
+    if minvals in (None, [None]*ncomps):
+        minvals = -np.inf * np.ones(ncomps)
+    if maxvals in (None, [None]*ncomps):
+        maxvals = np.inf * np.ones(ncomps)
+    minvals = np.array([-np.inf if v is None else v for v in minvals])
+    maxvals = np.array([np.inf if v is None else v for v in maxvals])
+
+    allgroups = list(groups)
+    allgroups.extend(components)
+    xdat, yall = groups2matrix(allgroups, yname=arrayname,
+                               xname='energy', xmin=xmin, xmax=xmax)
+    ydat   = yall[:ngroups, :]
+    ycomps = yall[ngroups:, :].transpose()
+
+    # least-squares weights for all groups from the QR factorization,
+    # and the correction for sum(weights) = 1
+    qmat, rmat = np.linalg.qr(ycomps)
+    weights = np.linalg.solve(rmat, qmat.T.dot(ydat.T)).T
+    if sum_to_one:
+        rinv = np.linalg.inv(rmat)
+        gone = rinv.dot(rinv.T.dot(np.ones(ncomps)))   # inv(A^T A).1
+        weights += np.outer(1 - weights.sum(axis=1), gone/gone.sum())
+
+    gram = ycomps.T.dot(ycomps)
+    for i in np.where(((weights < minvals) | (weights > maxvals)).any(axis=1))[0]:
+        wts = _lincombo_qp(gram, ycomps.T.dot(ydat[i]), minvals, maxvals,
+                           sum_to_one=sum_to_one)
+        if wts is None:
+            wts = np.nan * np.ones(ncomps)
+        weights[i] = wts
+
+    resid = weights.dot(ycomps.T) - ydat
+    chisqr = (resid**2).sum(axis=1)
+    nvarys = ncomps - 1 if sum_to_one else ncomps
+    redchi = chisqr / max(1, len(xdat) - nvarys)
+    rfactor = chisqr / (ydat**2).sum(axis=1)
+    return Group(labels=[get_label(g) for g in groups],
+                 components=[get_label(c) for c in components],
+                 weights=weights, chisqr=chisqr, redchi=redchi,
+                 rfactor=rfactor, xdata=xdat, ydata=ydat, ycomps=ycomps,
+                 arrayname=arrayname, xmin=xmin, xmax=xmax,
+                 sum_to_one=sum_to_one)
@@ -18,7 +18,7 @@ try:
 except ImportError:
     HAS_SKLEARN = False
 
-from lmfit import minimize, Parameters
+from scipy.interpolate import make_interp_spline
 
 from .. import Group
 from .utils import interp, index_of
@@ -114,7 +114,8 @@ def pca_athena(groups, arrayname='norm', subtract_mean=True,
     evec = np.dot(data, var)[:, iorder]
     return evec, evals
 
-def pca_train(groups, arrayname='norm', xmin=-np.inf, xmax=np.inf):
+def pca_train(groups, arrayname='norm', xmin=-np.inf, xmax=np.inf,
+              ncomps=None, chunksize=None):
     """use a list of data groups to train a Principal Component Analysis
 
     Arguments
@@ -123,6 +124,8 @@ def pca_train(groups, arrayname='norm', xmin=-np.inf, xmax=np.inf):
       arrayname   string of array name to be fit (see Note 2) ['norm']
       xmin        x-value for start of fit range [-inf]
       xmax        x-value for end of fit range [+inf]
+      ncomps      number of components to calculate [None, all]
+      chunksize   number of spectra to use at a time [None, all]
 
     Returns
     -------
@@ -133,9 +136,18 @@ def pca_train(groups, arrayname='norm', xmin=-np.inf, xmax=np.inf):
      1.  The group members for the components must match each other
          in data content and array names.
      2.  arrayname can be one of `norm` or `dmude`
+     3.  if ncomps or chunksize is given, the model is calculated with
+         pca_train_array(), see that for details.
     """
     xdat, ydat = groups2matrix(groups, arrayname, xmin=xmin, xmax=xmax)
     labels = [get_label(g) for g  in groups]
+    if ncomps is not None or chunksize is not None:
+        if chunksize is None:
+            chunksize = len(groups)
+        model = pca_train_array(xdat, ydat, ncomps=ncomps, labels=labels,
+                                arrayname=arrayname, chunksize=chunksize)
+        model.xmin, model.xmax = xmin, xmax
+        return model
     narr, nfreq = ydat.shape
 
     ymean = ydat.mean(axis=0)
@@ -149,22 +161,133 @@ def pca_train(groups, arrayname='norm', xmin=-np.inf, xmax=np.inf):
 
     variances = eigval/eigval.sum()
 
-    # calculate IND statistic
-    ind = None
-    for r in range(narr-1):
-        nr = narr - r - 1
-        indval = np.sqrt(nfreq*eigval[r:].sum()/nr)/nr**2
-        if ind is None:
-            ind = [indval]
-        ind.append(indval)
-    ind = np.array(ind)
-
+    ind = _ind_statistic(eigval, narr, nfreq)
     nsig = int(np.argmin(ind))
     return Group(x=xdat, arrayname=arrayname, labels=labels, ydat=ydat,
                  xmin=xmin, xmax=xmax, mean=ymean, components=eigvec,
                  eigenvalues=eigval, variances=variances, ind=ind, nsig=nsig)
 
 
+def _ind_statistic(eigval, narr, nfreq, total=None):
+    """IND statistic as used in pca_train, with the first value repeated.
+
+    if eigval holds only the largest eigenvalues, total should be
+    the sum of all eigenvalues, and IND is given only up to len(eigval).
+    """
+    tail = np.cumsum(eigval[::-1])[::-1]
+    if total is not None:
+        rest = max(0.0, total - eigval.sum())
+        tail = np.append(tail + rest, rest)
+    nr = narr - 1 - np.arange(min(len(tail), narr-1))
+    ind = np.sqrt(nfreq*tail[:len(nr)]/nr)/nr**2
+    return np.concatenate((ind[:1], ind))
+
+
+def _pca_chunks(ydat, cols, chunksize, ymean=None):
+    """yield chunks of rows of a (nspectra, nx) array,
+    centered and scaled as in pca_train if ymean is given"""
+    for i0 in range(0, ydat.shape[0], chunksize):
+        ychunk = np.asarray(ydat[i0:i0+chunksize, cols], dtype=np.float64)
+        if ymean is not None:
+            ychunk = ychunk - ymean
+            ychunk = ychunk - ychunk.mean(axis=1)[:, np.newaxis]
+            ychunk = ychunk / ychunk.std(axis=1)[:, np.newaxis]
+        yield ychunk
+
+
+def pca_train_array(x, ydat, ncomps=None, labels=None, arrayname='norm',
+                    xmin=-np.inf, xmax=np.inf, chunksize=4096,
+                    oversample=10, power_iters=3, seed=None):
+    """train a Principal Component Analysis from a 2-D array of spectra
+
+    Arguments
+    ---------
+      x           1-D array of x values (energy)
+      ydat        2-D array (nspectra, len(x)) of spectra, such as
+                  for each pixel of a XANES map.  This can be a
+                  numpy.memmap or HDF5 dataset and is read in chunks.
+      ncomps      number of components to calculate [None, all]
+      labels      list of labels for spectra [None]
+      arrayname   string of array name, for use with pca_fit ['norm']
+      xmin        x-value for start of fit range [-inf]
+      xmax        x-value for end of fit range [+inf]
+      chunksize   number of spectra to read at a time [4096]
+      oversample  number of extra vectors for randomized SVD [10]
+      power_iters number of power iterations for randomized SVD [3]
+      seed        seed for random number generator [None]
+
+    Returns
+    -------
+      group with trained PCA model, to be used with pca_fit
+
+    Notes
+    -----
+     1.  The spectra are normalized as for pca_train(), and the
+         components are scaled the same way, but at most len(x)
+         components are returned.
+     2.  With ncomps=None, or if ncomps+oversample is not less than
+         len(x), the model is exact, using the (nx, nx) covariance
+         accumulated over chunks.  Otherwise only the top ncomps
+         components are found with a randomized SVD, which makes
+         power_iters+2 passes over the data.
+     3.  IND and nsig are found only up to ncomps.
+    """
+    x = np.asarray(x)
+    cols = slice(np.searchsorted(x, xmin, side='left'),
+                 np.searchsorted(x, xmax, side='right'))
+    x = x[cols]
+    narr, nfreq = ydat.shape[0], len(x)
+    chunksize = max(1, int(chunksize))
+
+    ymean = np.zeros(nfreq)
+    for ychunk in _pca_chunks(ydat, cols, chunksize):
+        ymean += ychunk.sum(axis=0)
+    ymean /= narr
+
+    nvec = nfreq
+    if ncomps is not None:
+        ncomps = min(ncomps, nfreq, narr)
+        nvec = ncomps + oversample
+
+    total = 0.0
+    if nvec >= nfreq:
+        gram = np.zeros((nfreq, nfreq))
+        for zchunk in _pca_chunks(ydat, cols, chunksize, ymean=ymean):
+            gram += np.dot(zchunk.T, zchunk)
+        total = np.trace(gram)
+        eigval, qvec = np.linalg.eigh(gram)
+    else:
+        # randomized subspace iteration (Halko, Martinsson, Tropp)
+        rng = np.random.default_rng(seed)
+        qvec = np.linalg.qr(rng.standard_normal((nfreq, nvec)))[0]
+        for i in range(power_iters):
+            yvec = np.zeros((nfreq, nvec))
+            for zchunk in _pca_chunks(ydat, cols, chunksize, ymean=ymean):
+                yvec += np.dot(zchunk.T, np.dot(zchunk, qvec))
+            qvec = np.linalg.qr(yvec)[0]
+        proj = np.zeros((nvec, nvec))
+        for zchunk in _pca_chunks(ydat, cols, chunksize, ymean=ymean):
+            zq = np.dot(zchunk, qvec)
+            proj += np.dot(zq.T, zq)
+            total += (zchunk*zchunk).sum()
+        eigval, wvec = np.linalg.eigh(proj)
+        qvec = np.dot(qvec, wvec)
+
+    eigval, qvec = eigval[::-1], qvec[:, ::-1]
+    nkeep = min(nfreq, narr) if ncomps is None else ncomps
+    eigval = np.clip(eigval[:nkeep], 0, None)
+    components = (qvec[:, :nkeep] * np.sqrt(eigval)).T / narr
+    eigval = eigval / narr
+    total = total / narr
+
+    ind = _ind_statistic(eigval, narr, nfreq, total=total)
+    nsig = int(np.argmin(ind))
+    return Group(x=x, arrayname=arrayname, labels=labels, ydat=ydat,
+                 xmin=xmin, xmax=xmax, mean=ymean, components=components,
+                 eigenvalues=eigval, variances=eigval/total,
+                 ind=ind, nsig=nsig)
+
+
 def save_pca_model(pca_model, filename):
     """save a PCA model to a file"""
     from larch.utils.jsonutils import encode4js
@@ -197,27 +320,52 @@ def pca_statistics(pca_model):
       F1R(r) = eigv[r] / (p+1-r)*(n+1-r) / sum_i=r^n-1 (eigv[i] / ((p+1-i)*(n+1-i)))
     """
     p, n = pca_model.ydat.shape
-    eigv = pca_model.eigenvalues
-    ind, f1r = [], []
-    for r in range(n-1):
-        nr = n-r-1
-        ind.append( np.sqrt(eigv[r:].sum()/ (p*nr))/nr**2)
-        f1sum = 0
-        for i in range(r, n):
-            f1sum += eigv[i]/((p+1-i)*(n+1-i))
-        f1sum = max(1.e-10, f1sum)
-        f1r.append(eigv[r] / (max(1, (p+1-r)*(n-r+1)) * f1sum))
-
-    pca_model.ind = np.array(ind)
-    pca_model.f1r = np.array(f1r)
+    eigv = np.zeros(max(n, len(pca_model.eigenvalues)))
+    eigv[:len(pca_model.eigenvalues)] = pca_model.eigenvalues
+
+    r = np.arange(n-1)
+    nr = n - r - 1
+    ind = np.sqrt(np.cumsum(eigv[::-1])[::-1][:n-1] / (p*nr))/nr**2
+
+    i = np.arange(n)
+    denom = ((p+1-i)*(n+1-i)).astype(np.float64)
+    terms = np.divide(eigv[:n], denom, out=np.zeros(n), where=(eigv[:n] != 0))
+    f1sum = np.maximum(1.e-10, np.cumsum(terms[::-1])[::-1][:n-1])
+    f1r = eigv[:n-1] / (np.maximum(1, (p+1-r)*(n-r+1)) * f1sum)
+
+    pca_model.ind = ind
+    pca_model.f1r = f1r
 
     return pca_model.ind, pca_model.f1r
 
-def _pca_scale_resid(params, ydat=None, pca_model=None, comps=None):
-    scale = params['scale'].value
-    weights, chi2, rank, s = np.linalg.lstsq(comps, ydat*scale-pca_model.mean)
-    yfit = (weights * comps).sum(axis=1) + pca_model.mean
-    return (scale*ydat - yfit)
+def _pca_project(ydat, pca_model, ncomps=None, rescale=True):
+    """project a 2-D array (nspectra, nx) of spectra on the x array
+    of a PCA model onto the first ncomps components.
+
+    the scale factor is found in closed form: with P the projector onto
+    the components and mean the model mean, the residual for scale s is
+    (1-P)(s*y - mean) = s*a - b, which is smallest at s = (a.b)/(a.a)
+
+    returns scale, weights, chi_square
+    """
+    if ncomps is None:
+        ncomps = len(pca_model.components)
+    comps = np.asarray(pca_model.components[:ncomps]).transpose()
+    qmat, rmat = np.linalg.qr(comps)
+    ymean = pca_model.mean
+
+    bvec = ymean - np.dot(qmat, np.dot(qmat.T, ymean))
+    avec = ydat - np.dot(np.dot(ydat, qmat), qmat.T)
+    scale = np.ones(len(ydat))
+    if rescale:
+        asum = (avec*avec).sum(axis=1)
+        ok = asum > 0
+        scale[ok] = np.maximum(0, np.dot(avec[ok], bvec) / asum[ok])
+
+    ynorm = scale[:, np.newaxis]*ydat - ymean
+    weights = np.linalg.solve(rmat, np.dot(ynorm, qmat).T).T
+    resid = scale[:, np.newaxis]*avec - bvec
+    return scale, weights, (resid*resid).sum(axis=1)
 
 
 def pca_fit(group, pca_model, ncomps=None, rescale=True):
@@ -248,7 +396,7 @@ def pca_fit(group, pca_model, ncomps=None, rescale=True):
     xdat, ydat = groups2matrix([group], pca_model.arrayname, xmin=pca_model.xmin, xmax=pca_model.xmax)
 
     if xdat is None or ydat is None:
-        raise ValueError("cannot get arrays for arrayname='%s'" % arrayname)
+        raise ValueError("cannot get arrays for arrayname='%s'" % pca_model.arrayname)
 
     xshape = xdat.shape
     if len(xshape) == 2:
@@ -257,31 +405,84 @@ def pca_fit(group, pca_model, ncomps=None, rescale=True):
     ydat = ydat[0]
     ydat = interp(xdat, ydat, pca_model.x, kind='cubic')
 
-    params = Parameters()
-    params.add('scale', value=1.0, vary=True, min=0)
-
     if ncomps is None:
         ncomps=len(pca_model.components)
     comps = pca_model.components[:ncomps].transpose()
 
-    if rescale:
-        weights, chi2, rank, s = np.linalg.lstsq(comps, ydat-pca_model.mean)
-        yfit = (weights * comps).sum(axis=1) + pca_model.mean
-
-        result = minimize(_pca_scale_resid, params, method='leastsq',
-                          gtol=1.e-5, ftol=1.e-5, xtol=1.e-5, epsfcn=1.e-5,
-                          kws = dict(ydat=ydat, comps=comps, pca_model=pca_model))
-        scale = result.params['scale'].value
-        ydat *= scale
-        weights, chi2, rank, s = np.linalg.lstsq(comps, ydat-pca_model.mean)
-        yfit = (weights * comps).sum(axis=1) + pca_model.mean
-
-    else:
-        weights, chi2, rank, s = np.linalg.lstsq(comps, ydat-pca_model.mean)
-        yfit = (weights * comps).sum(axis=1) + pca_model.mean
-        scale = 1.0
+    scale, weights, chi2 = _pca_project(ydat[np.newaxis, :], pca_model,
+                                        ncomps=ncomps, rescale=rescale)
+    scale, weights = scale[0], weights[0]
+    ydat *= scale
+    yfit = (weights * comps).sum(axis=1) + pca_model.mean
 
     group.pca_result = Group(x=pca_model.x, ydat=ydat, yfit=yfit,
                              pca_model=pca_model, chi_square=chi2[0],
                              data_scale=scale, weights=weights)
     return
+
+
+def pca_fit_batch(ydat, pca_model, ncomps=None, rescale=True, x=None,
+                  chunksize=65536):
+    """
+    fit a stack of spectra, such as a XANES map, to a PCA training model
+
+    Arguments
+    ---------
+      ydat        array of spectra, with the last axis for x or energy.
+                  This can be a numpy.memmap and is read in chunks.
+      pca_model   PCA model as found from pca_train()
+      ncomps      number of components to included
+      rescale     whether to allow data to be renormalized (True)
+      x           x or energy values for ydat [None, the model x]
+      chunksize   number of spectra to fit at a time [65536]
+
+    Returns
+    -------
+      group with the following members, with the shape of ydat
+      without the last axis (the map shape):
+
+          weights    weights for PCA components, shape (..., ncomps)
+          chi_square goodness-of-fit measure
+          data_scale scale factor for data
+          x          x or energy value from model
+          pca_model  the input PCA model
+
+    Notes
+    -----
+     1.  If x is given, the spectra are interpolated onto the model x
+         with cubic splines, as for pca_fit().
+    """
+    shape = ydat.shape
+    mshape, nx = shape[:-1], shape[-1]
+    ydat = ydat.reshape((-1, nx))
+    nspec = ydat.shape[0]
+    if ncomps is None:
+        ncomps = len(pca_model.components)
+    ncomps = min(ncomps, len(pca_model.components))
+
+    if x is None and nx != len(pca_model.x):
+        raise ValueError("ydat does not match x array of PCA model")
+
+    interp_y = None
+    if x is not None:
+        x = np.asarray(x)
+        if len(x) != len(pca_model.x) or not np.allclose(x, pca_model.x):
+            interp_y = lambda y: make_interp_spline(x, y, k=3, axis=1)(pca_model.x)
+
+    weights = np.zeros((nspec, ncomps))
+    chi2 = np.zeros(nspec)
+    scale = np.ones(nspec)
+    chunksize = max(1, int(chunksize))
+    for i0 in range(0, nspec, chunksize):
+        sl = slice(i0, i0+chunksize)
+        ychunk = np.asarray(ydat[sl], dtype=np.float64)
+        if interp_y is not None:
+            ychunk = interp_y(ychunk)
+        scale[sl], weights[sl], chi2[sl] = _pca_project(ychunk, pca_model,
+                                                       ncomps=ncomps,
+                                                       rescale=rescale)
+
+    return Group(x=pca_model.x, pca_model=pca_model,
+                 weights=weights.reshape(mshape + (ncomps,)),
+                 chi_square=chi2.reshape(mshape),
+                 data_scale=scale.reshape(mshape))
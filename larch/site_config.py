@@ -85,7 +85,8 @@ def make_user_larchdirs():
              }
     subdirs = {'matplotlib': 'matplotlib may put files here',
                'dlls':       'put dlls here',
-               'feff':       'Feff files and folders here'}
+               'feff':       'Feff files and folders here',
+               'parse_cache': 'cached data read from files'}
 
     def make_dir(dname):
         "create directory"
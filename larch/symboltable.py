@@ -9,6 +9,14 @@ import numpy
 from . import site_config
 from .utils import fixName, isValidName
 
+# number of times each name has been added to or removed from any Group,
+# used by SymbolTable to check its cached lookups
+_name_changes = {}
+
+def _name_changed(name):
+    "note that name was added to or removed from a Group"
+    _name_changes[name] = _name_changes.get(name, 0) + 1
+
 class Group():
     """
     Generic Group: a container for variables, modules, and subgroups.
@@ -23,6 +31,15 @@ class Group():
         for key, val in kws.items():
             setattr(self, key, val)
 
+    def __setattr__(self, name, value):
+        if name not in self.__dict__:
+            _name_changed(name)
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        object.__delattr__(self, name)
+        _name_changed(name)
+
     def __len__(self):
         return len(dir(self))
 
@@ -91,6 +108,51 @@ class Group():
         return ''.join(html)
 
 
+class LazyGroup(Group):
+    """
+    Group with members that are created when they are first used.
+
+    Lazy members are registered by name with a source (such as a module
+    name) and a loader.  The first time one of these members is accessed,
+    loader(source) is called, which is expected to unregister the names
+    for that source with _lazy_pop() and to set the members on the group.
+    """
+    def __init__(self, name=None, **kws):
+        self.__lazy = {}
+        Group.__init__(self, name=name, **kws)
+
+    def __getattr__(self, name):
+        lazy = self.__dict__.get('_LazyGroup__lazy', None)
+        if lazy is None or name not in lazy:
+            raise AttributeError(f"'{self.__name__}' has no member '{name}'")
+        source, loader = lazy[name]
+        loader(source)
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            raise AttributeError(f"'{self.__name__}' has no member '{name}'") from None
+
+    def __dir__(self):
+        "return list of member names, including those not yet loaded"
+        out = [key for key in Group.__dir__(self) if not key.startswith('_lazy_')]
+        return out + [key for key in self.__lazy if key not in out]
+
+    def _lazy_add(self, names, source, loader):
+        """register names to be set on first use by calling loader(source),
+        removing any current members with these names"""
+        for name in names:
+            self.__dict__.pop(name, None)
+            self.__lazy[name] = (source, loader)
+            _name_changed(name)
+
+    def _lazy_pop(self, source):
+        "unregister and return names from a source"
+        names = [key for key, val in self.__lazy.items() if val[0] == source]
+        for name in names:
+            self.__lazy.pop(name)
+        return names
+
+
 def isgroup(grp, *args):
     """tests if input is a Group
 
@@ -142,13 +204,15 @@ class SymbolTable(Group):
                 'get_parent', '_path', '__parents')
 
     def __init__(self, larch=None):
+        self.__lookups = {}
+        self.__parents = []
         Group.__init__(self, name=self.top_group)
         self._larch = larch
         self._sys = None
         setattr(self, self.top_group, self)
 
         for gname in self.core_groups:
-            thisgroup = Group(name=gname)
+            thisgroup = LazyGroup(name=gname)
             if gname in GroupDocs:
                 thisgroup.__doc__ = GroupDocs[gname]
             setattr(self, gname, thisgroup)
@@ -161,6 +225,8 @@ class SymbolTable(Group):
         self._sys.moduleGroup = self
         self._sys.__cache__  = [None]*4
         self._sys.saverestore_groups = []
+        self._sys.lookup_hits = 0
+        self._sys.lookup_misses = 0
         for grp in self.core_groups:
             self._sys.searchGroups.append(grp)
         self._sys.core_groups = tuple(self._sys.searchGroups[:])
@@ -178,6 +244,34 @@ class SymbolTable(Group):
                                  user_larchdir= site_config.user_larchdir,
                                  larch_version= site_config.larch_version)
 
+    def __setattr__(self, name, value):
+        Group.__setattr__(self, name, value)
+        self._clear_lookups(name, group=self)
+
+    def __delattr__(self, name):
+        Group.__delattr__(self, name)
+        self._clear_lookups(name)
+
+    def _clear_lookups(self, name=None, group=None):
+        """clear cached lookups for a symbol name (or for all names).
+        if group is given, a cached lookup that already found the name
+        in that group is kept."""
+        lookups = self.__dict__.get('_SymbolTable__lookups', None)
+        if not lookups:
+            return
+        if name is None:
+            lookups.clear()
+            return
+        if '.' in name:
+            name = name.split('.', 1)[0]
+        entry = lookups.get(name, None)
+        if entry is not None and (group is None or entry[0][0] is not group):
+            del lookups[name]
+        entry = lookups.get(name + '.', None)
+        if entry is not None and (group is None or
+                                  not any(g is group for g in entry[0])):
+            del lookups[name + '.']
+
     def save_frame(self):
         " save current local/module group"
         self._sys.frames.append((self._sys.localGroup, self._sys.moduleGroup))
@@ -220,6 +314,11 @@ class SymbolTable(Group):
         cache = sys.__cache__
         if len(cache) < 4:
             cache = [None]*4
+        if (sys.localGroup   is cache[0] and
+            sys.moduleGroup  is cache[1] and
+            sys.searchGroups is cache[2] and
+            cache[3] is not None and not force):
+            return cache[3]
         if (sys.localGroup   == cache[0] and
             sys.moduleGroup  == cache[1] and
             sys.searchGroups == cache[2] and
@@ -269,6 +368,7 @@ class SymbolTable(Group):
 
         self._sys.searchGroups = cache[2] = snames[:]
         sys.searchGroupObjects = cache[3] = sgroups[:]
+        self._clear_lookups()
         return sys.searchGroupObjects
 
     def get_parentpath(self, sym):
@@ -286,12 +386,31 @@ class SymbolTable(Group):
     def _lookup(self, name=None, create=False):
         """looks up symbol in search path
         returns symbol given symbol name,
-        creating symbol if needed (and create=True)"""
+        creating symbol if needed (and create=True)
+
+        the groups holding a name (or the top of a dotted name) are
+        cached until the search groups change or the name is added to
+        or removed from any Group.  _sys.lookup_hits and
+        _sys.lookup_misses count uses of this cache.
+        """
         debug = False # not ('force'in name)
         if debug:
             print( '====\nLOOKUP ', name)
         searchGroups = self._fix_searchGroups()
-        self.__parents = []
+        lookups = self.__lookups
+        # lookup counts are updated in _sys.__dict__, skipping Group.__setattr__
+        if '.' not in name:
+            entry = lookups.get(name, None)
+            if entry is not None and entry[1] == _name_changes.get(name, 0):
+                try:
+                    out = getattr(entry[0][0], name)
+                except AttributeError:
+                    pass
+                else:
+                    self._sys.__dict__['lookup_hits'] += 1
+                    self.__parents[:] = entry[0]
+                    return out
+
         if self not in searchGroups:
             searchGroups.append(self)
 
@@ -299,24 +418,43 @@ class SymbolTable(Group):
             return (hasattr(grp, name)  and
                     not (grp is self and name in self._private))
 
-        parts = name.split('.')
-        if len(parts) == 1:
+        if '.' not in name:
+            self._sys.__dict__['lookup_misses'] += 1
             for grp in searchGroups:
                 if public_attr(grp, name):
-                    self.__parents.append(grp)
+                    lookups[name] = ([grp], _name_changes.get(name, 0))
+                    self.__parents[:] = [grp]
                     return getattr(grp, name)
 
         # more complex case: not immediately found in Local or Module Group
+        parts = name.split('.')
         parts.reverse()
         top = parts.pop()
         out = self.__invalid_name
-        if top == self.top_group:
-            out = self
-        else:
-            for grp in searchGroups:
-                if public_attr(grp, top):
-                    self.__parents.append(grp)
-                    out = getattr(grp, top)
+        parents = None
+        entry = lookups.get(top + '.', None)
+        if entry is not None and entry[1] == _name_changes.get(top, 0):
+            parents = entry[0]
+            try:
+                out = getattr(parents[-1], top)
+                self._sys.__dict__['lookup_hits'] += 1
+                self.__parents[:] = parents
+            except AttributeError:
+                parents = None
+        if parents is None:
+            if len(parts) > 0:
+                self._sys.__dict__['lookup_misses'] += 1
+            parents = []
+            if top == self.top_group:
+                out = self
+            else:
+                for grp in searchGroups:
+                    if public_attr(grp, top):
+                        parents.append(grp)
+                        out = getattr(grp, top)
+                if len(parents) > 0:
+                    lookups[top + '.'] = (parents, _name_changes.get(top, 0))
+            self.__parents[:] = parents
         if out is self.__invalid_name:
             raise NameError(f"'{name}' is not defined")
 
@@ -400,6 +538,8 @@ class SymbolTable(Group):
                 setattr(grp, nam, Group())
 
         setattr(grp, child, value)
+        if grp is not self:  # setting members of self clears lookups
+            self._clear_lookups(name, group=grp if len(names) == 0 else None)
         return value
 
     def del_symbol(self, name):
@@ -407,6 +547,7 @@ class SymbolTable(Group):
         sym = self._lookup(name, create=False)
         parent, child = self.get_parent(name)
         delattr(parent, child)
+        self._clear_lookups(name)
 
     def clear_callbacks(self, name, index=None):
         """clear 1 or all callbacks for a symbol
@@ -10,7 +10,7 @@ import uuid
 import hashlib
 from base64 import b64encode, b32encode
 import random
-from distutils.version import StrictVersion
+from packaging.version import parse as version_parse
 
 def bytes2str(s):
     if isinstance(s, str):
@@ -234,7 +234,7 @@ def find_delims(s, delim='"',match=None):
 
 def version_ge(v1, v2):
     "returns whether version string 1 >= version_string2"
-    return StrictVersion(bytes2str(v1)) >= StrictVersion(bytes2str(v2))
+    return version_parse(bytes2str(v1)) >= version_parse(bytes2str(v2))
 
 
 def b32hash(s):
@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 import sys
 import numpy as np
-from scipy.interpolate import splrep, splev, UnivariateSpline
+from scipy.interpolate import splrep, splev, UnivariateSpline, make_interp_spline
 from scipy.stats import t
 from scipy.special import erf
 from lmfit import Parameter, Parameters, minimize, fit_report
@@ -10,11 +10,13 @@ import uncertainties
 
 from larch import (Group, Make_CallArgs, parse_group_args, isgroup)
 
-from larch.math import index_of, index_nearest, realimag, remove_dups
+from larch.math import index_of, index_nearest, remove_dups
 
 from .xafsutils import ETOK, set_xafsGroup
-from .xafsft import ftwindow, xftf_fast
-from .pre_edge import find_e0, pre_edge
+from .xafsft import ftwindow
+from .pre_edge import find_e0, pre_edge, preedge
+
+sqrtpi = np.sqrt(np.pi)
 
 FMT_COEF = 'coef_%2.2i'
 
@@ -24,23 +26,60 @@ def spline_eval(kraw, mu, knots, coefs, order, kout):
     chi = UnivariateSpline(kraw, (mu-bkg), s=0)(kout)
     return bkg, chi
 
-def __resid(pars, ncoefs=1, knots=None, order=3, irbkg=1, nfft=2048,
-            kraw=None, mu=None, kout=None, ftwin=1, kweight=1, chi_std=None,
-            nclamp=0, clamp_lo=1, clamp_hi=1, **kws):
+def __resid(pars, ncoefs=1, model=None, mu=None, **kws):
+    coefs = [pars[FMT_COEF % i].value for i in range(ncoefs)]
+    return model.residual(mu, np.array(coefs))
 
-    # coefs = [getattr(pars, FMT_COEF % i) for i in range(ncoefs)]
+def __jacobian(pars, ncoefs=1, model=None, mu=None, **kws):
     coefs = [pars[FMT_COEF % i].value for i in range(ncoefs)]
-    bkg, chi = spline_eval(kraw, mu, knots, coefs, order, kout)
-    if chi_std is not None:
-        chi = chi - chi_std
-    out =  realimag(xftf_fast(chi*ftwin, nfft=nfft)[:irbkg])
-    if nclamp == 0:
-        return out
-    # spline clamps:
-    scale = 1.0 + 100*(out*out).mean()
-    return  np.concatenate((out,
-                            abs(clamp_lo)*scale*chi[:nclamp],
-                            abs(clamp_hi)*scale*chi[-nclamp:]))
+    return model.residual(mu, np.array(coefs), with_jacobian=True)[1]
+
+
+def _autobk_grid(energy, e0, rbkg=1, nknots=None, kmin=0, kmax=None,
+                 kweight=1, dk=0.1, win='hanning', nfft=2048, kstep=0.05):
+    """set up the k grids, FT window and spline knot positions for autobk
+
+    These depend only on the energy array and e0, and not on mu(E),
+    so they can be shared by many spectra measured on the same energy grid.
+    """
+    # get array indices for rkbg and e0: irbkg, ie0
+    ie0 = index_of(energy, e0)
+    rgrid = np.pi/(kstep*nfft)
+    if rbkg < 2*rgrid: rbkg = 2*rgrid
+
+    # save ungridded k (kraw) and grided k (kout)
+    # and ftwin (*k-weighting) for FT in residual
+    enpe = energy[ie0:] - e0
+    kraw = np.sign(enpe)*np.sqrt(ETOK*abs(enpe))
+    if kmax is None:
+        kmax = max(kraw)
+    else:
+        kmax = max(0, min(max(kraw), kmax))
+    kout  = kstep * np.arange(int(1.01+kmax/kstep), dtype='float64')
+    iemax = min(len(energy), 2+index_of(energy, e0+kmax*kmax/ETOK)) - 1
+
+    # pre-load FT window
+    ftwin = kout**kweight * ftwindow(kout, xmin=kmin, xmax=kmax,
+                                     window=win, dx=dk, dx2=dk)
+    # calc k-value and energy indices used for initial guess of spline params
+    nspl = 1 + int(2*rbkg*(kmax-kmin)/np.pi)
+    irbkg = int(1 + (nspl-1)*np.pi/(2*rgrid*(kmax-kmin)))
+    if nknots is not None:
+        nspl = nknots
+    nspl = max(5, min(128, nspl))
+    spl_k = np.zeros(nspl)
+    spl_i0, spl_i1, spl_i2 = [np.zeros(nspl, dtype=int) for i in range(3)]
+    for i in range(nspl):
+        q  = kmin + i*(kmax-kmin)/(nspl - 1)
+        ik = index_nearest(kraw, q)
+        spl_k[i] = kraw[ik]
+        spl_i0[i] = ik + ie0
+        spl_i1[i] = min(len(kraw)-1, ik + 5) + ie0
+        spl_i2[i] = max(0, ik - 5) + ie0
+
+    return Group(ie0=ie0, iemax=iemax, irbkg=irbkg, kraw=kraw, kout=kout,
+                 kmin=kmin, kmax=kmax, ftwin=ftwin, nspl=nspl, spl_k=spl_k,
+                 spl_i0=spl_i0, spl_i1=spl_i1, spl_i2=spl_i2)
 
 
 @Make_CallArgs(["energy" ,"mu"])
@@ -125,55 +164,21 @@ def autobk(energy, mu=None, group=None, rbkg=1, nknots=None, e0=None,
         msg('autobk() could not determine e0 or edge_step!: trying running pre_edge first\n')
         return
 
-    # get array indices for rkbg and e0: irbkg, ie0
-    ie0 = index_of(energy, e0)
-    rgrid = np.pi/(kstep*nfft)
-    if rbkg < 2*rgrid: rbkg = 2*rgrid
-
-    # save ungridded k (kraw) and grided k (kout)
-    # and ftwin (*k-weighting) for FT in residual
-    enpe = energy[ie0:] - e0
-    kraw = np.sign(enpe)*np.sqrt(ETOK*abs(enpe))
-    if kmax is None:
-        kmax = max(kraw)
-    else:
-        kmax = max(0, min(max(kraw), kmax))
-    kout  = kstep * np.arange(int(1.01+kmax/kstep), dtype='float64')
-    iemax = min(len(energy), 2+index_of(energy, e0+kmax*kmax/ETOK)) - 1
+    grid = _autobk_grid(energy, e0, rbkg=rbkg, nknots=nknots, kmin=kmin,
+                        kmax=kmax, kweight=kweight, dk=dk, win=win,
+                        nfft=nfft, kstep=kstep)
+    ie0, iemax, irbkg = grid.ie0, grid.iemax, grid.irbkg
+    kraw, kout, kmax, ftwin = grid.kraw, grid.kout, grid.kmax, grid.ftwin
+    nspl, spl_k = grid.nspl, grid.spl_k
 
     # interpolate provided chi(k) onto the kout grid
     if chi_std is not None and k_std is not None:
         chi_std = np.interp(kout, k_std, chi_std)
-    # pre-load FT window
-    ftwin = kout**kweight * ftwindow(kout, xmin=kmin, xmax=kmax,
-                                     window=win, dx=dk, dx2=dk)
-    # calc k-value and initial guess for y-values of spline params
-    nspl = 1 + int(2*rbkg*(kmax-kmin)/np.pi)
-    irbkg = int(1 + (nspl-1)*np.pi/(2*rgrid*(kmax-kmin)))
-    if nknots is not None:
-        nspl = nknots
-    nspl = max(5, min(128, nspl))
-    spl_y, spl_k  = np.ones(nspl), np.zeros(nspl)
-    for i in range(nspl):
-        q  = kmin + i*(kmax-kmin)/(nspl - 1)
-        ik = index_nearest(kraw, q)
-        i1 = min(len(kraw)-1, ik + 5)
-        i2 = max(0, ik - 5)
-        spl_k[i] = kraw[ik]
-        spl_y[i] = (2*mu[ik+ie0] + mu[i1+ie0] + mu[i2+ie0] ) / 4.0
-
-    order = 3
-    qmin, qmax  = spl_k[0], spl_k[nspl-1]
-    knots = [spl_k[0] - 1.e-4*(order-i) for i in range(order)]
 
-    for i in range(order, nspl):
-        knots.append((i-order)*(qmax - qmin)/(nspl-order+1))
-    qlast = knots[-1]
-    for i in range(order+1):
-        knots.append(qlast + 1.e-4*(i+1))
+    # initial guess for y-values of spline params
+    spl_y = (2*mu[grid.spl_i0] + mu[grid.spl_i1] + mu[grid.spl_i2]) / 4.0
 
-    # coefs = [mu[index_nearest(energy, e0 + q**2/ETOK)] for q in knots]
-    knots, coefs, order = splrep(spl_k, spl_y, k=order)
+    knots, coefs, order = splrep(spl_k, spl_y, k=3)
     coefs[nspl:] = coefs[nspl-1]
 
     # set fit parameters from initial coefficients
@@ -184,16 +189,16 @@ def autobk(energy, mu=None, group=None, rbkg=1, nknots=None, e0=None,
     initbkg, initchi = spline_eval(kraw[:iemax-ie0+1], mu[ie0:iemax+1],
                                    knots, coefs, order, kout)
 
+    # the residual is linear in the spline coefficients except for the
+    # clamp scale, so the Jacobian is computed exactly from the same matrices
+    model = AutobkModel(kraw[:iemax-ie0+1], kout, knots, order, nspl, ftwin,
+                        irbkg, nfft=nfft, nclamp=nclamp, clamp_lo=clamp_lo,
+                        clamp_hi=clamp_hi, chi_std=chi_std)
     # do fit
-    result = minimize(__resid, params, method='leastsq',
-                      gtol=1.e-6, ftol=1.e-6, xtol=1.e-6, epsfcn=1.e-6,
-                      kws = dict(ncoefs=len(coefs), chi_std=chi_std,
-                                 knots=knots, order=order,
-                                 kraw=kraw[:iemax-ie0+1],
-                                 mu=mu[ie0:iemax+1], irbkg=irbkg, kout=kout,
-                                 ftwin=ftwin, kweight=kweight,
-                                 nfft=nfft, nclamp=nclamp,
-                                 clamp_lo=clamp_lo, clamp_hi=clamp_hi))
+    result = minimize(__resid, params, method='leastsq', Dfun=__jacobian,
+                      col_deriv=False, gtol=1.e-6, ftol=1.e-6, xtol=1.e-6,
+                      kws=dict(ncoefs=nspl, model=model,
+                               mu=mu[ie0:iemax+1]))
 
     # write final results
     coefs = [result.params[FMT_COEF % i].value for i in range(len(coefs))]
@@ -221,48 +226,19 @@ def autobk(energy, mu=None, group=None, rbkg=1, nknots=None, e0=None,
     for attr in ('nfev', 'redchi', 'chisqr', 'aic', 'bic', 'params'):
         setattr(details, attr, getattr(result, attr, None))
 
-    # uncertainties in mu0 and chi: can be fairly slow.
+    # uncertainties in mu0 and chi
     covar = getattr(result, 'covar', None)
     if calc_uncertainties and covar is not None:
         nchi = len(chi)
         nmue = iemax-ie0 + 1
         redchi = result.redchi
         covar  = result.covar / redchi
-        jac_chi = np.zeros(nchi*nspl).reshape((nspl, nchi))
-        jac_bkg = np.zeros(nmue*nspl).reshape((nspl, nmue))
-
-        cvals, cerrs = [], []
-        for i in range(len(coefs)):
-             par = result.params[FMT_COEF % i]
-             cvals.append(getattr(par, 'value', 0.0))
-             cdel = getattr(par, 'stderr', 0.0)
-             if cdel is None:
-                 cdel = 0.0
-             cerrs.append(cdel/2.0)
-        cvals = np.array(cvals)
-        cerrs = np.array(cerrs)
-
-        # find derivatives by hand!
-        _k = kraw[:nmue]
-        _m = mu[ie0:iemax+1]
-        for i in range(nspl):
-            cval0 = cvals[i]
-            cvals[i] = cval0 + cerrs[i]
-            bkg1, chi1 = spline_eval(_k, _m, knots, cvals, order, kout)
-
-            cvals[i] = cval0 - cerrs[i]
-            bkg2, chi2 = spline_eval(_k, _m, knots, cvals, order, kout)
-
-            cvals[i] = cval0
-            jac_chi[i] = (chi1 - chi2) / (2*cerrs[i])
-            jac_bkg[i] = (bkg1 - bkg2) / (2*cerrs[i])
-
-        dfchi = np.zeros(nchi)
-        dfbkg = np.zeros(nmue)
-        for i in range(nspl):
-            for j in range(nspl):
-                dfchi += jac_chi[i]*jac_chi[j]*covar[i,j]
-                dfbkg += jac_bkg[i]*jac_bkg[j]*covar[i,j]
+
+        # derivatives of chi(k) and mu0(E) with respect to spline coefs
+        jac_chi = model.dchi
+        jac_bkg = model.bmat
+        dfchi = np.einsum('ni,ij,nj->n', jac_chi, covar, jac_chi)
+        dfbkg = np.einsum('ni,ij,nj->n', jac_bkg, covar, jac_bkg)
 
         prob = 0.5*(1.0 + erf(err_sigma/np.sqrt(2.0)))
         dchi = t.ppf(prob, nchi-nspl) * np.sqrt(dfchi*redchi)
@@ -271,3 +247,291 @@ def autobk(energy, mu=None, group=None, rbkg=1, nknots=None, e0=None,
         group.delta_chi = dchi
         group.delta_bkg = 0.0*mu
         group.delta_bkg[ie0:ie0+len(dbkg)] = dbkg
+
+
+def _spline_basis(x, knots, order, ncoefs):
+    """B-spline design matrix: splev(x, [knots, coefs, order]) for each
+    unit vector of coefs, as array of shape (len(x), ncoefs)"""
+    basis = np.zeros((len(x), ncoefs))
+    coefs = np.zeros(len(knots))
+    for i in range(ncoefs):
+        coefs[:] = 0.0
+        coefs[i] = 1.0
+        basis[:, i] = splev(x, [knots, coefs, order])
+    return basis
+
+
+class AutobkModel(object):
+    """linear model of the autobk residual for a fixed energy grid and e0.
+
+    The background mu0(E) is a B-spline in k, and chi(k) is the interpolating
+    spline of mu(E)-mu0(E) on the uniform k grid.  Both steps, and the
+    windowed FT to low R, are linear in mu(E) and in the spline coefficients,
+    so that they can be built once as matrices and applied to any number
+    of spectra measured on the same energy grid.
+
+    Arrays of mu(E) passed to the methods here must already be restricted to
+    the energy range [ie0:iemax+1] used in the fit, and can be 1-d or 2-d
+    (one spectrum per row).
+    """
+    def __init__(self, kraw, kout, knots, order, ncoefs, ftwin, irbkg,
+                 nfft=2048, nclamp=0, clamp_lo=1, clamp_hi=1, chi_std=None):
+        self.ncoefs = ncoefs
+        self.nclamp = nclamp
+        self.clamp_lo = abs(clamp_lo)
+        self.clamp_hi = abs(clamp_hi)
+
+        # bkg = bmat @ coefs,  chi = smat @ (mu - bkg)
+        self.bmat = _spline_basis(kraw, knots, order, ncoefs)
+        self.smat = make_interp_spline(kraw, np.eye(len(kraw)), k=order)(kout)
+
+        # out = realimag(xftf_fast(chi*ftwin)[:irbkg]) = wmat @ chi
+        nout = len(kout)
+        phase = np.outer(np.arange(irbkg), np.arange(nout))*(-2j*np.pi/nfft)
+        ftmat = (0.05/sqrtpi) * np.exp(phase) * ftwin
+        self.wmat = np.stack((ftmat.real, ftmat.imag), axis=1).reshape(2*irbkg, nout)
+        self.wsmat = np.dot(self.wmat, self.smat)
+
+        # derivatives of chi(k) and of the FT with respect to the coefs
+        self.dchi = -np.dot(self.smat, self.bmat)
+        self.dout = np.dot(self.wmat, self.dchi)
+
+        self.chi_std = chi_std
+        self.out_std = 0.0
+        if chi_std is not None:
+            self.out_std = np.dot(self.wmat, chi_std)
+
+        self.clamp_idx = None
+        if nclamp > 0:
+            self.clamp_idx = np.concatenate((np.arange(nclamp),
+                                             np.arange(nout-nclamp, nout)))
+            self.clamp_wt = np.concatenate((self.clamp_lo*np.ones(nclamp),
+                                            self.clamp_hi*np.ones(nclamp)))
+
+    def bkg(self, coefs):
+        "background mu0(E) for coefs"
+        return np.dot(coefs, self.bmat.T)
+
+    def chi(self, mu, coefs):
+        "chi(k) on the output k grid for mu(E) and coefs"
+        return np.dot(mu, self.smat.T) + np.dot(coefs, self.dchi.T)
+
+    def residual(self, mu, coefs, with_jacobian=False):
+        """residual (and optionally its Jacobian) for mu(E) and coefs,
+        matching the autobk fit residual"""
+        out = (np.dot(mu, self.wsmat.T) - self.out_std
+               + np.dot(coefs, self.dout.T))
+        jac = None
+        if with_jacobian:
+            jac = np.array(np.broadcast_to(self.dout, out.shape + self.dout.shape[1:]))
+        if self.clamp_idx is None:
+            return (out, jac) if with_jacobian else out
+
+        idx = self.clamp_idx
+        chi = (np.dot(mu, self.smat[idx].T) + np.dot(coefs, self.dchi[idx].T))
+        if self.chi_std is not None:
+            chi = chi - self.chi_std[idx]
+        nres = out.shape[-1]
+        scale = 1.0 + 100*(out*out).sum(axis=-1)/nres
+        clamp = self.clamp_wt * scale[..., None] * chi
+        resid = np.concatenate((out, clamp), axis=-1)
+        if not with_jacobian:
+            return resid
+        dscale = (200.0/nres) * np.dot(out, self.dout)
+        dclamp = self.clamp_wt[:, None] * (scale[..., None, None]*self.dchi[idx]
+                                           + chi[..., :, None]*dscale[..., None, :])
+        return resid, np.concatenate((jac, dclamp), axis=-2)
+
+
+def _batch_leastsq(model, mu, coefs, max_iter=100, ftol=1.e-10, xtol=1.e-10):
+    """Levenberg-Marquardt fit of model.residual for a 2-d array of
+    spectra mu, done for all spectra at once.
+
+    Returns best-fit coefficients, chi-square and number of iterations
+    (all arrays with one value per spectrum).
+    """
+    coefs = np.array(coefs, dtype='float64')
+    nspec, ncoefs = coefs.shape
+    resid, jac = model.residual(mu, coefs, with_jacobian=True)
+    chisqr = (resid*resid).sum(axis=1)
+    lam = 1.e-3*np.ones(nspec)
+    niter = np.zeros(nspec, dtype=int)
+    active = np.ones(nspec, dtype=bool)
+    eye = np.eye(ncoefs)
+    for _ in range(max_iter):
+        act = np.where(active)[0]
+        if len(act) == 0:
+            break
+        jac_a, resid_a = jac[act], resid[act]
+        jtj = np.einsum('nri,nrj->nij', jac_a, jac_a)
+        grad = np.einsum('nri,nr->ni', jac_a, resid_a)
+        diag = np.einsum('nii->ni', jtj) + 1.e-12
+        alpha = jtj + lam[act, None, None] * diag[:, :, None]*eye
+        try:
+            step = -np.linalg.solve(alpha, grad[..., None])[..., 0]
+        except np.linalg.LinAlgError:
+            step = -np.array([np.linalg.lstsq(a, g, rcond=None)[0]
+                              for a, g in zip(alpha, grad)])
+        trial = coefs[act] + step
+        tresid, tjac = model.residual(mu[act], trial, with_jacobian=True)
+        tchisqr = (tresid*tresid).sum(axis=1)
+        niter[act] += 1
+
+        better = tchisqr <= chisqr[act]
+        acc = act[better]
+        done = ((chisqr[act] - tchisqr) <= ftol*chisqr[act]) & better
+        done |= (abs(step) <= xtol*(abs(trial) + xtol)).all(axis=1)
+        coefs[acc] = trial[better]
+        resid[acc] = tresid[better]
+        jac[acc] = tjac[better]
+        chisqr[acc] = tchisqr[better]
+        lam[acc] = np.maximum(lam[acc]/10.0, 1.e-12)
+        lam[act[~better]] *= 10.0
+        active[act[done]] = False
+    return coefs, chisqr, niter
+
+
+def _batch_edge_step(energy, mu, e0, pre_edge_kws=None):
+    """edge steps for a 2-d array of spectra, using the pre-edge and
+    normalization ranges found by preedge() for the average spectrum."""
+    pre_kws = dict(nnorm=None, nvict=0, pre1=None,
+                   pre2=None, norm1=None, norm2=None)
+    if pre_edge_kws is not None:
+        pre_kws.update(pre_edge_kws)
+    pre_kws.pop('e0', None)
+    pdat = preedge(energy, mu.mean(axis=0), e0=e0, **pre_kws)
+    e0, nvict, nnorm = pdat['e0'], pdat['nvict'], pdat['nnorm']
+    ie0 = index_nearest(energy, e0)
+    omu = mu*energy**nvict
+
+    p1 = index_of(energy, pdat['pre1']+e0)
+    p2 = index_nearest(energy, pdat['pre2']+e0)
+    if p2-p1 < 2:
+        p2 = min(len(energy), p1 + 2)
+    precoefs = np.polyfit(energy[p1:p2], omu[:, p1:p2].T, 1)
+    pre_edge = ((np.outer(precoefs[0], energy) + precoefs[1][:, None])
+                * energy**(-nvict))
+
+    p1 = index_of(energy, pdat['norm1']+e0)
+    p2 = index_nearest(energy, pdat['norm2']+e0)
+    if p2-p1 < 2:
+        p2 = min(len(energy), p1 + 2)
+    if p2-p1 < 2:
+        p1 = p1-2
+    coefs = np.polyfit(energy[p1:p2], (mu-pre_edge)[:, p1:p2].T, nnorm)
+    return abs(np.polyval(coefs, energy[ie0]))
+
+
+def autobk_batch(energy, mu, group=None, rbkg=1, nknots=None, e0=None,
+                 edge_step=None, kmin=0, kmax=None, kweight=1, dk=0.1,
+                 win='hanning', k_std=None, chi_std=None, nfft=2048,
+                 kstep=0.05, pre_edge_kws=None, nclamp=3, clamp_lo=0,
+                 clamp_hi=1, max_iter=100, chunksize=4096, _larch=None):
+    """Use Autobk algorithm to remove XAFS background for many spectra
+    measured on a single energy grid.
+
+    Parameters:
+    -----------
+      energy:    1-d array of x-ray energies, in eV
+      mu:        2-d array of mu(E), one spectrum per row
+      group:     output group
+      rbkg:      distance (in Ang) for chi(R) above
+                 which the signal is ignored. Default = 1.
+      e0:        edge energy, in eV, shared by all spectra.
+                 If None, it will be determined from the average spectrum.
+      edge_step: edge step: a scalar, an array with one value per spectrum,
+                 or None to determine the edge step for each spectrum.
+      pre_edge_kws:  keyword arguments to pass to pre_edge()
+      nknots:    number of knots in spline.  If None, it will be determined.
+      kmin:      minimum k value   [0]
+      kmax:      maximum k value   [full data range].
+      kweight:   k weight for FFT.  [1]
+      dk:        FFT window window parameter.  [0.1]
+      win:       FFT window function name.     ['hanning']
+      nfft:      array size to use for FFT [2048]
+      kstep:     k step size to use for FFT [0.05]
+      k_std:     optional k array for standard chi(k).
+      chi_std:   optional chi array for standard chi(k).
+      nclamp:    number of energy end-points for clamp [3]
+      clamp_lo:  weight of low-energy clamp [0]
+      clamp_hi:  weight of high-energy clamp [1]
+      max_iter:  maximum number of fit iterations [100]
+      chunksize: number of spectra to fit at one time [4096]
+
+    Output arrays are written to the provided group, with one row per
+    spectrum for bkg, chie, and chi.
+
+    Notes:
+    ------
+      The spline knots, FT window and the linear operators mapping spline
+      coefficients to chi(k) and chi(R) are calculated once, and all spectra
+      are fitted together, giving the same results as calling autobk() with
+      the same e0 and edge_step for each spectrum.
+    """
+    if len(energy.shape) > 1:
+        energy = energy.squeeze()
+    mu = np.atleast_2d(mu)
+    if mu.shape[1] != len(energy):
+        raise ValueError("autobk_batch: mu must have one row per spectrum, each with len(energy) points")
+    energy = remove_dups(energy)
+
+    if e0 is None or e0 < energy.min() or e0 > energy.max():
+        pre_kws = dict(nnorm=None, nvict=0, pre1=None,
+                       pre2=None, norm1=None, norm2=None)
+        if pre_edge_kws is not None:
+            pre_kws.update(pre_edge_kws)
+        e0 = preedge(energy, mu.mean(axis=0), **pre_kws)['e0']
+    if edge_step is None:
+        edge_step = _batch_edge_step(energy, mu, e0, pre_edge_kws=pre_edge_kws)
+    edge_step = np.ones(len(mu))*edge_step
+
+    grid = _autobk_grid(energy, e0, rbkg=rbkg, nknots=nknots, kmin=kmin,
+                        kmax=kmax, kweight=kweight, dk=dk, win=win,
+                        nfft=nfft, kstep=kstep)
+    ie0, iemax, nspl, kout = grid.ie0, grid.iemax, grid.nspl, grid.kout
+
+    if chi_std is not None and k_std is not None:
+        chi_std = np.interp(kout, k_std, chi_std)
+
+    # knots depend only on spl_k, and initial coefs are linear in spl_y
+    spl_y = (2*mu[:, grid.spl_i0] + mu[:, grid.spl_i1] + mu[:, grid.spl_i2]) / 4.0
+    knots, coefs, order = splrep(grid.spl_k, spl_y[0], k=3)
+    init_coefs = np.linalg.solve(_spline_basis(grid.spl_k, knots, order, nspl),
+                                 spl_y.T).T
+
+    model = AutobkModel(grid.kraw[:iemax-ie0+1], kout, knots, order, nspl,
+                        grid.ftwin, grid.irbkg, nfft=nfft, nclamp=nclamp,
+                        clamp_lo=clamp_lo, clamp_hi=clamp_hi, chi_std=chi_std)
+
+    nspec = len(mu)
+    mu_fit = mu[:, ie0:iemax+1]
+    coefs = np.zeros((nspec, nspl))
+    chisqr = np.zeros(nspec)
+    niter = np.zeros(nspec, dtype=int)
+    for i0 in range(0, nspec, chunksize):
+        sl = slice(i0, i0+chunksize)
+        coefs[sl], chisqr[sl], niter[sl] = _batch_leastsq(model, mu_fit[sl],
+                                                          init_coefs[sl],
+                                                          max_iter=max_iter)
+
+    bkg = model.bkg(coefs)
+    chi = model.chi(mu_fit, coefs)
+    obkg = np.copy(mu)
+    obkg[:, ie0:ie0+bkg.shape[1]] = bkg
+
+    group = set_xafsGroup(group, _larch=_larch)
+    group.energy = energy
+    group.bkg  = obkg
+    group.chie = (mu-obkg)/edge_step[:, None]
+    group.k    = kout
+    group.chi  = chi/edge_step[:, None]
+    group.e0   = e0
+    group.edge_step = edge_step
+
+    nres = 2*grid.irbkg + 2*nclamp*(nclamp > 0)
+    group.autobk_details = Group(kmin=kmin, kmax=grid.kmax, irbkg=grid.irbkg,
+                                 nknots=nspl, nspl=nspl, knots_k=knots,
+                                 init_knots_y=spl_y, knots_y=coefs,
+                                 init_chi=model.chi(mu_fit, init_coefs)/edge_step[:, None],
+                                 niter=niter, chisqr=chisqr,
+                                 redchi=chisqr/max(1, nres-nspl))
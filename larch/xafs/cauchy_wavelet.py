@@ -23,10 +23,30 @@
 # 2014-Apr M Newville : translated to Python for Larch
 
 import numpy as np
+from scipy.fft import ifft
 from larch import Make_CallArgs, parse_group_args
 from larch.math import complex_phase
 from .xafsutils import set_xafsGroup
 
+def cauchy_filters(r, omega, nrpts):
+    """Cauchy wavelet filters for each value of R in r, at the angular
+    frequencies omega of the FT of chi(k), as array (len(r), len(omega)).
+    nrpts, the number of R points for the full transform, sets the order
+    of the wavelet."""
+    # Characteristic values for Cauchy wavelet:
+    cauchy_sum = np.log(2*np.pi) - np.log(1.0+np.arange(nrpts)).sum()
+    aom = (nrpts/(2*np.asarray(r)))[:, None] * omega
+    aom[np.where(aom==0)] = 1.e-19
+    return np.exp(cauchy_sum + nrpts*np.log(aom) - aom)
+
+def cauchy_transform(ffchi, filters, nkpts):
+    """Cauchy wavelet transform of chi(k), given ffchi, the first nfft
+    points of the FT of chi(k) padded to 2*nfft, and the filters from
+    cauchy_filters(), as array (len(filters), nkpts).  All rows are
+    transformed with one 2-d inverse FFT."""
+    nfft = len(ffchi)
+    return ifft(filters*ffchi, n=2*nfft, axis=1)[:, :nkpts]
+
 @Make_CallArgs(["k" ,"chi"])
 def cauchy_wavelet(k, chi=None, group=None, kweight=0, rmax_out=10,
                    nfft=2048, _larch=None):
@@ -92,20 +112,9 @@ def cauchy_wavelet(k, chi=None, group=None, kweight=0, rmax_out=10,
     # scale parameter
     r  = np.linspace(0, rmax, nrpts)
     r[0] = 1.e-19
-    a  = nrpts/(2*r)
-
-    # Characteristic values for Cauchy wavelet:
-    cauchy_sum = np.log(2*np.pi) - np.log(1.0+np.arange(nrpts)).sum()
 
     # Main calculation:
-    out = np.zeros(nkout*nrpts,
-                   dtype='complex128').reshape(nrpts, nkout)
-    for i in range(nrpts):
-        aom = a[i]*omega
-        aom[np.where(aom==0)] = 1.e-19
-        filt = cauchy_sum + nrpts*np.log(aom) - aom
-        tmp  = np.conj(np.exp(filt))*tff[:nfft]
-        out[i, :] = np.fft.ifft(tmp, 2*nfft)[:nkout]
+    out = cauchy_transform(tff[:nfft], cauchy_filters(r, omega, nrpts), nkout)
 
     group = set_xafsGroup(group, _larch=_larch)
     group.wcauchy_r  =  r
@@ -568,6 +568,372 @@ class FeffPathGroup(Group):
 
 
 
+FEFF_ARRAYS = ('pha', 'amp', 'rep', 'lam')
+
+def _spline_basis(knots, order, x):
+    """nonzero B-spline basis functions at x for knots and order,
+    as (interval index, weights).  This follows FITPACK (fpbspl and
+    splev, with extrapolation) step-by-step, so that summing the
+    weights times the spline coefficients gives the same values as
+    evaluating a UnivariateSpline.
+    """
+    nknots = len(knots)
+    ival = np.searchsorted(knots, x, side='right') - 1
+    ival = np.clip(ival, order, nknots-order-2)
+    wts = np.zeros((order+1, len(x)))
+    wts[0] = 1.0
+    for j in range(1, order+1):
+        prev = wts[:j].copy()
+        wts[0] = 0.0
+        for i in range(j):
+            tli = knots[ival+i+1]
+            tlj = knots[ival+i+1-j]
+            same = (tli == tlj)
+            fac = prev[i]/np.where(same, 1.0, tli-tlj)
+            wts[i] = np.where(same, wts[i], wts[i] + fac*(tli-x))
+            wts[i+1] = np.where(same, 0.0, fac*(x-tlj))
+    return ival, wts
+
+
+class FeffPathSet(object):
+    """a set of Feff Paths whose chi(k) are calculated together.
+
+    The spline coefficients for pha, amp, rep, and lam of all paths are
+    packed into contiguous arrays, and the XAFS equation is evaluated for
+    all paths at once.  Interpolated Feff arrays are kept for each path
+    and re-used as long as that path's e0 and the k array are unchanged.
+
+    The results are identical to calling path._calc_chi() for each path
+    and summing path.chi in order, as done in ff2chi().
+    """
+    def __init__(self, paths):
+        if isinstance(paths, dict):
+            paths = list(paths.values())
+        self.paths = list(paths)
+        self.params = None
+        self.k = None
+        self._tables = {}
+        self._dtables = {}
+        self._dsplines = {}
+        self._pathpars = {}
+        self._pending = None
+        self.dchi = None
+
+        # group paths by spline knots, which depend only on the Feff k grid
+        self._splines = {}
+        for ipath, path in enumerate(self.paths):
+            if path.spline_coefs is None:
+                path.create_spline_coefs()
+            spl = path.spline_coefs
+            knots, coefs, order = spl['pha']._eval_args
+            key = (order, knots.tobytes())
+            if key not in self._splines:
+                self._splines[key] = (knots, order, [], [])
+            self._splines[key][2].append(ipath)
+            self._splines[key][3].append([spl[a]._eval_args[1] for a in FEFF_ARRAYS])
+        for key, (knots, order, ipaths, coefs) in self._splines.items():
+            self._splines[key] = (knots, order, ipaths, np.array(coefs))
+        self._spline_key = {}
+        for key, (knots, order, ipaths, coefs) in self._splines.items():
+            for i, ipath in enumerate(ipaths):
+                self._spline_key[ipath] = (key, i)
+
+    def create_path_params(self, params):
+        """create Path Parameters for all paths in params.
+
+        Paths whose Path Parameters are already in params are skipped.
+        Path Parameters are named by the path hashkey, so that paths from
+        the same Feff.dat file in different path sets will replace each
+        other's Path Parameters, and need to be re-created here.
+        """
+        for ipath, path in enumerate(self.paths):
+            pars = self._pathpars.get(ipath, None)
+            if (params is not self.params or pars is None or
+                any(params.get(path.pathpar_name(pname), None) is not par
+                    for pname, par in zip(PATH_PARS, pars))):
+                path.create_path_params(params=params)
+                self._pathpars[ipath] = [params[path.pathpar_name(pname)]
+                                         for pname in PATH_PARS]
+        self.params = params
+
+    def _interp_tables(self, ipaths, e0vals, q, derivs=False):
+        """interpolated Feff arrays for paths at q, (npaths, 4, len(q)),
+        using cached values for paths with unchanged e0.  With derivs=True,
+        the derivatives of the Feff arrays with respect to q are returned."""
+        cache = self._dtables if derivs else self._tables
+        out = np.zeros((len(ipaths), len(FEFF_ARRAYS), q.shape[1]))
+        todo = {}
+        for i, (ipath, e0) in enumerate(zip(ipaths, e0vals)):
+            cached = cache.get(ipath, None)
+            if cached is not None and cached[0] == e0:
+                out[i] = cached[1]
+            else:
+                key, icoef = self._spline_key[ipath]
+                todo.setdefault((key, e0), []).append((i, ipath, icoef))
+
+        for (key, e0), entries in todo.items():
+            knots, order, _ip, coefs = self._splines[key]
+            if derivs:
+                knots, order, coefs = self._spline_derivs(key)
+            irow = [i for i, ipath, icoef in entries]
+            ival, wts = _spline_basis(knots, order, q[irow[0]])
+            vals = np.zeros((len(entries), len(FEFF_ARRAYS), q.shape[1]))
+            cvals = coefs[[icoef for i, ipath, icoef in entries]]
+            for j in range(order+1):
+                vals = vals + cvals[:, :, ival-order+j]*wts[j]
+            for (i, ipath, icoef), val in zip(entries, vals):
+                out[i] = val
+                cache[ipath] = (e0, val)
+        return out
+
+    def _spline_derivs(self, key):
+        """knots, order, and coefficients for the derivatives of the
+        splines with knots given by key"""
+        if key not in self._dsplines:
+            knots, order, _ip, coefs = self._splines[key]
+            i = np.arange(len(knots)-order-2)
+            dcoefs = np.zeros(coefs.shape[:2] + (len(knots)-2,))
+            dcoefs[:, :, i] = (order*(coefs[:, :, i+1] - coefs[:, :, i]) /
+                               (knots[i+order+1] - knots[i+1]))
+            self._dsplines[key] = (knots[1:-1], order-1, dcoefs)
+        return self._dsplines[key]
+
+    def calc_chi(self, k=None, kmax=None, kstep=0.05, with_derivs=False):
+        """calculate chi(k) for all paths, writing k, p, chi, and chi_imag
+        to each path, and returning the sum of chi(k) for all paths.
+
+        With with_derivs=True, the derivatives of chi(k) for each path with
+        respect to each of its Path Parameters are put in self.dchi, an
+        array of shape (npaths, len(PATH_PARS), len(k)).
+        """
+        self.eval_pathpars(k=k, kmax=kmax, kstep=kstep, with_derivs=with_derivs)
+        chi, jac = self.calc_arrays()
+        self.store_arrays()
+        return chi
+
+    def calc_jacobian(self, var_names, k=None, kmax=None, kstep=0.05):
+        """calculate chi(k) for all paths as with calc_chi(), and return
+        the derivatives of the sum of chi(k) for all paths with respect to
+        the named variables, as an array of shape (len(var_names), len(k)).
+
+        Derivatives with respect to the Path Parameters are calculated
+        analytically, and the chain rule applied to derivatives of the
+        Path Parameters with respect to the variables.
+        """
+        self.eval_pathpars(k=k, kmax=kmax, kstep=kstep, var_names=var_names)
+        chi, jac = self.calc_arrays()
+        self.store_arrays()
+        return jac
+
+    def eval_pathpars(self, k=None, kmax=None, kstep=0.05, with_derivs=False,
+                      var_names=None):
+        """first step of calc_chi() and calc_jacobian(): evaluate Path
+        Parameters, and their derivatives with respect to var_names, if
+        given.  Paths that are not used are calculated here.
+
+        This uses the shared Parameters, and is not thread-safe.  The
+        following calc_arrays() uses only data for this path set, and
+        calc_arrays() for different path sets can be run concurrently,
+        as long as store_arrays() is then called for each in turn.
+        """
+        if k is None:
+            fdat = self.paths[0]._feffdat
+            if kmax is None:
+                kmax = 30.0
+            kmax = min(max(fdat.k), kmax)
+            if kstep is None: kstep = 0.05
+            k = kstep * np.arange(int(1.01 + kmax/kstep), dtype='float64')
+        if self.k is None or len(k) != len(self.k) or not np.all(k == self.k):
+            self._tables = {}
+            self._dtables = {}
+            self.k = k.copy()
+
+        ipaths, pvals = [], []
+        for ipath, path in enumerate(self.paths):
+            if path.use and path._feffdat.reff >= 0.05:
+                ipaths.append(ipath)
+                pars = path.path_paramvals()
+                pars['reff'] = path._feffdat.reff
+                pvals.append(pars)
+            else:
+                path._calc_chi(k=k)
+        dpars = None
+        if var_names is not None:
+            with_derivs = True
+            dpars = self._pathpar_derivs(var_names)
+        self._pending = (k, ipaths, pvals, with_derivs, dpars)
+
+    def calc_arrays(self):
+        """second step of calc_chi() and calc_jacobian(): calculate chi(k)
+        for all paths, returning the sum of chi(k) for all paths and the
+        Jacobian (None unless var_names was given to eval_pathpars())"""
+        k, ipaths, pvals, with_derivs, dpars = self._pending
+        results = None
+        if with_derivs:
+            self.dchi = np.zeros((len(self.paths), len(PATH_PARS), len(k)))
+        if len(ipaths) > 0:
+            results = self._calc_chi(k, ipaths, pvals, with_derivs=with_derivs)
+        self._pending = (k, ipaths, results)
+
+        chis = {}
+        if results is not None:
+            for i, ipath in enumerate(ipaths):
+                chis[ipath] = results[1][i].imag
+        out = np.zeros_like(k)
+        for ipath, path in enumerate(self.paths):
+            out += chis.get(ipath, path.chi)
+        jac = None
+        if dpars is not None:
+            jac = np.einsum('ijk,ijv->vk', self.dchi, dpars)
+        return out, jac
+
+    def store_arrays(self):
+        """last step of calc_chi() and calc_jacobian(): write k, p, chi,
+        and chi_imag to each path"""
+        k, ipaths, results = self._pending
+        if results is not None:
+            p, cchi = results
+            for i, ipath in enumerate(ipaths):
+                path = self.paths[ipath]
+                path.k = k
+                path.p = p[i]
+                path.chi = cchi[i].imag
+                path.chi_imag = -cchi[i].real
+        self._pending = None
+
+    def _pathpar_derivs(self, var_names):
+        """derivatives of Path Parameters with respect to variables,
+        (npaths, len(PATH_PARS), len(var_names)).
+
+        Derivatives of each constraint expression with respect to the
+        Parameters it uses are found by central differences, and combined
+        with the chain rule, so that no Path Parameter is evaluated more
+        than twice for each Parameter in its expression.
+        """
+        params = self.params
+        nvars = len(var_names)
+        derivs = {}
+        for i, name in enumerate(var_names):
+            derivs[name] = np.zeros(nvars)
+            derivs[name][i] = 1.0
+        owner = {}
+        for ipath, pars in self._pathpars.items():
+            for par in pars:
+                owner[par.name] = ipath
+
+        def pderiv(name):
+            if name in derivs:
+                return derivs[name]
+            out = derivs[name] = np.zeros(nvars)
+            par = params[name]
+            if par.expr is None:
+                return out
+            if par._expr_ast is None:
+                par._getval()
+            terms = []
+            for dep in par._expr_deps:
+                if dep in params:
+                    dval = pderiv(dep)
+                    if dval.any():
+                        terms.append((dep, dval))
+            if len(terms) == 0:
+                return out
+            if (len(terms) == 1 and par.expr.strip() == terms[0][0] and
+                par.min == -np.inf and par.max == np.inf):
+                out = terms[0][1]
+            else:
+                if name in owner:
+                    self.paths[owner[name]].store_feffdat()
+                # note: calling procedures replaces the symbol table
+                for dep, dval in terms:
+                    val = params._asteval.symtable[dep]
+                    step = 1.e-6*max(1.0, abs(val))
+                    params._asteval.symtable[dep] = val + step
+                    vplus = par._getval()
+                    params._asteval.symtable[dep] = val - step
+                    vminus = par._getval()
+                    params._asteval.symtable[dep] = val
+                    out = out + dval*(vplus - vminus)/(2*step)
+                par._getval()
+            derivs[name] = out
+            return out
+
+        out = np.zeros((len(self.paths), len(PATH_PARS), nvars))
+        for ipath, path in enumerate(self.paths):
+            for j, pname in enumerate(PATH_PARS):
+                out[ipath, j] = pderiv(path.pathpar_name(pname))
+        return out
+
+    def _calc_chi(self, k, ipaths, pvals, with_derivs=False):
+        """XAFS equation for all paths, as in FeffPathGroup._calc_chi(),
+        returning p and complex chi for the paths"""
+        def column(vals):
+            return np.array(vals)[:, None]
+        # scalar terms are computed as for a single path
+        e0vals = [p['e0'] for p in pvals]
+        e0k = column([p['e0']*ETOK for p in pvals])
+        reff = column([p['reff'] for p in pvals])
+        m2reff = column([-2*p['reff'] for p in pvals])
+        sigma2 = column([p['sigma2'] for p in pvals])
+        third = column([p['third'] for p in pvals])
+        fourth = column([p['fourth'] for p in pvals])
+        drterm = column([p['deltar'] - 2*p['sigma2']/p['reff'] for p in pvals])
+        eiterm = column([1j * p['ei'] * ETOK for p in pvals])
+        scale = column([p['degen'] * p['s02'] for p in pvals])
+        rnorm = column([(p['reff'] + p['deltar'])**2 for p in pvals])
+
+        # create e0-shifted energy and k, careful to look for |e0| ~= 0.
+        en = k*k - e0k
+        small = (abs(en) < SMALL_ENERGY).any(axis=1)
+        if small.any():
+            en[np.where((abs(en) < 1.5*SMALL_ENERGY) & small[:, None])] = SMALL_ENERGY
+        # q is the e0-shifted wavenumber
+        q = np.sign(en)*np.sqrt(abs(en))
+
+        pha, amp, rep, lam = np.moveaxis(self._interp_tables(ipaths, e0vals, q), 1, 0)
+
+        # p = complex wavenumber, and its square:
+        pp   = (rep + 1j/lam)**2 + eiterm
+        p    = np.sqrt(pp)
+
+        # the xafs equation:
+        xafs = np.exp(m2reff*p.imag - 2*pp*(sigma2 - pp*fourth/3) +
+                      1j*(2*q*reff + pha + 2*p*(drterm - 2*pp*third/3)))
+
+        cchi = scale * amp * xafs / (q*rnorm)
+        cchi[:, 0] = 2*cchi[:, 1] - cchi[:, 2]
+        if not with_derivs:
+            return p, cchi
+
+        # derivatives of the exponent in the xafs equation for
+        # changes in pp and p
+        def dexponent(dpp, dp):
+            return (m2reff*dp.imag - 2*dpp*(sigma2 - 2*pp*fourth/3) +
+                    2j*(dp*(drterm - 2*pp*third/3) - 2*p*dpp*third/3))
+
+        cchi0 = scale * amp * xafs / (q*rnorm)
+        dchi = np.zeros((len(ipaths), len(PATH_PARS), len(k)), dtype='complex128')
+        unit = amp * xafs / (q*rnorm)
+        dchi[:, 0] = column([p['s02'] for p in pvals]) * unit
+        dchi[:, 1] = column([p['degen'] for p in pvals]) * unit
+        dchi[:, 3] = cchi0 * dexponent(1j*ETOK, 1j*ETOK/(2*p))
+        dchi[:, 4] = cchi0 * (2j*p - 2/column([p['reff'] + p['deltar'] for p in pvals]))
+        dchi[:, 5] = cchi0 * (-2*pp - 4j*p/reff)
+        dchi[:, 6] = cchi0 * (-4j*p*pp/3)
+        dchi[:, 7] = cchi0 * (2*pp*pp/3)
+
+        # e0 changes q, and so the interpolated Feff arrays
+        dpha, damp, drep, dlam = np.moveaxis(self._interp_tables(ipaths, e0vals, q,
+                                                                 derivs=True), 1, 0)
+        dpp = 2*(rep + 1j/lam)*(drep - 1j*dlam/lam**2)
+        dcchi = (cchi0*(dexponent(dpp, dpp/(2*p)) + 1j*(2*reff + dpha) - 1/q) +
+                 scale * damp * xafs / (q*rnorm))
+        dchi[:, 2] = dcchi * (-ETOK/(2*abs(q)))
+
+        dchi[:, :, 0] = 2*dchi[:, :, 1] - dchi[:, :, 2]
+        self.dchi[ipaths] = dchi.imag
+        return p, cchi
+
 def path2chi(path, paramgroup=None, **kws):
     """calculate chi(k) for a Feff Path,
     optionally setting path parameter values
@@ -607,8 +973,10 @@ def ff2chi(paths, group=None, paramgroup=None, k=None, kmax=None,
     ---------
        group contain arrays for k and chi
 
-    This essentially calls path2chi() for each of the paths in the
-    `paths` and writes the resulting arrays to group.k and group.chi.
+    This calculates chi(k) for each of the paths in the `paths`, as
+    path2chi() would, and writes the resulting arrays to group.k and
+    group.chi.  See FeffPathSet for calculating chi(k) repeatedly for
+    the same set of paths.
 
     """
     if isinstance(paramgroup, Parameters):
@@ -632,12 +1000,10 @@ def ff2chi(paths, group=None, paramgroup=None, k=None, kmax=None,
         if not isNamedClass(path, FeffPathGroup):
             print('%s is not a valid Feff Path' % path)
             return
-        path.create_path_params(params=params)
-        path._calc_chi(k=k, kstep=kstep, kmax=kmax)
+    pathset = FeffPathSet(pathlist)
+    pathset.create_path_params(params)
+    out = pathset.calc_chi(k=k, kstep=kstep, kmax=kmax)
     k = pathlist[0].k[:]
-    out = np.zeros_like(k)
-    for path in pathlist:
-        out += path.chi
 
     if group is None:
         group = Group()
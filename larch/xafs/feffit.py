@@ -8,10 +8,12 @@ except ImportError:
     from collections import Iterable
 from copy import copy, deepcopy
 from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from numpy import array, arange, interp, pi, zeros, sqrt, concatenate
 
 from scipy.optimize import leastsq as scipy_leastsq
+from scipy.fft import rfft, ifft
 
 from lmfit import Parameters, Parameter, Minimizer, fit_report
 from lmfit.printfuncs import gformat as gformat
@@ -23,20 +25,18 @@ from ..fitting import (correlated_values, eval_stderr, ParameterGroup,
                        group2params, params2group, isParameter)
 
 from .xafsutils import set_xafsGroup
-from .xafsft import xftf_fast, xftr_fast, ftwindow
-from .feffdat import FeffPathGroup, ff2chi
+from .xafsft import ftwindow
+from .cauchy_wavelet import cauchy_filters, cauchy_transform
+from .feffdat import FeffPathGroup, FeffPathSet, ff2chi
 
 
 class TransformGroup(Group):
     """A Group of transform parameters.
     The apply() method will return the result of applying the transform,
-    ready to use in a Fit.   This caches the FT windows (k and r windows)
-    and assumes that once created (not None), these do not need to be
-    recalculated....
-
-    That is: don't simply change the parameters and expect different results.
-    If you do change parameters, reset kwin / rwin to None to cause them to be
-    recalculated.
+    ready to use in a Fit.   This caches the FT windows (k and r windows),
+    and the products of the k window and k**kweight.  These are kept with
+    the transform settings used to make them, and are recalculated when
+    any of those settings change.
     """
     def __init__(self, kmin=0, kmax=20, kweight=2, dk=4, dk2=None,
                  window='kaiser', nfft=2048, kstep=0.05,
@@ -67,11 +67,15 @@ class TransformGroup(Group):
         self.fitspace = fitspace
         self.wavelet_mask = wavelet_mask
         self._cauchymask = None
+        self.__cwt_key = None
 
         self._larch = _larch
 
         self.kwin = None
         self.rwin = None
+        self.__kwin_key = None
+        self.__rwin_key = None
+        self.__kwin_weighted = {}
         self.make_karrays()
 
     def __repr__(self):
@@ -125,17 +129,14 @@ class TransformGroup(Group):
         group = set_xafsGroup(group, _larch=self._larch)
         r   = self.rstep * arange(irmax)
         mag = sqrt(out.real**2 + out.imag**2)
-        group.kwin  =  self.kwin[:len(chi)]
+        group.kwin  =  self.get_kwin()[:len(chi)]
         group.r    =  r[:irmax]
         group.chir =  out[:irmax]
         group.chir_mag =  mag[:irmax]
         group.chir_pha =  complex_phase(out[:irmax])
         group.chir_re  =  out.real[:irmax]
         group.chir_im  =  out.imag[:irmax]
-        if self.rwin is None:
-            self.rwin = ftwindow(self.r_, xmin=self.rmin, xmax=self.rmax,
-                                 dx=self.dr, dx2=self.dr2, window=self.rwindow)
-        group.rwin = self.rwin[:irmax]
+        group.rwin = self.get_rwin()[:irmax]
 
     def get_kweight(self):
         "if kweight is a list/tuple, use only the first one here"
@@ -143,91 +144,106 @@ class TransformGroup(Group):
             return self.kweight[0]
         return self.kweight
 
+    def get_kwin(self):
+        """return the k window, recalculating it if the window settings
+        have changed or if kwin has been reset to None"""
+        self.make_karrays()
+        key = (self.kmin, self.kmax, self.dk, self.dk2, self.window,
+               self.kstep, self.nfft)
+        if self.kwin is None or key != self.__kwin_key:
+            self.kwin = ftwindow(self.k_, xmin=self.kmin, xmax=self.kmax,
+                                 dx=self.dk, dx2=self.dk2, window=self.window)
+            self.__kwin_key = key
+        return self.kwin
+
+    def get_rwin(self):
+        """return the R window, recalculating it if the window settings
+        have changed or if rwin has been reset to None"""
+        self.make_karrays()
+        key = (self.rmin, self.rmax, self.dr, self.dr2, self.rwindow,
+               self.kstep, self.nfft)
+        if self.rwin is None or key != self.__rwin_key:
+            self.rwin = ftwindow(self.r_, xmin=self.rmin, xmax=self.rmax,
+                                 dx=self.dr, dx2=self.dr2, window=self.rwindow)
+            self.__rwin_key = key
+        return self.rwin
+
+    def get_kwin_weighted(self, kweight):
+        """return kwin * k**kweight * kstep/sqrt(pi), as used for the
+        forward FT, cached for each kweight and k window"""
+        kwin = self.get_kwin()
+        cached = self.__kwin_weighted.get(kweight, None)
+        if cached is None or cached[0] is not kwin:
+            cached = (kwin, kwin * self.k_**kweight * (self.kstep/sqrt(pi)))
+            self.__kwin_weighted[kweight] = cached
+        return cached[1]
+
     def fftf(self, chi, kweight=None):
         """ forward FT -- meant to be used internally.
         chi must be on self.k_ grid"""
-        if self.kstep != self.__kstep or self.nfft != self.__nfft:
-            self.make_karrays()
-        if self.kwin is None:
-            self.kwin = ftwindow(self.k_, xmin=self.kmin, xmax=self.kmax,
-                                 dx=self.dk, dx2=self.dk2, window=self.window)
         if kweight is None:
             kweight = self.get_kweight()
-        cx = chi * self.kwin[:len(chi)] * self.k_[:len(chi)]**kweight
-        return xftf_fast(cx, kstep=self.kstep, nfft=self.nfft)
+        cx = chi * self.get_kwin_weighted(kweight)[:len(chi)]
+        return rfft(cx, n=self.nfft)[:int(self.nfft/2)]
 
     def fftr(self, chir):
         " reverse FT -- meant to be used internally"
-        if self.kstep != self.__kstep or self.nfft != self.__nfft:
-            self.make_karrays()
-        if self.rwin is None:
-            self.rwin = ftwindow(self.r_, xmin=self.rmin, xmax=self.rmax,
-                                 dx=self.dr, dx2=self.dr2, window=self.rwindow)
-        cx = chir * self.rwin[:len(chir)]
-        return xftr_fast(cx, kstep=self.kstep, nfft=self.nfft)
+        cx = chir * self.get_rwin()[:len(chir)]
+        return (4*sqrt(pi)/self.kstep) * ifft(cx, n=self.nfft)[:int(self.nfft/2)]
 
 
     def make_cwt_arrays(self, nkpts, nrpts):
-        if self.kstep != self.__kstep or self.nfft != self.__nfft:
-            self.make_karrays()
-        if self.kwin is None:
-            self.kwin = ftwindow(self.k_, xmin=self.kmin, xmax=self.kmax,
-                                 dx=self.dk, dx2=self.dk2, window=self.window)
+        """make the mask and Cauchy wavelet filters for cwt(), recalculating
+        them when the transform settings change"""
+        self.make_karrays()
+        key = (self.kmin, self.kmax, self.rmin, self.rmax, self.kstep,
+               self.nfft, nkpts, nrpts, id(self.wavelet_mask))
+        if self._cauchymask is not None and key == self.__cwt_key:
+            return
 
-        if self._cauchymask is None:
-            if self.wavelet_mask is not None:
-                self._cauchymask = self.wavelet_mask
-            else:
-                ikmin = int(max(0, 0.01 + self.kmin/self.kstep))
-                ikmax = int(min(self.nfft/2,  0.01 + self.kmax/self.kstep))
-                irmin = int(max(0, 0.01 + self.rmin/self.rstep))
-                irmax = int(min(self.nfft/2,  0.01 + self.rmax/self.rstep))
-                cm = np.zeros(nrpts*nkpts, dtype='int').reshape(nrpts, nkpts)
-                cm[irmin:irmax, ikmin:ikmax] = 1
-                self._cauchymask = cm
-                self._cauchyslice =(slice(irmin, irmax), slice(ikmin, ikmax))
+        if self.wavelet_mask is not None:
+            self._cauchymask = self.wavelet_mask
+            self._cauchyslice = (slice(0, nrpts), slice(0, nkpts))
+        else:
+            ikmin = int(max(0, 0.01 + self.kmin/self.kstep))
+            ikmax = int(min(self.nfft/2,  0.01 + self.kmax/self.kstep))
+            irmin = int(max(0, 0.01 + self.rmin/self.rstep))
+            irmax = int(min(self.nfft/2,  0.01 + self.rmax/self.rstep))
+            cm = np.zeros(nrpts*nkpts, dtype='int').reshape(nrpts, nkpts)
+            cm[irmin:irmax, ikmin:ikmax] = 1
+            self._cauchymask = cm
+            self._cauchyslice =(slice(irmin, irmax), slice(ikmin, ikmax))
+
+        # filters are needed only for the R values in the output slice
+        r   = self.rstep * arange(nrpts)
+        r[0] = 1.e-19
+        omega = pi*np.arange(self.nfft)/(self.kstep*self.nfft)
+        self.__cwt_filters = cauchy_filters(r[self._cauchyslice[0]], omega, nrpts)
+        self.__cwt_key = key
 
     def cwt(self, chi, rmax=None, kweight=None):
         """cauchy wavelet transform -- meant to be used internally"""
-        if self.kstep != self.__kstep or self.nfft != self.__nfft:
-            self.make_karrays()
-        nkpts = len(chi)
-        nrpts = int(np.round(self.rmax/self.rstep))
-        if self.kwin is None:
-            self.make_cwt_arrays(nkpts, nrpts)
-
-        omega = pi*np.arange(self.nfft)/(self.kstep*self.nfft)
-
+        self.make_karrays()
         if kweight is None:
             kweight = self.get_kweight()
         if kweight != 0:
-            chi = chi * self.kwin[:len(chi)] * self.k_[:len(chi)]**kweight
+            chi = chi * self.get_kwin()[:len(chi)] * self.k_[:len(chi)]**kweight
 
         if rmax is not None:
             self.rmax = rmax
 
+        nkpts = len(chi)
+        nrpts = int(np.round(self.rmax/self.rstep))
+        self.make_cwt_arrays(nkpts, nrpts)
+
         chix   = np.zeros(int(self.nfft/2)) * self.kstep
         chix[:nkpts] = chi
         chix   = chix[:int(self.nfft/2)]
         _ffchi = np.fft.fft(chix, n=2*self.nfft)[:self.nfft]
 
-        nrpts = int(np.round(self.rmax/self.rstep))
-        r   = self.rstep * arange(nrpts)
-        r[0] = 1.e-19
-        alpha = nrpts/(2*r)
-
-        self.make_cwt_arrays(nkpts, nrpts)
-
-        cauchy_sum = np.log(2*pi) - np.log(1.0+np.arange(nrpts)).sum()
-
-        out = np.zeros(nrpts*nkpts, dtype='complex128').reshape(nrpts, nkpts)
-
-        for i in range(nrpts):
-            aom = alpha[i]*omega
-            filt = cauchy_sum + nrpts*np.log(aom) - aom
-            out[i, :] = np.fft.ifft(np.exp(filt)*_ffchi, 2*self.nfft)[:nkpts]
-
-        return (out*self._cauchymask)[self._cauchyslice]
+        out = cauchy_transform(_ffchi, self.__cwt_filters, nkpts)
+        irows, icols = self._cauchyslice
+        return out[:, icols] * self._cauchymask[irows, icols]
 
 class FeffitDataSet(Group):
     def __init__(self, data=None, paths=None, transform=None,
@@ -265,6 +281,7 @@ class FeffitDataSet(Group):
         self.model = Group(__name__='Feffit Model for %s' % repr(data))
         self.model.k = None
         self.__chi = None
+        self.__pathset = None
         self.__prepared = False
 
     def __repr__(self):
@@ -325,7 +342,7 @@ class FeffitDataSet(Group):
             path.create_path_params(params=params)
             if path.spline_coefs is None:
                 path.create_spline_coefs()
-
+        self.__pathset = FeffPathSet(self.paths)
         self.__prepared = True
 
 
@@ -400,15 +417,43 @@ class FeffitDataSet(Group):
     def _residual(self, paramgroup, data_only=False, **kws):
         """return the residual for this data set
         residual = self.transform.apply(data_chi - model_chi)
-        where model_chi is the result of ff2chi(paths)
+        where model_chi is the sum of chi(k) for all paths, as from ff2chi(paths)
         """
         if not isNamedClass(self.transform, TransformGroup):
             return
+        self._eval_pathpars(paramgroup)
+        out = self._calc_residual(data_only=data_only)
+        self._store_paths()
+        return out
+
+    def _jacobian(self, params, var_names):
+        """return the Jacobian of the residual for this data set, with
+        respect to the named variables, as (len(residual), len(var_names))
+        """
+        self._eval_pathpars(params, var_names=var_names)
+        out = self._calc_jacobian()
+        self._store_paths()
+        return out
+
+    def _eval_pathpars(self, paramgroup, var_names=None):
+        """evaluate Path Parameters, the first step of _residual() and
+        _jacobian().  This uses the shared Parameters and is not
+        thread-safe, but the following _calc_residual() or _calc_jacobian()
+        can be run concurrently for different data sets, followed by
+        _store_paths() for each data set in turn."""
         if not self.__prepared:
             self.prepare_fit(paramgroup)
 
-        ff2chi(self.paths, paramgroup=paramgroup, k=self.model.k,
-                _larch=self._larch, group=self.model)
+        if isinstance(paramgroup, Parameters):
+            params = paramgroup
+        else:
+            params = group2params(paramgroup)
+        self.__pathset.create_path_params(params)
+        self.__pathset.eval_pathpars(k=self.model.k, var_names=var_names)
+
+    def _calc_residual(self, data_only=False):
+        "calculate the residual, after _eval_pathpars()"
+        self.model.chi, jac = self.__pathset.calc_arrays()
 
         eps_k = self.epsilon_k
         if isinstance(eps_k, np.ndarray):
@@ -417,6 +462,21 @@ class FeffitDataSet(Group):
         diff  = (self.__chi - self.model.chi)
         if data_only:  # for extracting transformed data separately from residual
             diff  = self.__chi
+        return self._transform(diff)
+
+    def _calc_jacobian(self):
+        "calculate the Jacobian, after _eval_pathpars() with var_names"
+        self.model.chi, jac = self.__pathset.calc_arrays()
+        return -np.array([self._transform(d) for d in jac]).T
+
+    def _store_paths(self):
+        "write chi(k) to the paths, after _calc_residual() or _calc_jacobian()"
+        self.__pathset.store_arrays()
+
+    def _transform(self, diff):
+        """apply the fit transform (k-weighting, windows, and Fourier
+        or wavelet transforms, scaled by uncertainties) to chi(k)"""
+        eps_k = self.epsilon_k
         trans = self.transform
         k     = trans.k_[:len(diff)]
 
@@ -521,7 +581,8 @@ def feffit_transform(_larch=None, **kws):
     """
     return TransformGroup(_larch=_larch, **kws)
 
-def feffit(paramgroup, datasets, rmax_out=10, path_outputs=True, _larch=None, **kws):
+def feffit(paramgroup, datasets, rmax_out=10, path_outputs=True, workers=1,
+           _larch=None, **kws):
     """execute a Feffit fit: a fit of feff paths to a list of datasets
 
     Parameters:
@@ -530,6 +591,7 @@ def feffit(paramgroup, datasets, rmax_out=10, path_outputs=True, _larch=None, **
       datasets:     Feffit Dataset group or list of Feffit Dataset group.
       rmax_out:     maximum R value to calculate output arrays.
       path_output:  Flag to set whether all Path outputs should be written.
+      workers:      number of threads to use to calculate datasets concurrently (1).
 
     Returns:
     ---------
@@ -567,9 +629,30 @@ def feffit(paramgroup, datasets, rmax_out=10, path_outputs=True, _larch=None, **
 
     params = group2params(work_paramgroup)
 
+    def _evaluate(params, datasets, var_names=None):
+        """evaluate residual or Jacobian for all datasets, calculating
+        the datasets concurrently if there is a thread pool"""
+        for ds in datasets:
+            ds._eval_pathpars(params, var_names=var_names)
+        calc = FeffitDataSet._calc_residual
+        if var_names is not None:
+            calc = FeffitDataSet._calc_jacobian
+        if pool is None:
+            out = [calc(ds) for ds in datasets]
+        else:
+            out = list(pool.map(calc, datasets))
+        for ds in datasets:
+            ds._store_paths()
+        return concatenate(out)
+
     def _resid(params, datasets=None, pargroup=None, **kwargs):
         """ this is the residual function"""
-        return concatenate([d._residual(params) for d in datasets])
+        return _evaluate(params, datasets)
+
+    def _jacobian(params, datasets=None, pargroup=None, **kwargs):
+        """ this is the Jacobian of the residual function"""
+        var_names = [name for name, par in params.items() if par.vary]
+        return _evaluate(params, datasets, var_names=var_names)
 
     if isNamedClass(datasets, FeffitDataSet):
         datasets = [datasets]
@@ -580,11 +663,22 @@ def feffit(paramgroup, datasets, rmax_out=10, path_outputs=True, _larch=None, **
             return
         ds.prepare_fit(params=params)
 
+    pool = None
+    if workers > 1 and len(datasets) > 1:
+        pool = ThreadPoolExecutor(max_workers=workers)
+
+    # use the analytic Jacobian unless Dfun=None is given
+    fit_kws.setdefault('Dfun', _jacobian)
     fit = Minimizer(_resid, params,
                     fcn_kws=dict(datasets=datasets, pargroup=work_paramgroup),
                     scale_covar=True, **fit_kws)
 
-    result = fit.leastsq()
+    try:
+        result = fit.leastsq()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+            pool = None
     params2group(result.params, work_paramgroup)
 
     dat = concatenate([d._residual(work_paramgroup, data_only=True) for d in datasets])
@@ -10,16 +10,18 @@ from .xrd_fitting import (peakfinder, peaklocater, peakfitter, peakfilter,
 
 from .xrd_pyFAI import (integrate_xrd, integrate_xrd_row, read_lambda,
                         calc_cake, save1D, return_ai, twth_from_xy,
-                        q_from_xy, eta_from_xy)
+                        q_from_xy, eta_from_xy, XRDIntegrator,
+                        get_xrd_integrator)
 
 from .xrd_tools import (d_from_q, d_from_twth, twth_from_d, twth_from_q,
                         E_from_lambda, lambda_from_E, q_from_d,
                         q_from_twth, qv_from_hkl, d_from_hkl,
                         unit_cell_volume, generate_hkl)
 
-from .xrd_cif import (SPACEGROUPS, create_xrdcif, check_elemsym, SPGRP_SYMM)
+from .xrd_cif import (SPACEGROUPS, create_xrdcif, check_elemsym, SPGRP_SYMM,
+                      calc_fhkl)
 
-from .cifdb import (get_cifdb, cifDB, cif_match, read_cif, SearchCIFdb,
+from .cifdb import (get_cifdb, cifDB, cif_match, read_cif, SearchCIFdb, QPeakIndex,
                     match_database, CATEGORIES, QSTEP, QMIN, QMAX, QAXIS)
 
 from .amscifdb import CifStructure, get_amscifdb, get_cif, find_cifs
@@ -4,17 +4,19 @@ build American Mineralogist Crystal Structure Databse (amcsd)
 '''
 
 import os
+import json
+import hashlib
 import requests
 import numpy as np
 from itertools import groupby
 from distutils.version import StrictVersion
 
 import larch
+from larch.site_config import user_larchdir
 from .xrd_fitting import peaklocater
 from .xrd_cif import create_xrdcif, SPACEGROUPS
 from .xrd_tools import lambda_from_E
 
-import json
 from larch.utils.jsonutils import encode4js, decode4js
 
 from sqlalchemy import (create_engine, MetaData, Table, Column, Integer,
@@ -82,6 +84,8 @@ QAXIS = np.arange(QMIN, QMAX+QSTEP, QSTEP)
 ENERGY = 19000 ## units eV
 _cifdb = None
 
+QINDEX_DIR = os.path.join(user_larchdir, 'xrd')
+
 def get_cifdb(dbname='amcsd_cif0.db', _larch=None):
     global _cifdb
     if _cifdb is None:
@@ -126,6 +130,142 @@ def iscifDB(dbname):
     return result
 
 
+def qindex_file(dbname):
+    "name of the file for the q-peak index of a cif database"
+    dbname = os.path.abspath(dbname)
+    key = hashlib.sha1(dbname.encode('utf-8')).hexdigest()[:12]
+    root = os.path.splitext(os.path.basename(dbname))[0]
+    return os.path.join(QINDEX_DIR, '%s_%s.qindex.npz' % (root, key))
+
+def _db_stamp(dbname):
+    "identifies the version of a database file"
+    stat = os.stat(dbname)
+    return json.dumps([os.path.abspath(dbname), stat.st_size, stat.st_mtime_ns])
+
+
+class QPeakIndex(object):
+    '''
+    inverted index of the q peaks of the CIFs in a cifDB
+
+    For each bin of the database q axis, rows[indptr[i]:indptr[i+1]] are
+    the rows of amcsd for the CIFs with a peak in that bin.  Patterns of
+    q peaks are scored against all CIFs by counting the CIFs listed for
+    the bins of the peaks, without building a dense (CIF x q) matrix.
+    '''
+    def __init__(self, amcsd, axis, indptr, rows):
+        self.amcsd = np.asarray(amcsd, dtype=np.int64)
+        self.axis = np.asarray(axis, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self._binned = {}
+
+    @classmethod
+    def from_cifdb(cls, cifdb):
+        "build index from the qstr of all CIFs in a cifDB"
+        amcsd, bins, rows = [], [], []
+        qry = cifdb.query(cifdb.ciftbl.c.amcsd_id, cifdb.ciftbl.c.qstr).all()
+        for irow, (amcsd_id, qstr) in enumerate(qry):
+            ibins = np.flatnonzero(np.array(json.loads(qstr)) == 1)
+            amcsd.append(amcsd_id)
+            bins.append(ibins)
+            rows.append(np.full(len(ibins), irow))
+        bins = np.concatenate(bins) if len(bins) > 0 else np.zeros(0, dtype=np.int64)
+        rows = np.concatenate(rows) if len(rows) > 0 else np.zeros(0, dtype=np.int64)
+        order = np.argsort(bins, kind='stable')
+        indptr = np.searchsorted(bins[order], np.arange(len(cifdb.axis)+1))
+        return cls(amcsd, cifdb.axis, indptr, rows[order])
+
+    @classmethod
+    def read(cls, fname, stamp):
+        "read index from file, or return None if missing or out of date"
+        if not os.path.exists(fname):
+            return None
+        try:
+            with np.load(fname, allow_pickle=False) as npz:
+                if str(npz['stamp']) != stamp:
+                    return None
+                return cls(npz['amcsd'], npz['axis'], npz['indptr'], npz['rows'])
+        except Exception:
+            return None
+
+    def save(self, fname, stamp):
+        "save index to file, returning whether it was saved"
+        try:
+            os.makedirs(os.path.dirname(fname), exist_ok=True)
+            tmpfile = '%s.%d.tmp' % (fname, os.getpid())
+            with open(tmpfile, 'wb') as fh:
+                np.savez(fh, stamp=np.array(stamp), amcsd=self.amcsd,
+                         axis=self.axis, indptr=self.indptr, rows=self.rows)
+            os.replace(tmpfile, fname)
+        except OSError:
+            return False
+        return True
+
+    def binned(self, qmin=QMIN, qmax=QMAX, qstep=QSTEP):
+        '''
+        index for q range and step, as used by cifDB.amcsd_by_q
+
+        returns qaxis, indptr, rows, and the number of peaks for each CIF
+        '''
+        key = (qmin, qmax, qstep)
+        if key in self._binned:
+            return self._binned[key]
+
+        ## Defines min/max limits of q-range
+        axis = self.axis
+        imin, imax = 0, len(axis)
+        if qmax < np.max(axis):
+            imax = abs(axis-qmax).argmin()
+        if qmin > np.min(axis):
+            imin = abs(axis-qmin).argmin()
+        qaxis = axis[imin:imax]
+        stepq = (qaxis[1]-qaxis[0])
+
+        ncif = len(self.amcsd)
+        rows = self.rows[self.indptr[imin]:self.indptr[imax]]
+        bins = np.repeat(np.arange(imax-imin), np.diff(self.indptr[imin:imax+1]))
+
+        ## Re-bins to nearest point of new axis if different step size is specified
+        if qstep > stepq:
+            new_qaxis = np.arange(np.min(qaxis), np.max(qaxis)+stepq, qstep)
+            newbin = abs(new_qaxis - qaxis[:, np.newaxis]).argmin(axis=1)
+            bins, rows = np.divmod(np.unique(newbin[bins]*ncif + rows), ncif)
+            qaxis = new_qaxis
+
+        indptr = np.searchsorted(bins, np.arange(len(qaxis)+1))
+        total = np.bincount(rows, minlength=ncif)
+        self._binned[key] = out = (qaxis, indptr, rows, total)
+        return out
+
+    def iter_match(self, patterns, qmin=QMIN, qmax=QMAX, qstep=QSTEP,
+                   chunksize=2**22):
+        '''
+        number of matched peaks for each CIF for patterns of q peaks,
+        in chunks of patterns
+
+        yields (ipat, total, match) with ipat the index of the first pattern
+        of the chunk and match an array of shape (npatterns, nCIFs)
+        '''
+        qaxis, indptr, rows, total = self.binned(qmin=qmin, qmax=qmax, qstep=qstep)
+        ncif = len(self.amcsd)
+        nchunk = max(1, chunksize // max(1, ncif))
+        for ipat in range(0, len(patterns), nchunk):
+            chunk = patterns[ipat:ipat+nchunk]
+            bins, pats = [], []
+            for i, peaks in enumerate(chunk):
+                peaks = np.asarray(peaks, dtype=np.float64).ravel()
+                pbins = np.unique(abs(qaxis - peaks[:, np.newaxis]).argmin(axis=1))
+                bins.append(pbins)
+                pats.append(np.full(len(pbins), i))
+            bins, pats = np.concatenate(bins), np.concatenate(pats)
+            starts, nrows = indptr[bins], indptr[bins+1]-indptr[bins]
+            offsets = np.cumsum(nrows) - nrows
+            pos = np.arange(nrows.sum()) + np.repeat(starts-offsets, nrows)
+            match = np.bincount(np.repeat(pats, nrows)*ncif + rows[pos],
+                                minlength=len(chunk)*ncif)
+            yield ipat, total, match.reshape(len(chunk), ncif)
+
+
 class cifDB(object):
     '''
     interface to the American Mineralogist Crystal Structure Database
@@ -183,6 +323,7 @@ class cifDB(object):
         self.ciftbl  = Table('ciftbl', self.metadata)
 
         self.axis = np.array([float(q[0]) for q in self.query(self.qtbl.c.q).all()])
+        self._qindex = None
 
 
     def query(self, *args, **kws):
@@ -545,6 +686,7 @@ class cifDB(object):
             self.amcsd_info(cif.id_no, no_qpeaks=np.sum(qarr))
         else:
             self.amcsd_info(cif.id_no, no_qpeaks=np.sum(qarr),ciffile=ciffile)
+        self._qindex = None
 
     def url_to_cif(self, url=None, verbose=False, savecif=False, addDB=True,
                    all=False, minval=None):
@@ -728,53 +870,84 @@ class cifDB(object):
 ##################################################################################
 ##################################################################################
 
+    def get_qindex(self):
+        '''
+        return the QPeakIndex of the CIFs in the database, read from or
+        saved to the index file in the user larch directory
+        '''
+        if self._qindex is None:
+            fname, stamp = qindex_file(self.dbname), _db_stamp(self.dbname)
+            qindex = QPeakIndex.read(fname, stamp)
+            if qindex is None:
+                qindex = QPeakIndex.from_cifdb(self)
+                qindex.save(fname, stamp)
+            self._qindex = qindex
+        return self._qindex
+
     def amcsd_by_q(self, peaks, qmin=None, qmax=None, qstep=None, list=None,
                    verbose=False):
+        '''
+        score CIFs by the number of matched peaks minus the number of
+        missed peaks for a list of q peaks
 
-        if qmin is None: qmin = QMIN
-        if qmax is None: qmax = QMAX
-        if qstep is None: qstep = QSTEP
-
-        ## Defines min/max limits of q-range
-        imin, imax = 0, len(self.axis)
-        if qmax < np.max(self.axis):
-            imax = abs(self.axis-qmax).argmin()
-        if qmin > np.min(self.axis):
-            imin = abs(self.axis-qmin).argmin()
-        qaxis = self.axis[imin:imax]
-        stepq = (qaxis[1]-qaxis[0])
-
-        amcsd, q_amcsd = self.match_qc(list=list, qmin=qmin, qmax=qmax)
-
-        ## Re-bins data if different step size is specified
-        if qstep > stepq:
-            new_qaxis   = np.arange(np.min(qaxis),np.max(qaxis)+stepq,qstep)
-            new_q_amcsd = np.zeros((np.shape(q_amcsd)[0],np.shape(new_qaxis)[0]))
-            for m,qrow in enumerate(q_amcsd):
-                for n,qn in enumerate(qrow):
-                    if qn == 1:
-                        k = np.abs(new_qaxis-qaxis[n]).argmin()
-                        new_q_amcsd[m][k] = 1
-            qaxis = new_qaxis
-            q_amcsd = new_q_amcsd
+        returns list of (score, amcsd_id, total, matched, missed) for all
+        CIFs, best match first
+        '''
+        return self.amcsd_by_q_batch([peaks], qmin=qmin, qmax=qmax, qstep=qstep,
+                                     list=list, top=None)[0]
 
+    def amcsd_by_q_batch(self, patterns, qmin=None, qmax=None, qstep=None,
+                         list=None, top=10):
+        '''
+        score CIFs as for amcsd_by_q for many lists of q peaks, such as
+        for all pixels of an XRD map
 
-        ## Create data array
-        peaks_weighting = np.ones(len(qaxis),dtype=int)*-1
-        peaks_true = np.zeros(len(qaxis),dtype=int)
-        peaks_false = np.ones(len(qaxis),dtype=int)
-        for p in peaks:
-            i = np.abs(qaxis-p).argmin()
-            peaks_weighting[i],peaks_true[i],peaks_false[i] = 1,1,0
+        Arguments:
+        ----------
+        patterns   list of lists (or 1-d arrays) of q peaks
+        qmin       minimum q to use [QMIN]
+        qmax       maximum q to use [QMAX]
+        qstep      step in q for matching peaks [QSTEP]
+        list       list of amcsd ids to match, or None for all CIFs [None]
+        top        number of best matches to return, or None for all [10]
 
-        ## Calculate score/matches/etc.
-        total_peaks = np.sum((q_amcsd),axis=1)
-        match_peaks = np.sum((peaks_true*q_amcsd),axis=1)
-        miss_peaks = np.sum((peaks_false*q_amcsd),axis=1)
-        scores = np.sum((peaks_weighting*q_amcsd),axis=1)
+        Returns:
+        --------
+        list with, for each pattern, a list of (score, amcsd_id, total,
+        matched, missed) for the best matches, best match first
+        '''
+        if qmin is None: qmin = QMIN
+        if qmax is None: qmax = QMAX
+        if qstep is None: qstep = QSTEP
 
-        return sorted(zip(scores, amcsd, total_peaks, match_peaks, miss_peaks), reverse=True)
+        qindex = self.get_qindex()
+        amcsd = qindex.amcsd
+        select = None
+        if list is not None:
+            select = np.isin(amcsd, np.asarray(list))
+            amcsd = amcsd[select]
+        idmax = amcsd.max()+1 if len(amcsd) > 0 else 1
 
+        out = []
+        for ipat, total, match in qindex.iter_match(patterns, qmin=qmin,
+                                                    qmax=qmax, qstep=qstep):
+            if select is not None:
+                total, match = total[select], match[:, select]
+            scores = 2*match - total
+            ## order by score, then amcsd_id, as for sorted(reverse=True)
+            key = scores*idmax + amcsd
+            if top is not None and top < len(amcsd):
+                best = np.argpartition(-key, top-1, axis=1)[:, :top]
+            else:
+                best = np.tile(np.arange(len(amcsd)), (len(key), 1))
+            order = np.argsort(-np.take_along_axis(key, best, axis=1), axis=1)
+            best = np.take_along_axis(best, order, axis=1)
+            matched = np.take_along_axis(match, best, axis=1)
+            for i, ibest in enumerate(best):
+                cols = (scores[i][ibest], amcsd[ibest], total[ibest],
+                        matched[i], total[ibest]-matched[i])
+                out.append([*zip(*[c.tolist() for c in cols])])
+        return out
 
     def amcsd_by_chemistry(self, include=[], exclude=[]):
 
@@ -1285,31 +1458,21 @@ def cif_match(peaks, qmin=None, qmax=None, verbose=False, _larch=None):
 
     rows = cifdb.amcsd_by_q(peaks, qmin=qmin,qmax=qmax, qstep=qstep)
 
-    scores, amcsd, total_peaks, match_peaks, miss_peaks = rows
-
-    matches = []
-    for i, cdat in enumerate(amcsd):
-        if score[i] > 0:
-            matches.append(cdat)
+    matches = [row for row in rows if row[0] > 0]
 
     if verbose:
         print('\n')
-        if len(MATCHES) > 100:
-            print('DISPLAYING TOP 100 of %i TOTAL MATCHES FOUND.' % len(MATCHES))
+        if len(matches) > 100:
+            print('DISPLAYING TOP 100 of %i TOTAL MATCHES FOUND.' % len(matches))
         else:
-            print('%i TOTAL MATCHES FOUND.' % len(MATCHES))
-        matches = matches[:100]
-        for i, id_no in enumerate(amcsd):
-            if j < 100:
-                if scores[i] > 0:
-                    j += 1
-                    str = 'AMCSD %5d, %s (score of %2d --> %i of %i peaks)' % (id_no,
-                             cifdb.mineral_by_amcsd(id_no),scores[i],
-                             match_peaks[i],total_peaks[i])
-                    print(str)
+            print('%i TOTAL MATCHES FOUND.' % len(matches))
+        for score, id_no, total, nmatch, nmiss in matches[:100]:
+            str = 'AMCSD %5d, %s (score of %2d --> %i of %i peaks)' % (id_no,
+                     cifdb.mineral_by_amcsd(id_no), score, nmatch, total)
+            print(str)
         print('')
 
-    return matches
+    return [row[1] for row in matches]
 
 
 def read_cif(filename=None, amcsd_id=None, _larch=None):
@@ -2668,23 +2668,27 @@ class XRDCIF(object):
         ii, jj = qhkl < q_max, qhkl > q_min
         ii = jj*ii
 
-        for i, hkl in enumerate(hkl_list):
-            Fhkl = 0
-            if ii[i]:
-                for el in self.atom.label:  ## loops through each element
-                    for uvw in self.elem_uvw[el]: ## loops through each position in unit cell
-                        hukvlw = hkl[0]*uvw[0]+hkl[1]*uvw[1]+hkl[2]*uvw[2]## (hu+kv+lw)
-                        Fhkl = Fhkl + (np.exp(2*1j*PI*hukvlw)).real
-            if abs(Fhkl) > 1e-5:
-                F2hkl[i] = np.float(Fhkl**2)
+        elems, uvw = self.atom_positions()
+        Fhkl = calc_fhkl(hkl_list[ii], uvw).real
+        Fhkl = np.where(abs(Fhkl) > 1e-5, Fhkl, 0)
+        F2hkl[ii] = Fhkl**2
 
         ## removes zero value structure factors
         ii = ii*(F2hkl > 0.001)
 
         qarr = np.array(qhkl[ii], dtype=np.float64)
 
-        return sorted(np.array(list(set(qarr))))
+        return list(np.unique(qarr))
 
+    def atom_positions(self):
+        """returns elements and fractional coordinates of all atoms in the
+        unit cell, as a list and an array of shape (npositions, 3)"""
+        elems, uvw = [], []
+        for el in self.atom.label:
+            for pos in self.elem_uvw[el]:
+                elems.append(el)
+                uvw.append(pos)
+        return elems, np.array(uvw, dtype=np.float64).reshape(-1, 3)
 
     def structure_factors(self, wavelength=None, energy=None, qmin=0.2, qmax=10.2):
         if not HAS_CifFile:
@@ -2719,42 +2723,24 @@ class XRDCIF(object):
             f1vals[el] = f1_chantler(el, energy)
             f2vals[el] = f2_chantler(el, energy)
 
-        for i, hkl in enumerate(hkls):
-            if not ii[i]:
-                continue
-            fhkl = 0.0
-            for el in self.atom.label:
-                fval = f0vals[el][i] + f1vals[el] - 1j*f2vals[el]
-                for uvw in self.elem_uvw[el]:
-                    # (hu+kv+lw)
-                    hukvlw = hkl[0]*uvw[0] + hkl[1]*uvw[1] + hkl[2]*uvw[2]
-                    fhkl += fval*np.exp(2*1j*PI*hukvlw)
-            f2hkl[i] = (fhkl*fhkl.conjugate()).real
+        # form factors for each position and each hkl in range
+        elems, uvw = self.atom_positions()
+        fvals = {el: f0vals[el][ii] + f1vals[el] - 1j*f2vals[el]
+                 for el in f0vals}
+        fpos = np.array([fvals[el] for el in elems])
+        fhkl = calc_fhkl(hkls[ii], uvw, fpos)
+        f2hkl[ii] = (fhkl*fhkl.conjugate()).real
 
         ## removes zero value structure factors
         ii = ii*(f2hkl > 1.e-4)
 
-        # push q values to large ints to better find duplicates
-        qhkl   = [int(round(_q*1.e7)) for _q in qhkl[ii]]
-        hkl    = hkls[ii]
-        f2hkl  = f2hkl[ii]
-
-        # find duplicates, set degen
-        qwork, degen, f2work, hklwork = [], [], [], []
-        for i, _q in enumerate(qhkl):
-            if _q in qwork:
-                degen[qwork.index(_q)] += 1
-            else:
-                qwork.append(_q)
-                degen.append(1)
-                f2work.append(f2hkl[i])
-                hklwork.append(hkl[i])
-
-        qorder = np.argsort(qwork)
-        qhkl  = np.array(qwork, dtype=np.float64)[qorder]/1.e7
-        degen = np.array(degen)[qorder]
-        f2hkl = np.array(f2work)[qorder]
-        hkl   = abs(np.array(hklwork)[qorder])
+        # push q values to large ints to better find duplicates,
+        # keeping the first hkl for each q, in order of increasing q
+        qhkl, index, degen = np.unique(np.round(qhkl[ii]*1.e7).astype(np.int64),
+                                       return_index=True, return_counts=True)
+        qhkl  = qhkl.astype(np.float64)/1.e7
+        f2hkl = f2hkl[ii][index]
+        hkl   = abs(hkls[ii][index])
 
         twotheta = twth_from_q(qhkl, wavelength)
         if np.any(np.isnan(twotheta)):
@@ -2782,6 +2768,35 @@ class XRDCIF(object):
         twth = PI*twth/180
         return (1+np.cos(twth)**2)/(np.sin(twth/2)**2*np.cos(twth/2))
 
+def calc_fhkl(hkls, uvw, fvals=None, chunksize=2**21):
+    """structure factors F(hkl) = sum_j f_j exp(2*pi*i*(h*u_j + k*v_j + l*w_j))
+
+    Arguments:
+      hkls       array of hkl, shape (nhkl, 3)
+      uvw        array of fractional coordinates of atoms, shape (npositions, 3)
+      fvals      array of form factors, shape (npositions, nhkl) or None for 1
+      chunksize  maximum size of arrays of phase factors [2**21]
+
+    Returns:
+      complex array of F(hkl), with terms summed in order of position
+    """
+    hkls = np.asarray(hkls)
+    nhkl = len(hkls)
+    fhkl = np.zeros(nhkl, dtype=np.complex128)
+    if len(uvw) == 0:
+        return fhkl
+    step = max(1, chunksize//len(uvw))
+    for start in range(0, nhkl, step):
+        sl = slice(start, start+step)
+        h, k, l = hkls[sl].T
+        # (hu+kv+lw), shape (npositions, nhkl)
+        hukvlw = h*uvw[:, 0:1] + k*uvw[:, 1:2] + l*uvw[:, 2:3]
+        terms = np.exp(2*1j*PI*hukvlw)
+        if fvals is not None:
+            terms = fvals[:, sl]*terms
+        fhkl[sl] = terms.sum(axis=0)
+    return fhkl
+
 def check_elemsym(atom):
 
     match_list = []
@@ -8,7 +8,10 @@ mkak 2017.03.14
 ##########################################################################
 # IMPORT PYTHON PACKAGES
 import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+from scipy.sparse import csr_matrix
 
 HAS_pyFAI = False
 try:
@@ -70,9 +73,210 @@ def read_lambda(calfile):
     ai = pyFAI.load(calfile)
     return ai._wavelength*1e10 ## units A
 
+class XRDIntegrator(object):
+    '''
+    1D integration of stacks of 2D XRD images, such as the rows of an XRD map,
+    with one pyFAI calibration
+
+    The calibration, mask, and dark image are read once, and the CSR lookup
+    table from pixels to integration bins is built once for each image shape,
+    so that a stack of images is integrated with one sparse matrix product
+    for each batch of images.  Results agree with pyFAI integrate1d() with
+    method='csr' to single precision.
+
+    With workers > 1, integrate() starts a pool of processes, each with a
+    copy of the lookup table, and keeps it for later calls with the same
+    number of workers and image shape.  Use close(), or the integrator in
+    a 'with' block, to shut down the pool.
+
+    calfile      : poni calibration file
+    unit         : unit for integration data ('2th'/'q'); default is 'q'
+    steps        : number of steps in integration data; default is 2048
+    wedge_limits : azimuthal slice limits
+    mask         : mask array (or tiff file) for image
+    dark         : dark image array (or tiff file)
+    flip         : vertically flips image to correspond with Dioptas poni file calibration
+    polarization_factor : polarization factor, or None for no correction; default is 0.999
+    correctSolidAngle   : whether to correct for solid angle of pixels; default is True
+    '''
+    def __init__(self, calfile, unit='q', steps=2048, wedge_limits=None,
+                 mask=None, dark=None, flip=True, polarization_factor=0.999,
+                 correctSolidAngle=True):
+        if not HAS_pyFAI:
+            raise ImportError('pyFAI not imported. Cannot calculate 1D integration.')
+        self.calfile = calfile
+        self.ai = pyFAI.load(calfile)
+        self.unit = pyFAI.units.to_unit('2th_deg' if unit.startswith('2th') else 'q_A^-1')
+        self.steps = steps
+        self.wedge_limits = wedge_limits
+        if isinstance(mask, str):
+            mask = np.array(tifffile.imread(mask))
+        if isinstance(dark, str):
+            dark = np.array(tifffile.imread(dark))
+        self.mask = mask
+        self.dark = dark
+        self.flip = flip
+        self.polarization_factor = polarization_factor
+        self.correctSolidAngle = correctSolidAngle
+        self.shape = None
+        self.q = None
+        self._pool = None
+        self._pool_key = None
+
+    def __getstate__(self):
+        "pickled without the pyFAI integrator or pool, for worker processes"
+        state = self.__dict__.copy()
+        state['ai'] = None
+        state['_pool'] = None
+        return state
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        "shut down the pool of worker processes, if any"
+        if self._pool is not None:
+            self._pool.shutdown()
+        self._pool = self._pool_key = None
+
+    def _get_pool(self, workers):
+        "pool of worker processes with copies of the integrator for the current shape"
+        if self._pool is not None and self._pool_key != (workers, self.shape):
+            self.close()
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=workers,
+                                             initializer=_init_integrator,
+                                             initargs=(self,))
+            self._pool_key = (workers, self.shape)
+        return self._pool
+
+    def _setup(self, shape):
+        "build lookup table and normalization for images of a shape"
+        shape = tuple(shape)
+        if shape == self.shape:
+            return
+        ai = self.ai
+        if ai is None:
+            ai = self.ai = pyFAI.load(self.calfile)
+        mask = ai.mask if self.mask is None else np.ascontiguousarray(self.mask)
+        azimuth_range = None
+        if self.wedge_limits is not None:
+            azimuth_range = ai.normalize_azimuth_range(self.wedge_limits)
+        integr = ai.setup_sparse_integrator(shape, self.steps, mask, None,
+                                            azimuth_range, unit=self.unit,
+                                            split='bbox', algo='csr',
+                                            empty=ai.empty, scale=False)
+        data, indices, indptr = integr.lut
+        npix = shape[0]*shape[1]
+        lut = csr_matrix((data.astype(np.float64), indices, indptr),
+                         shape=(self.steps, npix))
+
+        norm = np.ones(shape)
+        if self.correctSolidAngle:
+            norm = norm*ai.solidAngleArray(shape, True)
+        if self.polarization_factor is not None:
+            norm = norm*ai.polarization(shape, self.polarization_factor)
+        if ai.detector.flatfield is not None:
+            norm = norm*ai.detector.flatfield
+        dark = self.dark if self.dark is not None else ai.detector.darkcurrent
+
+        self.norm = lut @ norm.ravel()
+        self.darksum = None if dark is None else lut @ np.ravel(dark)
+        # pyFAI integrates the flipped image: map its pixels back to the
+        # pixels of the image as given, instead of flipping each image
+        if self.flip:
+            pixels = np.arange(npix).reshape(shape)[::-1, :].ravel()
+            lut = csr_matrix((lut.data, pixels[lut.indices], lut.indptr),
+                             shape=lut.shape)
+        self.lut = lut
+        self.empty = ai.empty
+        self.q = integr.bin_centers*self.unit.scale
+        self.shape = shape
+
+    def _integrate_batch(self, frames):
+        "integrate a 3D stack of images, returns 2D array"
+        nframes = len(frames)
+        signal = self.lut @ np.asarray(frames, dtype=np.float64).reshape(nframes, -1).T
+        if self.darksum is not None:
+            signal -= self.darksum[:, np.newaxis]
+        valid = self.norm > 0
+        out = np.full(signal.shape, self.empty, dtype=np.float64)
+        out[valid] = signal[valid] / self.norm[valid, np.newaxis]
+        return out.T
+
+    def integrate(self, frames, batchsize=64, workers=1):
+        '''
+        integrate one 2D image or a 3D stack of images
+
+        frames    : 2D image or 3D stack of images
+        batchsize : number of images to integrate at once; default is 64
+        workers   : number of processes to integrate batches; default is 1
+                    (the pool of processes is kept for the next call)
+
+        returns q (or 2th), and the integrated data, a 1D array for one
+        image or a 2D array for a stack of images.
+        '''
+        frames = np.asarray(frames)
+        single = frames.ndim == 2
+        if single:
+            frames = frames[np.newaxis, ...]
+        self._setup(frames.shape[1:])
+        nframes = len(frames)
+        out = np.empty((nframes, self.steps), dtype=np.float64)
+        if workers > 1 and nframes > batchsize:
+            pool = self._get_pool(workers)
+            jobs = [(i, pool.submit(_integrate_worker, frames[i:i+batchsize]))
+                    for i in range(0, nframes, batchsize)]
+            for i, job in jobs:
+                out[i:i+batchsize] = job.result()
+        else:
+            for i in range(0, nframes, batchsize):
+                out[i:i+batchsize] = self._integrate_batch(frames[i:i+batchsize])
+        if single:
+            return self.q, out[0]
+        return self.q, out
+
+_worker_integrator = None
+
+def _init_integrator(integrator):
+    global _worker_integrator
+    _worker_integrator = integrator
+
+def _integrate_worker(frames):
+    return _worker_integrator._integrate_batch(frames)
+
+_integrators = {}
+
+def _array_key(arr):
+    if arr is None or isinstance(arr, str):
+        return arr
+    arr = np.ascontiguousarray(arr)
+    return (arr.shape, arr.dtype.str, zlib.crc32(arr))
+
+def get_xrd_integrator(calfile, unit='q', steps=2048, wedge_limits=None,
+                       mask=None, dark=None, flip=True):
+    '''
+    return an XRDIntegrator for a calibration file and integration settings,
+    re-using the XRDIntegrator (and its lookup table) for the same settings
+    '''
+    if wedge_limits is not None:
+        wedge_limits = tuple(wedge_limits)
+    key = (os.path.abspath(calfile), os.path.getmtime(calfile), unit, steps,
+           wedge_limits, _array_key(mask), _array_key(dark), flip)
+    if key not in _integrators:
+        if len(_integrators) > 7:
+            _integrators.pop(next(iter(_integrators))).close()
+        _integrators[key] = XRDIntegrator(calfile, unit=unit, steps=steps,
+                                          wedge_limits=wedge_limits, mask=mask,
+                                          dark=dark, flip=flip)
+    return _integrators[key]
+
 def integrate_xrd_row(rowxrd2d, calfile, unit='q', steps=2048,
                       wedge_limits=None, mask=None, dark=None,
-                      flip=True):
+                      flip=True, workers=1):
     '''
     Uses pyFAI (poni) calibration file to produce 1D XRD data from a row of 2D XRD images
 
@@ -86,6 +290,9 @@ def integrate_xrd_row(rowxrd2d, calfile, unit='q', steps=2048,
     mask         : mask array for image
     dark         : dark image array
     flip         : vertically flips image to correspond with Dioptas poni file calibration
+    workers      : number of processes for integration; default is 1
+
+    The XRDIntegrator for a calibration file and settings is kept for the next row.
     '''
 
     if not HAS_pyFAI:
@@ -93,37 +300,15 @@ def integrate_xrd_row(rowxrd2d, calfile, unit='q', steps=2048,
         return
 
     try:
-        ai = pyFAI.load(calfile)
+        integrator = get_xrd_integrator(calfile, unit=unit, steps=steps,
+                                        wedge_limits=wedge_limits, mask=mask,
+                                        dark=dark, flip=flip)
     except:
         print('calibration file "%s" could not be loaded.' % calfile)
         return
 
-    if type(dark) is str:
-        try:
-            dark = np.array(tifffile.imread(xrd2dbkgd))
-        except:
-            dark = None
-
-    dir = -1 if flip else 1
-    attrs = dict(mask=mask, dark=dark, method='csr',
-             polarization_factor=0.999, correctSolidAngle=True)
-
-    if unit.startswith('2th'):
-        attrs.update({'unit':'2th_deg'})
-    else:
-        attrs.update({'unit':'q_A^-1'})
-
-    if wedge_limits is not None:
-        attrs.update({'azimuth_range':wedge_limits})
-
-    # print("Calc XRD 1D for row", ai, steps, attrs)
-    q, xrd1d = [], []
-    for i, xrd2d in enumerate(rowxrd2d):
-        row_q,row_xrd1d = calcXRD1d(xrd2d[::dir,:], ai, steps, attrs)
-        q     += [row_q]
-        xrd1d += [row_xrd1d]
-
-    return np.array(q), np.array(xrd1d)
+    q, xrd1d = integrator.integrate(rowxrd2d, workers=workers)
+    return np.tile(q, (len(xrd1d), 1)), xrd1d
 
 def integrate_xrd(xrd2d, calfile, unit='q', steps=2048, file='',  wedge_limits=None,
                   mask=None, dark=None, is_eiger=True, save=False, verbose=False):
@@ -166,4 +166,4 @@ def generate_hkl(hmax=15, kmax=15, lmax=15, positive_only=True):
         hklall = np.mgrid[0:hmax+1, 0:kmax+1, 0:lmax+1].reshape(3, -1).T
     else:
         hklall = np.mgrid[-hmax:hmax+1, -kmax:kmax+1, -lmax:lmax+1].reshape(3, -1).T
-    return np.array([hkl for hkl in hklall if hkl[0]**2 + hkl[1]**2 + hkl[2]**2 > 0])
+    return hklall[(hklall**2).sum(axis=1) > 0]
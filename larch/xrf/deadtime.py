@@ -132,13 +132,10 @@ Example:
 >>a   = params[1]
 >>print('a_fit= ',a,' tau_fit=', tau)
 # corrected counts
->>counts_cor = num.ones(counts.shape)
->>ocr_cor = num.ones(mon.shape)
->>for j in range(len(counts)):
-...>icr = calc_icr(ocr[j],tau)
-...>cor = correction_factor(rt[j],lt[j],icr[j],ocr[j])
-...>counts_cor[j] = counts[j]*cor
-...>ocr_cor[j] = counts_cor[j].sum()/lt
+>>icr = calc_icr(ocr,tau)
+>>cor = correction_factor(rt,lt,icr,ocr)
+>>counts_cor = counts*cor[:, num.newaxis]
+>>ocr_cor = counts_cor.sum(1)/lt
 >>pyplot.plot(x,ocr)
 >>pyplot.plot(x,ocr_cor)
 """
@@ -148,10 +145,14 @@ Example:
 import numpy as np
 import scipy
 from scipy.optimize import leastsq
+from scipy.special import lambertw
 from scipy.stats import linregress
 
 E_INV = np.exp(-1)
 
+# deadtimes (in seconds) for the elements of multi-element detectors
+DEADTIME_TAUS = {'xspress3': [100.e-9, 100.e-9, 100.e-9, 100.e-9]}
+
 ##############################################################################
 def correction_factor(rt, lt, icr=None, ocr=None):
     """
@@ -186,53 +187,138 @@ def correct_data(data,rt,lt,icr=None,ocr=None):
     cor = correction_factor(rt, lt, icr, ocr)
     return data * cor
 
-def calc_icr(ocr, tau):
+def detector_taus(taus, ndet):
+    """
+    Return an array of deadtimes for the elements of a detector.
+
+    Parameters:
+    -----------
+    * taus = name of a detector in DEADTIME_TAUS, a single tau, or a list
+             of tau for each detector element
+    * ndet = number of detector elements
+
+    If there are fewer values than detector elements, the last value is
+    used for the remaining elements.
+    """
+    if isinstance(taus, str):
+        taus = DEADTIME_TAUS[taus]
+    taus = np.atleast_1d(np.asarray(taus, dtype=float))[:ndet]
+    if len(taus) < ndet:
+        taus = np.concatenate((taus, [taus[-1]]*(ndet-len(taus))))
+    return taus
+
+def _newton_icr(ocr, tau, tol=0.01, maxiter=100):
+    """
+    Newton-Raphson loop of calc_icr for 1-d arrays of ocr and tau with
+    0 < ocr <= exp(-1)/tau, returning icr and convergence mask
+    """
+    max_icr = 1/tau
+    icr = 1.0*ocr
+    converged = np.zeros(len(ocr), dtype=bool)
+    active = np.arange(len(ocr))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for cnt in range(maxiter):
+            icr0, ocr0, tau0 = icr[active], ocr[active], tau[active]
+            delta = (ocr0*np.exp(icr0*tau0) - icr0) / (icr0*tau0 - 1)
+            done = abs(delta) < tol
+            converged[active[done]] = True
+            active, icr0 = active[~done], icr0[~done] - delta[~done]
+            # went over the top, we assume that the icr is less than 1/tau
+            over = icr0 > max_icr[active]
+            icr0[over] = 1.1*ocr0[~done][over]
+            icr[active] = icr0
+            if len(active) == 0:
+                break
+    return icr, converged
+
+def solve_icr(ocr, tau, method='newton', tol=0.01, maxiter=100):
+    """
+    Calculate the true icr for arrays of ocr and the deadtime factor tau
+    by solving
+
+        ocr = icr * exp(-icr*tau)
+
+    Parameters:
+    -----------
+    * ocr     = output count rate: scalar or array of any shape
+    * tau     = deadtime: scalar or array that broadcasts with ocr, such as
+                one tau per detector element (see detector_taus) for ocr of
+                shape (npixels, ndetectors)
+    * method  = 'newton' for Newton-Raphson iterations as for calc_icr, or
+                'lambertw' for the closed form solution
+                   icr = -W(-ocr*tau)/tau
+                with W the principal branch of the Lambert W function
+    * tol     = convergence tolerance in icr for 'newton'
+    * maxiter = maximum number of iterations for 'newton'
+
+    Outputs:
+    -------
+    * icr, converged: arrays with the shape of ocr and tau broadcast together.
+      where tau <= 0, icr = ocr.  Where ocr exceeds the maximum correctible
+      value of exp(-1)/tau, icr = 1/tau (the top of the deadtime curve) and
+      converged is False.  Where ocr < 0 or is not finite, icr = 0 and
+      converged is False.
+    """
+    ocr, tau = [np.array(a, dtype=float) for a in
+                np.broadcast_arrays(np.asarray(ocr), np.asarray(tau))]
+    icr = ocr.copy()
+    converged = np.ones(ocr.shape, dtype=bool)
+
+    bad = ~(np.isfinite(ocr) & (ocr >= 0))
+    icr[bad] = 0
+    converged[bad] = False
+
+    solve = ~bad & (tau > 0) & (ocr > 0)
+    over = np.zeros(ocr.shape, dtype=bool)
+    over[solve] = ocr[solve] > E_INV/tau[solve]
+    icr[over] = 1/tau[over]
+    converged[over] = False
+    solve &= ~over
+
+    if method.lower().startswith('lambert'):
+        prod = -ocr[solve]*tau[solve]
+        icr[solve] = -lambertw(np.maximum(prod, -E_INV)).real/tau[solve]
+    else:
+        icr[solve], converged[solve] = _newton_icr(ocr[solve], tau[solve],
+                                                   tol=tol, maxiter=maxiter)
+    if icr.ndim == 0:
+        return icr[()], converged[()]
+    return icr, converged
+
+def calc_icr(ocr, tau, method='newton'):
     """
     Calculate the true icr from a given ocr and corresponding deadtime factor
     tau using a Newton-Raphson algorithm to solve the following expression.
 
         ocr = icr * exp(-icr*tau)
 
-    Returns None if the loop cannot converge
+    Returns None if the loop cannot converge.  For arrays of ocr (or tau),
+    returns an array of icr, with NaN where icr cannot be calculated.
 
-    Note below could be improved!
+    See solve_icr for arrays and the closed form solution (method='lambertw').
     """
     # error checks
-    if ocr is None or tau is None or ocr <= 0:
+    if ocr is None or tau is None:
+        return None
+    if np.ndim(ocr) > 0 or np.ndim(tau) > 0:
+        icr, converged = solve_icr(ocr, tau, method=method)
+        return np.where(converged, icr, np.nan)
+    if ocr <= 0:
         return None
 
     # here assume if tau = 0, icr=ocr ie icr/ocr =1
     if tau <=0:
         return ocr
 
-    # max_icr is icr val at top of deadtime curve
-    # max_ocr is the corresponding ocr value
-    # we cannot correct the data if ocr > ocr_max
-    max_icr = 1/tau
-    max_ocr = max_icr*E_INV
-    if ocr > max_ocr:
-        print( 'ocr exceeds maximum correctible value of %g cps' % max_ocr)
-        return None
-
-    # Newton loop
-    icr0 = ocr
-    cnt = 0
-    while cnt < 100:
-        cnt += 1
-        delta = (ocr*np.exp(icr0*tau) - icr0) / (icr0*tau - 1)
-        if  abs(delta) < 0.01:
-            icr = icr0
-            break
+    # we cannot correct the data if ocr > ocr_max, the ocr
+    # value at the top of deadtime curve
+    icr, converged = solve_icr(ocr, tau, method=method)
+    if not converged:
+        if ocr > E_INV/tau:
+            print( 'ocr exceeds maximum correctible value of %g cps' % (E_INV/tau))
         else:
-            icr0 = icr0 - delta
-            if icr0 > max_icr:
-                # went over the top, we assume that
-                # the icr is less than 1/tau
-                icr0 = 1.1 * ocr
-
-    if cnt >= 100:
-        print( 'Warning: icr calculation failed to converge')
-        icr = None
+            print( 'Warning: icr calculation failed to converge')
+        return None
     return icr
 
 ##############################################################################
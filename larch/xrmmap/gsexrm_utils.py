@@ -7,6 +7,7 @@ import larch
 from larch.io import (read_xsp3_hdf5, read_xrf_netcdf,
                       read_xrd_netcdf, read_xrd_hdf5)
 from larch.utils.strutils import fix_varname
+from larch.xrf.deadtime import detector_taus, solve_icr
 from .asciifiles import (readASCII, readMasterFile, readROIFile,
                          readEnvironFile, read1DXRDFile, parseEnviron)
 
@@ -48,6 +49,76 @@ class GSEXRM_Exception(Exception):
     pass
 
 
+class GSEXRM_RowBuffer(object):
+    '''Buffer for consecutive rows of map data, so that each HDF5 dataset
+    is written with one multi-row hyperslab instead of one write per row.
+
+    Rows are held as arrays of the dataset dtype, starting out as zeros
+    (as for newly allocated rows in the HDF5 file).  Use `dataset(dset)`
+    to get an object that can be assigned to like the HDF5 dataset:
+
+    >>> buff = GSEXRM_RowBuffer(row0=10)
+    >>> buff.dataset(h5dset)[10, :npts] = rowdata
+    >>> buff.write()   # writes h5dset[10:11]
+
+    nrows           number of rows in buffer
+    nbytes          size of buffered data
+    '''
+    def __init__(self, row0=0, maxrows=16, maxbytes=2**28):
+        self.row0 = row0
+        self.maxrows = maxrows
+        self.maxbytes = maxbytes
+        self.nrows = 0
+        self.nbytes = 0
+        self.rows = {}
+
+    def dataset(self, dset):
+        "buffered writer for an HDF5 dataset"
+        return GSEXRM_BufferedDataset(self, dset)
+
+    def setrow(self, dset, key, value):
+        "set (part of) one row of a dataset"
+        if not isinstance(key, tuple):
+            key = (key,)
+        irow = key[0] - self.row0
+        if irow < 0:
+            raise GSEXRM_Exception('cannot buffer row %d before row %d' %
+                                   (key[0], self.row0))
+        if dset.name not in self.rows:
+            self.rows[dset.name] = (dset, [])
+        rows = self.rows[dset.name][1]
+        while len(rows) <= irow:
+            rows.append(np.zeros(dset.shape[1:], dtype=dset.dtype))
+            self.nbytes += rows[-1].nbytes
+        rows[irow][key[1:]] = value
+        self.nrows = max(self.nrows, irow+1)
+
+    def full(self):
+        "whether buffer should be written"
+        return self.nrows >= self.maxrows or self.nbytes >= self.maxbytes
+
+    def write(self):
+        "write buffered rows to datasets, and move buffer past them"
+        for dset, rows in self.rows.values():
+            dset[self.row0:self.row0+len(rows)] = np.array(rows)
+        self.row0 += self.nrows
+        self.nrows = 0
+        self.nbytes = 0
+        self.rows = {}
+
+
+class GSEXRM_BufferedDataset(object):
+    '''HDF5 dataset, with row assignments going to a GSEXRM_RowBuffer'''
+    def __init__(self, rowbuffer, dset):
+        self.rowbuffer = rowbuffer
+        self.dset = dset
+        self.shape = dset.shape
+        self.dtype = dset.dtype
+
+    def __setitem__(self, key, value):
+        self.rowbuffer.setrow(self.dset, key, value)
+
+
 class GSEXRM_MCADetector(object):
     '''Detector class, representing 1 detector element (real or virtual)
     has the following properties (many of these as runtime-calculated properties)
@@ -158,6 +229,10 @@ class GSEXRM_Area(object):
 class GSEXRM_MapRow:
     '''
     read one row worth of data:
+
+    dtc_taus : deadtimes for the MCA detector elements (a detector name in
+               larch.xrf.deadtime.DEADTIME_TAUS, a single tau, or a list),
+               used to estimate input counts when these are not recorded
     '''
     def __init__(self, yvalue, xrffile, xrdfile, xpsfile, sisfile, folder,
                  reverse=False, ixaddr=0, dimension=2, ioffset=0,
@@ -165,7 +240,8 @@ class GSEXRM_MapRow:
                  masterfile=None, xrftype=None, xrdtype=None,
                  xrdcal=None, xrd2dmask=None, xrd2dbkgd=None,
                  wdg=0, steps=4096, flip=True, force_no_dtc=False,
-                 has_xrf=True, has_xrd2d=False, has_xrd1d=False):
+                 has_xrf=True, has_xrd2d=False, has_xrd1d=False,
+                 dtc_taus=None):
 
         self.read_ok = False
         self.nrows_expected = nrows_expected
@@ -297,7 +373,8 @@ class GSEXRM_MapRow:
             self.inpcounts = xrf_dat.inputCounts[offslice]
             self.outcounts = xrf_dat.outputCounts[offslice]
 
-            if self.inpcounts.max() < 1:
+            no_inpcounts = self.inpcounts.max() < 1
+            if no_inpcounts:
                 self.inpcounts = self.counts.sum(axis=2)
             if self.outcounts.max() < 1:
                 self.outcounts = self.inpcounts*1.0
@@ -309,6 +386,13 @@ class GSEXRM_MapRow:
             if self.realtime.max() < 0.01:
                 self.realtime = 0.100 * np.ones(self.realtime.shape)
 
+            # estimate input counts from deadtimes of the detector elements
+            if no_inpcounts and dtc_taus is not None:
+                icr, converged = solve_icr(self.outcounts/self.livetime,
+                                           detector_taus(dtc_taus, self.outcounts.shape[1]),
+                                           method='lambertw')
+                self.inpcounts = icr*self.livetime
+
             dt_denom = self.outcounts*self.livetime
             dt_denom[np.where(dt_denom < 1)] = 1.0
             self.dtfactor  = self.inpcounts*self.realtime/dt_denom
@@ -363,7 +447,7 @@ class GSEXRM_MapRow:
                     print("will try to integrate 2DXRD data ", self.xrd2d.shape)
                     # attrs['flip'] = True
                     # self.xrd2d = self.xrd2d[:, 1:-1, 3:-3]
-                    # maxval = 2**32 - 2**14
+                    maxval = 2**32 - 2**14
                     self.xrd2d[np.where(self.xrd2d>maxval)] = 0
                     self.xrdq, self.xrd1d = integrate_xrd_row(self.xrd2d, xrdcal,
                                                               **attrs)
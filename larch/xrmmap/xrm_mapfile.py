@@ -8,6 +8,7 @@ import scipy.stats as stats
 import json
 import multiprocessing as mp
 from functools import partial
+from collections import deque
 
 import larch
 from larch.utils import debugtime, isotime
@@ -22,15 +23,16 @@ from .asciifiles import (readASCII, readMasterFile, readROIFile,
                          readEnvironFile, parseEnviron)
 
 from .gsexrm_utils import (GSEXRM_MCADetector, GSEXRM_Area, GSEXRM_Exception,
-                           GSEXRM_MapRow, GSEXRM_FileStatus)
+                           GSEXRM_MapRow, GSEXRM_FileStatus, GSEXRM_RowBuffer)
 
-from ..xrd import (XRD, E_from_lambda, integrate_xrd_row, q_from_twth,
+from ..xrd import (XRD, E_from_lambda, XRDIntegrator, q_from_twth,
                    q_from_d, lambda_from_E, read_xrd_data)
 
 from larch.math.tomography import tomo_reconstruction, reshape_sinogram, trim_sinogram
 
 DEFAULT_XRAY_ENERGY = 39987.0  # probably means x-ray energy was not found in meta data
 NINIT = 64
+ROI_CHUNKBYTES = 2**28
 COMPRESSION_OPTS = 2
 COMPRESSION = 'gzip'
 #COMPRESSION = 'lzf'
@@ -196,6 +198,68 @@ def remove_zigzag(map, zigzag=0):
     return tmp
 
 
+def calc_roi_sums(counts, slices):
+    '''sums of MCA counts over several ROIs at once
+
+    Parameters
+    ----------
+    counts   array of counts, with channels along the last axis
+    slices   list of channel slices, one for each ROI
+
+    Returns
+    -------
+    array of ROI sums, with ROIs along the first axis
+
+    Notes
+    -----
+    uses a cumulative sum along the channel axis, so that all ROIs
+    need a single pass through the counts, and each ROI then costs
+    one subtraction per pixel.
+    '''
+    counts = np.asarray(counts)
+    nchan = counts.shape[-1]
+    dtype = np.float64 if counts.dtype.kind in 'fc' else np.int64
+    csum = np.zeros(counts.shape[:-1] + (nchan+1,), dtype=dtype)
+    np.cumsum(counts, axis=-1, dtype=dtype, out=csum[..., 1:])
+    lo, hi = [], []
+    for sl in slices:
+        start, stop, _step = sl.indices(nchan)
+        lo.append(start)
+        hi.append(max(start, stop))
+    return np.moveaxis(csum[..., hi] - csum[..., lo], -1, 0)
+
+
+def area_rectangles(area):
+    '''split a map area mask into rectangles, merging runs of rows
+    that have identical segments of selected pixels.
+
+    Parameters
+    ----------
+    area     2-d boolean array for area mask
+
+    Returns
+    -------
+    list of (ymin, ymax, xmin, xmax) for rectangles, with exclusive
+    upper bounds, together covering each pixel of the area once.
+    '''
+    area = np.asarray(area, dtype=bool)
+    nrows, ncols = area.shape
+    rects, opened = [], {}
+    edge = np.zeros(1, dtype=np.int8)
+    for iy in range(nrows+1):
+        segs = set()
+        if iy < nrows:
+            steps = np.diff(np.concatenate((edge, area[iy].astype(np.int8), edge)))
+            segs = set(zip(np.where(steps == 1)[0], np.where(steps == -1)[0]))
+        for seg in list(opened.keys()):
+            if seg not in segs:
+                rects.append((opened.pop(seg), iy, int(seg[0]), int(seg[1])))
+        for seg in segs:
+            if seg not in opened:
+                opened[seg] = iy
+    return rects
+
+
 class GSEXRM_MapFile(object):
     '''
     Access to GSECARS X-ray Microprobe Map File:
@@ -266,6 +330,9 @@ class GSEXRM_MapFile(object):
         self.rowdata       = []
         self.roi_names     = {}
         self.roi_slices    = None
+        self.mca_dets      = []
+        self._schema       = None
+        self._rowbuffer    = None
         self._pixeltime    = None
         self.masterfile    = None
         self.force_no_dtc  = False
@@ -280,6 +347,8 @@ class GSEXRM_MapFile(object):
         self.has_xrf       = has_xrf
         self.has_xrd1d     = has_xrd1d
         self.has_xrd2d     = has_xrd2d
+        # MCA deadtimes, to estimate input counts when not recorded
+        self.dtc_taus      = None
         self.pos_desc = []
         self.pos_addr = []
         ## used for XRD
@@ -518,6 +587,7 @@ class GSEXRM_MapFile(object):
                 self.h5root = h5py.File(self.filename, 'r')
                 print("Warning : file opened as read only")
         self.xrmmap = self.h5root[root]
+        self._schema = None
         if self.folder is None:
             self.folder = bytes2str(self.xrmmap.attrs.get('Map_Folder',''))
         self.last_row = int(self.xrmmap.attrs.get('Last_Row',0))
@@ -730,25 +800,29 @@ class GSEXRM_MapFile(object):
         self.status = GSEXRM_FileStatus.hasdata
 
     def process_row(self, irow, flush=False, complete=False, offset=None,
-                    nrows_expected=None, callback=None):
-        row = self.read_rowdata(irow, offset=offset)
-        if irow == 0:
+                    nrows_expected=None, callback=None, row=None):
+        if row is None:
+            row = self.read_rowdata(irow, offset=offset)
+        if irow == 0 and row is not None:
             nmca, nchan = 0, 2048
             if row.counts is not None:
                 nmca, xnpts, nchan = row.counts.shape
             xrd2d_shape = None
             if row.xrd2d is not None:
-                xrd2d_shape = rows.xrd2d.shape
+                xrd2d_shape = row.xrd2d.shape
             self.build_schema(row.npts, nmca=nmca, nchan=nchan,
                               scaler_names=row.scaler_names,
                               scaler_addrs=row.scaler_addrs,
                               xrd2d_shape=xrd2d_shape, verbose=True,
                               nrows_expected=nrows_expected)
-        if row.read_ok:
+        if row is not None and row.read_ok:
             self.add_rowdata(row, callback=callback)
+            if self._rowbuffer is not None and self._rowbuffer.full():
+                self.write_rowbuffer()
 
         if flush or complete:
             # print("Flush, ", irow, self.last_row, flush, complete)
+            self.write_rowbuffer()
             self.resize_arrays(self.last_row+1, force_shrink=True)
             self.h5root.flush()
             if self._pixeltime is None:
@@ -757,10 +831,25 @@ class GSEXRM_MapFile(object):
                 status = 'complete' if complete else 'flush'
                 callback(filename=self.filename, status=status)
 
+    def write_rowbuffer(self):
+        "write rows held in the row buffer to the HDF5 file"
+        if self._rowbuffer is not None and self._rowbuffer.nrows > 0:
+            self._rowbuffer.write()
+            self.xrmmap.attrs['Last_Row'] = self._rowbuffer.row0 - 1
 
     def process(self, maxrow=None, force=False, callback=None, offset=None,
-                force_no_dtc=False, all_mcas=None):
-        "look for more data from raw folder, process if needed"
+                force_no_dtc=False, all_mcas=None, nworkers=1, nrows_buffer=16):
+        """look for more data from raw folder, process if needed
+
+        Options
+        -------
+          nworkers      number of processes for reading raw row data [1]
+          nrows_buffer  number of rows to write to HDF5 at once [16]
+
+        With nworkers > 1, raw data files for the next rows are read and
+        decoded by a pool of processes while earlier rows are written to
+        the HDF5 file.
+        """
         self.force_no_dtc = force_no_dtc
         if all_mcas is not None:
             self.all_mcas = all_mcas
@@ -783,17 +872,57 @@ class GSEXRM_MapFile(object):
 
         if force or self.folder_has_newdata():
             irow = self.last_row + 1
-            while irow < nrows:
-                flush = irow < 2 or (irow % 64 == 0)
-                complete = irow >= nrows-1
-                self.process_row(irow, flush=flush, offset=offset,
-                                 complete=complete, callback=callback)
-                irow  = irow + 1
+            # multi-row writes need rows that are only written, not read back
+            if nrows_buffer > 1 and version_ge(self.version, '2.1.0'):
+                self._rowbuffer = GSEXRM_RowBuffer(row0=self.last_row+1,
+                                                   maxrows=nrows_buffer)
+            pool, pending, nextrow = None, deque(), irow
+            if nworkers > 1 and irow < nrows:
+                pool = mp.Pool(nworkers)
+            try:
+                while irow < nrows:
+                    row = None
+                    if pool is not None:
+                        while nextrow < nrows and len(pending) < 2*nworkers:
+                            kws = self.rowdata_args(nextrow, offset=offset)
+                            if kws is not None:
+                                kws = pool.apply_async(GSEXRM_MapRow, (), kws)
+                            pending.append(kws)
+                            nextrow += 1
+                        row = pending.popleft()
+                        if row is not None:
+                            row = row.get()
+                    flush = irow < 2 or (irow % 64 == 0)
+                    complete = irow >= nrows-1
+                    self.process_row(irow, flush=flush, offset=offset,
+                                     complete=complete, callback=callback,
+                                     row=row)
+                    irow  = irow + 1
+            finally:
+                self.write_rowbuffer()
+                self._rowbuffer = None
+                if pool is not None:
+                    pool.terminate()
             if callable(callback):
                 callback(filename=self.filename, status='complete')
 
 
-    def set_roidata(self, row_start=0, row_end=None):
+    def set_roidata(self, row_start=0, row_end=None, roi_names=None):
+        """calculate ROI maps (raw and dead-time corrected, for each MCA
+        detector and for the MCA sum) from the MCA counts, for the ROIs
+        in the map configuration.
+
+        Parameters
+        ----------
+        row_start   first row to calculate [0]
+        row_end     last row to calculate [last row]
+        roi_names   list of ROI names to calculate [all ROIs]
+
+        Notes
+        -----
+        each block of rows of the counts for a detector is read once,
+        and all the ROIs are calculated from it, see calc_roimaps()
+        """
         if row_end is None:
             row_end = self.last_row
 
@@ -801,36 +930,72 @@ class GSEXRM_MapFile(object):
         rows = slice(row_start, row_end+1)
         roigrp = self.xrmmap['roimap']
         conf = self.xrmmap['config']
-        roi_names = [h5str(s) for s in conf['rois/name']]
-        roi_limits = conf['rois/limits'][()]
-        # print("roi names ", roi_names, roi_limits)
-
-        for roiname, lims in zip(roi_names, roi_limits):
-            dt = debugtime()
-            roi_slice = lims[0]
-            # dt.add('get slice')
-            sumraw = roigrp['mcasum'][roiname]['raw'][rows,]
-            # dt.add('get sum raw')
-            sumcor = roigrp['mcasum'][roiname]['cor'][rows,]
-            # dt.add('get sum cor')
-
-            for detname in self.mca_dets:
-                mcaraw = self.xrmmap[detname]['counts'][rows,:,roi_slice].sum(axis=2)
-                # dt.add(" mcaraw %s " % detname)
-                mcacor = mcaraw*self.xrmmap[detname]['dtfactor'][rows,:]
-                # dt.add(" mcacor %s " % detname)
-                roigrp[detname][roiname]['raw'][rows,] = mcaraw
-                roigrp[detname][roiname]['cor'][rows,] = mcacor
-                # dt.add(" set roigrps for %s " % detname)
-                sumraw += mcaraw
-                sumcor += mcacor
-                # dt.add(" sum  %s " % detname)
-            #dt.show()
-
-            roigrp['mcasum'][roiname]['raw'][rows,] = sumraw
-            roigrp['mcasum'][roiname]['cor'][rows,] = sumcor
+        names = [h5str(s) for s in conf['rois/name']]
+        limits = conf['rois/limits'][()]
+        iroi = [i for i, name in enumerate(names)
+                if roi_names is None or name in roi_names]
+        # print("roi names ", names, limits)
+
+        self._get_schema()
+        detslices = {}
+        for detname in self.mca_dets:
+            idet = int(detname.replace('mca', '')) - 1
+            detslices[detname] = [slice(*limits[i, idet]) for i in iroi]
+        if len(detslices) == 0:  # only the MCA sum was saved
+            detslices['mcasum'] = [slice(*limits[i, 0]) for i in iroi]
+
+        roimaps = self.calc_roimaps(detslices, rows=rows)
+        if 'mcasum' not in roimaps:
+            roimaps['mcasum'] = (sum(raw for raw, cor in roimaps.values()),
+                                 sum(cor for raw, cor in roimaps.values()))
+
+        for detname, (raw, cor) in roimaps.items():
+            for j, i in enumerate(iroi):
+                rgrp = roigrp[detname][names[i]]
+                for aname, dat in (('raw', raw[j]), ('cor', cor[j])):
+                    if rgrp[aname].shape[0] < rows.stop:
+                        rgrp[aname].resize((rows.stop, rgrp[aname].shape[1]))
+                    rgrp[aname][rows,] = dat
         self.h5root.flush()
 
+    def calc_roimaps(self, detslices, rows=None, nrows_chunk=None):
+        """calculate maps for several ROIs of several MCA detectors,
+        reading each block of rows of each detector's counts only once.
+
+        Parameters
+        ----------
+        detslices   dict of {detector name: list of channel slices}
+        rows        slice of rows to calculate [all rows]
+        nrows_chunk number of rows to read at once [sized to ROI_CHUNKBYTES]
+
+        Returns
+        -------
+        dict of {detector name: (raw, cor)}, with raw and dead-time
+        corrected ROI maps, each of shape (nrois, nrows, npts)
+        """
+        if rows is None:
+            rows = slice(None)
+        out = {}
+        for detname, slices in detslices.items():
+            counts = self.xrmmap[detname]['counts']
+            nrow, npts, nchan = counts.shape
+            row0, row1, _step = rows.indices(nrow)
+            nchunk = nrows_chunk
+            if nchunk is None:
+                nchunk = max(1, ROI_CHUNKBYTES // (8*npts*(nchan+1)))
+            raw = None
+            for irow in range(row0, row1, nchunk):
+                roisums = calc_roi_sums(counts[irow:min(row1, irow+nchunk)], slices)
+                if raw is None:
+                    raw = np.zeros((len(slices), max(0, row1-row0), npts),
+                                   dtype=roisums.dtype)
+                raw[:, irow-row0:irow-row0+roisums.shape[1]] = roisums
+            if raw is None:
+                raw = np.zeros((len(slices), 0, npts))
+            cor = raw*self.xrmmap[detname]['dtfactor'][row0:row1]
+            out[detname] = (raw, cor)
+        return out
+
     def calc_pixeltime(self):
         scanconf = self.xrmmap['config/scan']
         rowtime = float(scanconf['time1'][()])
@@ -852,6 +1017,15 @@ class GSEXRM_MapFile(object):
         '''read a row worth of raw data from the Map Folder
         returns arrays of data
         '''
+        kws = self.rowdata_args(irow, offset=offset)
+        if kws is None:
+            return
+        return GSEXRM_MapRow(**kws)
+
+    def rowdata_args(self, irow, offset=None):
+        '''arguments for reading a row of raw data from the Map Folder
+        with GSEXRM_MapRow, which can then be done in another process.
+        '''
         if self.dimension is None or irow > len(self.rowdata):
             self.read_master()
 
@@ -907,21 +1081,46 @@ class GSEXRM_MapFile(object):
         if offset is not None:
             ioffset = offset
         self.has_xrf = self.has_xrf and xrff != '_unused_'
-        return GSEXRM_MapRow(yval, xrff, xrdf, xpsf, sisf, self.folder,
-                             irow=irow, nrows_expected=self.nrows_expected,
-                             ixaddr=0, dimension=self.dimension,
-                             npts=self.npts,
-                             reverse=reverse,
-                             ioffset=ioffset,
-                             force_no_dtc=self.force_no_dtc,
-                             masterfile=self.masterfile, flip=self.flip,
-                             xrdcal=self.xrdcalfile,
-                             xrd2dmask=self.mask_xrd2d,
-                             xrd2dbkgd=self.bkgd_xrd2d, wdg=self.azwdgs,
-                             steps=self.qstps, has_xrf=self.has_xrf,
-                             has_xrd2d=self.has_xrd2d,
-                             has_xrd1d=self.has_xrd1d)
-
+        return dict(yvalue=yval, xrffile=xrff, xrdfile=xrdf, xpsfile=xpsf,
+                    sisfile=sisf, folder=self.folder,
+                    irow=irow, nrows_expected=self.nrows_expected,
+                    ixaddr=0, dimension=self.dimension,
+                    npts=self.npts,
+                    reverse=reverse,
+                    ioffset=ioffset,
+                    force_no_dtc=self.force_no_dtc,
+                    masterfile=self.masterfile, flip=self.flip,
+                    xrdcal=self.xrdcalfile,
+                    xrd2dmask=self.mask_xrd2d,
+                    xrd2dbkgd=self.bkgd_xrd2d, wdg=self.azwdgs,
+                    steps=self.qstps, has_xrf=self.has_xrf,
+                    has_xrd2d=self.has_xrd2d,
+                    has_xrd1d=self.has_xrd1d,
+                    dtc_taus=self.dtc_taus)
+
+
+    def _get_schema(self):
+        '''cached detector groups and HDF5 datasets of the map, set up
+        after build_schema() or on first use for an existing file'''
+        if self._schema is None:
+            self.mca_dets = []
+            for gname in sorted(self.xrmmap.keys()):
+                g = self.xrmmap[gname]
+                if bytes2str(g.attrs.get('type', '')).startswith('mca detect'):
+                    self.mca_dets.append(gname)
+            nrows, npts, npos = self.xrmmap['positions/pos'].shape
+            self._schema = {'nrows': nrows, 'npts': npts, 'dsets': {}}
+        return self._schema
+
+    def _dset(self, path):
+        '''HDF5 dataset for path in xrmmap, from the schema cache.
+        while a row buffer is in use, assignments to rows go to the buffer'''
+        dsets = self._get_schema()['dsets']
+        if path not in dsets:
+            dsets[path] = self.xrmmap[path]
+        if self._rowbuffer is not None:
+            return self._rowbuffer.dataset(dsets[path])
+        return dsets[path]
 
     def add_rowdata(self, row, callback=None, flush=True):
         '''adds a row worth of real data'''
@@ -945,56 +1144,37 @@ class GSEXRM_MapFile(object):
         dt.add(" ran callback, print, version  %s"  %self.version)
 
         if version_ge(self.version, '2.0.0'):
-
-            mcasum_raw,mcasum_cor = [],[]
-            nrows = 0
-            map_items = sorted(self.xrmmap.keys())
-            dt.add(" get %d map items" % len(map_items))
-            for gname in map_items:
-                g = self.xrmmap[gname]
-                if bytes2str(g.attrs.get('type', '')).startswith('scalar detect'):
-                    first_det = list(g.keys())[0]
-                    nrows, npts =  g[first_det].shape
-
-            dt.add(" got %d map items" % len(map_items))
-            if thisrow >= nrows:
-                self.resize_arrays(NINIT*(1+nrows/NINIT), force_shrink=False)
+            schema = self._get_schema()
+            if thisrow >= schema['nrows']:
+                self.resize_arrays(NINIT*(1+thisrow//NINIT), force_shrink=False)
 
             dt.add(" resized ")
-            sclrgrp = self.xrmmap['scalars']
+            npts = schema['npts']
+            sisdata = row.sisdata[:npts].transpose()
             for ai, aname in enumerate(row.scaler_names):
-                sclrgrp[aname][thisrow,  :npts] = row.sisdata[:npts].transpose()[ai]
+                self._dset('scalars/%s' % aname)[thisrow,  :npts] = sisdata[ai]
             dt.add(" add scaler group")
             if self.has_xrf:
-
                 npts = min([len(p) for p in row.posvals])
-                pos    = self.xrmmap['positions/pos']
                 rowpos = np.array([p[:npts] for p in row.posvals])
 
                 tpos = rowpos.transpose()
-                pos[thisrow, :npts, :] = tpos[:npts, :]
+                self._dset('positions/pos')[thisrow, :npts, :] = tpos[:npts, :]
                 nmca, xnpts, nchan = row.counts.shape
-                mca_dets = []
+                mca_dets = self.mca_dets
                 dt.add(" map xrf 1")
-                for gname in map_items:
-                    g = self.xrmmap[gname]
-                    if bytes2str(g.attrs.get('type', '')).startswith('mca detect'):
-                        mca_dets.append(gname)
-                        nrows, npts, nchan =  g['counts'].shape
-                dt.add(" map xrf 2")
-                _nr, npts, nchan = self.xrmmap['mcasum']['counts'].shape
+                _nr, npts, nchan = self._dset('mcasum/counts').shape
                 npts = min(npts, xnpts, self.npts)
                 dt.add(" map xrf 3")
                 # print("ADD ROW ", self.all_mcas, mca_dets, self.nmca)
                 if self.all_mcas:
                     for idet, gname in enumerate(mca_dets):
-                        grp = self.xrmmap[gname]
-                        grp['counts'][thisrow, :npts, :] = row.counts[idet, :npts, :]
-                        grp['dtfactor'][thisrow,  :npts] = row.dtfactor[idet, :npts]
-                        grp['realtime'][thisrow,  :npts] = row.realtime[idet, :npts]
-                        grp['livetime'][thisrow,  :npts] = row.livetime[idet, :npts]
-                        grp['inpcounts'][thisrow, :npts] = row.inpcounts[idet, :npts]
-                        grp['outcounts'][thisrow, :npts] = row.outcounts[idet, :npts]
+                        self._dset(gname+'/counts')[thisrow, :npts, :] = row.counts[idet, :npts, :]
+                        self._dset(gname+'/dtfactor')[thisrow,  :npts] = row.dtfactor[idet, :npts]
+                        self._dset(gname+'/realtime')[thisrow,  :npts] = row.realtime[idet, :npts]
+                        self._dset(gname+'/livetime')[thisrow,  :npts] = row.livetime[idet, :npts]
+                        self._dset(gname+'/inpcounts')[thisrow, :npts] = row.inpcounts[idet, :npts]
+                        self._dset(gname+'/outcounts')[thisrow, :npts] = row.outcounts[idet, :npts]
 
                 livetime = np.zeros(npts, dtype=np.float64)
                 realtime = np.zeros(npts, dtype=np.float64)
@@ -1012,23 +1192,16 @@ class GSEXRM_MapFile(object):
                 realtime /= (1.0*self.nmca)
                 dt.add(" map xrf 4b: time sums")
 
-                sumgrp = self.xrmmap['mcasum']
-                sumgrp['counts'][thisrow, :npts, :nchan] = row.total[:npts, :nchan]
+                self._dset('mcasum/counts')[thisrow, :npts, :nchan] = row.total[:npts, :nchan]
                 dt.add(" map xrf 4b: set counts")
-                # print("add realtime ", sumgrp['realtime'].shape, self.xrmmap['roimap/det_raw'].shape, thisrow)
-                sumgrp['realtime'][thisrow,  :npts] = realtime
-                sumgrp['livetime'][thisrow,  :npts] = livetime
-                sumgrp['dtfactor'][thisrow,  :npts] = row.total_dtfactor[:npts]
-                sumgrp['inpcounts'][thisrow,  :npts] = inpcounts
-                sumgrp['outcounts'][thisrow,  :npts] = outcounts
+                self._dset('mcasum/realtime')[thisrow,  :npts] = realtime
+                self._dset('mcasum/livetime')[thisrow,  :npts] = livetime
+                self._dset('mcasum/dtfactor')[thisrow,  :npts] = row.total_dtfactor[:npts]
+                self._dset('mcasum/inpcounts')[thisrow,  :npts] = inpcounts
+                self._dset('mcasum/outcounts')[thisrow,  :npts] = outcounts
                 dt.add(" map xrf 4c: set time data ")
 
                 if version_ge(self.version, '2.1.0'): # version 2.1
-                    det_raw = self.xrmmap['roimap/det_raw']
-                    det_cor = self.xrmmap['roimap/det_cor']
-                    sum_raw = self.xrmmap['roimap/sum_raw']
-                    sum_cor = self.xrmmap['roimap/sum_cor']
-
                     detraw = list(row.sisdata[:npts].transpose())
                     detcor = detraw[:]
                     sumraw = detraw[:]
@@ -1044,20 +1217,20 @@ class GSEXRM_MapFile(object):
                                        lims[iroi, i, 1]) for i in range(nmca)]
                             self.roi_slices.append(x)
 
-                    for slices in self.roi_slices:
-                        iraw = [row.counts[i, :npts, slices[i]].sum(axis=1)
-                                for i in range(nmca)]
-                        icor = [row.counts[i, :npts, slices[i]].sum(axis=1)*row.dtfactor[i, :npts]
-                                for i in range(nmca)]
-                        detraw.extend(iraw)
-                        detcor.extend(icor)
-                        sumraw.append(np.array(iraw).sum(axis=0))
-                        sumcor.append(np.array(icor).sum(axis=0))
+                    # iraw, icor: (nrois, nmca, npts)
+                    iraw = np.array([calc_roi_sums(row.counts[i, :npts],
+                                                   [s[i] for s in self.roi_slices])
+                                     for i in range(nmca)]).transpose((1, 0, 2))
+                    icor = iraw*row.dtfactor[:nmca, :npts]
+                    detraw.extend(iraw.reshape((-1, npts)))
+                    detcor.extend(icor.reshape((-1, npts)))
+                    sumraw.extend(iraw.sum(axis=1))
+                    sumcor.extend(icor.sum(axis=1))
                     dt.add(" map xrf 5a: got simple  ROIS")
-                    det_raw[thisrow, :npts, :] = np.array(detraw).transpose()
-                    det_cor[thisrow, :npts, :] = np.array(detcor).transpose()
-                    sum_raw[thisrow, :npts, :] = np.array(sumraw).transpose()
-                    sum_cor[thisrow, :npts, :] = np.array(sumcor).transpose()
+                    self._dset('roimap/det_raw')[thisrow, :npts, :] = np.array(detraw).transpose()
+                    self._dset('roimap/det_cor')[thisrow, :npts, :] = np.array(detcor).transpose()
+                    self._dset('roimap/sum_raw')[thisrow, :npts, :] = np.array(sumraw).transpose()
+                    self._dset('roimap/sum_cor')[thisrow, :npts, :] = np.array(sumcor).transpose()
 
 
                 else: # version 2.0
@@ -1161,13 +1334,13 @@ class GSEXRM_MapFile(object):
                     self.xrmmap['xrd1d/q'][:] = row.xrdq[0]
 
             if self.bkgd_xrd1d is not None:
-                self.xrmmap['xrd1d/counts'][thisrow,] = row.xrd1d - self.bkgd_xrd1d
+                self._dset('xrd1d/counts')[thisrow,] = row.xrd1d - self.bkgd_xrd1d
             else:
-                _ni, _nc, _nq  = self.xrmmap['xrd1d/counts'].shape
+                _ni, _nc, _nq  = self._dset('xrd1d/counts').shape
                 _rc, _rq = row.xrd1d.shape
                 _nc = min(_nc, _rc)
                 _nq = min(_nq, _rq)
-                self.xrmmap['xrd1d/counts'][thisrow, :_nc, :_nq] = row.xrd1d[:_nc,:_nq]
+                self._dset('xrd1d/counts')[thisrow, :_nc, :_nq] = row.xrd1d[:_nc,:_nq]
 
             if self.azwdgs > 1 and row.xrd1d_wdg is not None:
                 for iwdg,wdggrp in enumerate(self.xrmmap['work/xrdwedge'].values()):
@@ -1183,10 +1356,11 @@ class GSEXRM_MapFile(object):
 
 
         if self.has_xrd2d and row.xrd2d is not None:
-            self.xrmmap['xrd2d/counts'][thisrow,] = row.xrd2d
+            self._dset('xrd2d/counts')[thisrow,] = row.xrd2d
         dt.add("xrd done")
         self.last_row = thisrow
-        self.xrmmap.attrs['Last_Row'] = thisrow
+        if self._rowbuffer is None:
+            self.xrmmap.attrs['Last_Row'] = thisrow
         #self.h5root.flush()
         # dt.add("flushed h5 file")
         # dt.show()
@@ -1564,10 +1738,13 @@ class GSEXRM_MapFile(object):
             pass
 
         self.h5root.flush()
+        self._schema = None
+        self._get_schema()
 
 
-    def add_xrd1d(self, qstps=None):
-
+    def add_xrd1d(self, qstps=None, nworkers=1):
+        '''calculate 1D XRD data from the 2D XRD data of the map, with one
+        XRDIntegrator for all rows, using nworkers processes [1]'''
         xrd1dgrp = ensure_subgroup('xrd1d',self.xrmmap)
         xrdcalfile = bytes2str(xrd1dgrp.attrs.get('calfile', ''))
         if os.path.exists(xrdcalfile):
@@ -1594,13 +1771,16 @@ class GSEXRM_MapFile(object):
                                        np.float32,
                                        chunks = chunksize_xrd1d)
 
-                attrs = {'steps':self.qstps,'mask':self.xrd2dmaskfile,'flip':self.flip}
                 print('\nStart: %s' % isotime())
-                for i in np.arange(nrows):
-                    rowq, row1d = integrate_xrd_row(self.xrmmap['xrd2d/counts'][i],xrdcalfile,**attrs)
-                    if i == 0:
-                        self.xrmmap['xrd1d/q'][:] = rowq[0]
-                    self.xrmmap['xrd1d/counts'][i,] = row1d
+                # one integrator and pool of processes for all rows
+                with XRDIntegrator(xrdcalfile, steps=self.qstps,
+                                   mask=self.mask_xrd2d, flip=self.flip) as integrator:
+                    for i in np.arange(nrows):
+                        rowq, row1d = integrator.integrate(self.xrmmap['xrd2d/counts'][i],
+                                                           workers=nworkers)
+                        if i == 0:
+                            self.xrmmap['xrd1d/q'][:] = rowq
+                        self.xrmmap['xrd1d/counts'][i,] = row1d
 
                 self.has_xrd1d = True
                 # print('End: %s' % isotime())
@@ -1815,6 +1995,8 @@ class GSEXRM_MapFile(object):
                         for aname in ('raw','cor'):
                             oldnrow, npts = h[aname].shape
                             h[aname].resize((nrow, npts))
+            if self._schema is not None:
+                self._schema['nrows'] = nrow
 
         else: ## old file format method
 
@@ -2516,7 +2698,6 @@ class GSEXRM_MapFile(object):
         if 'counts' not in mapdat:
             mapdat = self.get_detgroup(None)
 
-        nx, ny = (xmax-xmin, ymax-ymin)
         sx = slice(xmin, xmax)
         sy = slice(ymin, ymax)
 
@@ -2526,9 +2707,131 @@ class GSEXRM_MapFile(object):
             counts = mapdat['counts'][sy, sx, :]
 
         if dtcorrect and 'dtfactor' in mapdat:
+            # rectangle may be clipped at the edges of the map
+            ny, nx = counts.shape[:2]
             counts = counts*mapdat['dtfactor'][sy, sx].reshape(ny, nx, 1)
         return counts
 
+    def build_spectral_index(self, det=None, blocksize=16, callback=None):
+        '''build an index of summed spectra for a detector, used to
+        extract spectra for map rectangles and areas quickly.
+
+        Parameters
+        ---------
+        det :        optional, None or int      index of detector
+        blocksize :  int   number of map rows per index block [16]
+        callback :   optional function, called with (row, maxrow)
+
+        Notes
+        -----
+        The index is stored in 'spectral_index/<detector>' as 'raw'
+        and 'cor' (dead-time corrected) arrays with
+            index[i, j, :] = sum(counts[:i*blocksize, :j, :])
+        so that the spectrum for a rectangle of whole blocks of rows
+        needs 4 spectra from the index.  Partial blocks of rows at the
+        top and bottom of a rectangle, and rows added to the map after
+        the index was built, are read from the counts.
+
+        The index is about 2*8/(4*blocksize) times the size of the
+        uncompressed counts for a detector.
+        '''
+        if not self.check_hostid():
+            raise GSEXRM_Exception(NOT_OWNER % self.filename)
+        if not self.write_access:
+            raise GSEXRM_Exception(READ_ONLY % self.filename)
+
+        dgroup = self.get_detname(det)
+        mapdat = self.xrmmap[dgroup]
+        counts = mapdat['counts']
+        nrow, npts, nchan = counts.shape
+        nrow = min(nrow, self.last_row+1)
+        nblocks = nrow // blocksize
+        dtype = np.float64 if counts.dtype.kind == 'f' else np.int64
+
+        idxgrp = ensure_subgroup('spectral_index', self.xrmmap,
+                                 dtype='spectral index')
+        if dgroup in idxgrp:
+            del idxgrp[dgroup]
+        grp = idxgrp.create_group(dgroup)
+        grp.attrs['blocksize'] = blocksize
+        grp.attrs['nrows'] = nblocks*blocksize
+        opts = dict(chunks=(1, 1, nchan), **self.compress_args)
+        rawidx = grp.create_dataset('raw', (nblocks+1, npts+1, nchan), dtype, **opts)
+        coridx = grp.create_dataset('cor', (nblocks+1, npts+1, nchan), np.float64, **opts)
+
+        rawsum = np.zeros((npts+1, nchan), dtype=dtype)
+        corsum = np.zeros((npts+1, nchan), dtype=np.float64)
+        for iblock in range(nblocks):
+            rows = slice(iblock*blocksize, (iblock+1)*blocksize)
+            bcounts = counts[rows]
+            rawsum[1:] += np.cumsum(bcounts.sum(axis=0, dtype=dtype), axis=0)
+            if 'dtfactor' in mapdat:
+                bcounts = bcounts*mapdat['dtfactor'][rows].reshape(blocksize, npts, 1)
+            corsum[1:] += np.cumsum(bcounts.sum(axis=0, dtype=np.float64), axis=0)
+            rawidx[iblock+1] = rawsum
+            coridx[iblock+1] = corsum
+            if callable(callback):
+                callback(row=(iblock+1)*blocksize, maxrow=nrow)
+        self.h5root.flush()
+
+    def del_spectral_index(self, det=None):
+        '''delete the index of summed spectra for a detector'''
+        dgroup = self.get_detname(det)
+        if 'spectral_index' in self.xrmmap:
+            if dgroup in self.xrmmap['spectral_index']:
+                del self.xrmmap['spectral_index'][dgroup]
+                self.h5root.flush()
+
+    def get_spectral_index(self, det=None):
+        '''return HDF5 group for index of summed spectra for a
+        detector, or None if no index has been built'''
+        dgroup = self.get_detname(det)
+        if 'spectral_index' in self.xrmmap:
+            return self.xrmmap['spectral_index'].get(dgroup, None)
+        return None
+
+    def _sum_counts_rects(self, rects, mapdat, dtcorrect, index=None):
+        '''summed spectrum for a list of map rectangles, using the
+        spectral index for whole blocks of rows'''
+        counts = mapdat['counts']
+        dtcorrect = dtcorrect and 'dtfactor' in mapdat
+        dtype = np.float64 if dtcorrect else np.int64
+        if counts.dtype.kind == 'f':
+            dtype = np.float64
+        total = np.zeros(counts.shape[-1], dtype=dtype)
+
+        def add_counts(ymin, ymax, xmin, xmax):
+            if ymax > ymin and xmax > xmin:
+                dat = counts[ymin:ymax, xmin:xmax, :]
+                if dtcorrect:
+                    dat = dat*mapdat['dtfactor'][ymin:ymax, xmin:xmax].reshape(
+                        ymax-ymin, xmax-xmin, 1)
+                total[:] += dat.sum(axis=(0, 1), dtype=dtype)
+
+        blocksize, nblocks = 1, 0
+        if index is not None:
+            blocksize = int(index.attrs['blocksize'])
+            nblocks = int(index.attrs['nrows']) // blocksize
+            table = index['cor' if dtcorrect else 'raw']
+
+        nrow, npts = counts.shape[:2]
+        for ymin, ymax, xmin, xmax in rects:
+            # clip to the map, as for slices of the counts
+            ymin, ymax = min(max(ymin, 0), nrow), min(max(ymax, 0), nrow)
+            xmin, xmax = min(max(xmin, 0), npts), min(max(xmax, 0), npts)
+            if ymax <= ymin or xmax <= xmin:
+                continue
+            iblock0 = -(-ymin // blocksize)
+            iblock1 = min(ymax // blocksize, nblocks)
+            if iblock1 <= iblock0:
+                add_counts(ymin, ymax, xmin, xmax)
+                continue
+            total[:] += (table[iblock1, xmax, :] - table[iblock1, xmin, :] -
+                         table[iblock0, xmax, :] + table[iblock0, xmin, :])
+            add_counts(ymin, iblock0*blocksize, xmin, xmax)
+            add_counts(iblock1*blocksize, ymax, xmin, xmax)
+        return total
+
     def get_mca_area(self, areaname, det=None, dtcorrect=None):
         '''return XRF spectra as MCA() instance for
         spectra summed over a pre-defined area
@@ -2559,13 +2862,20 @@ class GSEXRM_MapFile(object):
         _ay, _ax = np.where(area)
         ymin, ymax, xmin, xmax = _ay.min(), _ay.max()+1, _ax.min(), _ax.max()+1
         opts = {'dtcorrect': dtcorrect, 'det': det}
-        counts = self.get_counts_rect(ymin, ymax, xmin, xmax, **opts)
         ltime, rtime = self.get_livereal_rect(ymin, ymax, xmin, xmax, **opts)
         ltime = ltime[area[ymin:ymax, xmin:xmax]].sum()
         rtime = rtime[area[ymin:ymax, xmin:xmax]].sum()
-        counts = counts[area[ymin:ymax, xmin:xmax]]
-        while(len(counts.shape) > 1):
-            counts = counts.sum(axis=0)
+        index = self.get_spectral_index(det)
+        if index is not None:
+            rects = [(y0+ymin, y1+ymin, x0+xmin, x1+xmin) for y0, y1, x0, x1
+                     in area_rectangles(area[ymin:ymax, xmin:xmax])]
+            counts = self._sum_counts_rects(rects, self.xrmmap[dgroup],
+                                            dtcorrect, index=index)
+        else:
+            counts = self.get_counts_rect(ymin, ymax, xmin, xmax, **opts)
+            counts = counts[area[ymin:ymax, xmin:xmax]]
+            while(len(counts.shape) > 1):
+                counts = counts.sum(axis=0)
         return self._getmca(dgroup, counts, areaname, npixels=npixels,
                             real_time=rtime, live_time=ltime)
 
@@ -2593,13 +2903,18 @@ class GSEXRM_MapFile(object):
         if 'counts' not in mapdat:
             mapdat = self.get_detgroup(None)
             dgroup = self.get_detname(None)
-        counts = self.get_counts_rect(ymin, ymax, xmin, xmax, mapdat=mapdat,
-                                      det=det, dtcorrect=dtcorrect)
+        index = self.get_spectral_index(dgroup)
+        if index is not None and min(ymin, ymax, xmin, xmax) >= 0:
+            counts = self._sum_counts_rects([(ymin, ymax, xmin, xmax)], mapdat,
+                                            dtcorrect, index=index)
+        else:
+            counts = self.get_counts_rect(ymin, ymax, xmin, xmax, mapdat=mapdat,
+                                          det=det, dtcorrect=dtcorrect)
+            counts = counts.sum(axis=0).sum(axis=0)
         name = 'rect(y=[%i:%i], x==[%i:%i])' % (ymin, ymax, xmin, xmax)
         npix = (ymax-ymin+1)*(xmax-xmin+1)
         ltime, rtime = self.get_livereal_rect(ymin, ymax, xmin, xmax, det=det,
                                               dtcorrect=dtcorrect)
-        counts = counts.sum(axis=0).sum(axis=0)
         return self._getmca(dgroup, counts, name, npixels=npix,
                             real_time=rtime.sum(), live_time=ltime.sum())
 
@@ -2999,30 +3314,53 @@ class GSEXRM_MapFile(object):
         return roigroup, det_list, sumdet
 
     def add_xrfroi(self, roiname, Erange, unit='keV'):
+        self.add_xrfrois({roiname: Erange}, unit=unit)
+
+    def add_xrfrois(self, rois, unit='keV'):
+        """add several XRF ROIs to the map, reading each block of rows of
+        the counts for each detector once for all the ROIs
+
+        Parameters
+        ----------
+        rois     dict of {roiname: Erange}
+        unit     units of Erange, 'keV', 'eV', or 'channels' ['keV']
+        """
         if not self.has_xrf:
             return
 
         if unit == 'eV':
-            Erange[:] = [x/1000. for x in Erange] ## eV to keV
+            for Erange in rois.values():
+                Erange[:] = [x/1000. for x in Erange] ## eV to keV
 
         roigroup, det_list, sumdet  = self.build_mca_roimap()
         if sumdet not in det_list:
             det_list.append(sumdet)
 
+        detslices, detrois = {}, {}
         for det in det_list:
-            if roiname in self.xrmmap['roimap'][det]:
-                print(f"ROI '{roiname:s}' exists for detector '{det:s}'.  Delete before adding")
-                continue
             mapdat = self.xrmmap[det]
-            if unit.startswith('chan'):
-                emin, emax = Erange
-            else:
-                en  = mapdat['energy'][:]
-                emin = (np.abs(en-Erange[0])).argmin()
-                emax = (np.abs(en-Erange[1])).argmin()+1
-            raw = mapdat['counts'][:, :, emin:emax].sum(axis=2)
-            cor = raw * mapdat['dtfactor']
-            self.save_roi(roiname, det, raw, cor, Erange, 'energy', unit)
+            en = None
+            detslices[det], detrois[det] = [], []
+            for roiname, Erange in rois.items():
+                if roiname in self.xrmmap['roimap'][det]:
+                    print(f"ROI '{roiname:s}' exists for detector '{det:s}'.  Delete before adding")
+                    continue
+                if unit.startswith('chan'):
+                    emin, emax = Erange
+                else:
+                    if en is None:
+                        en  = mapdat['energy'][:]
+                    emin = (np.abs(en-Erange[0])).argmin()
+                    emax = (np.abs(en-Erange[1])).argmin()+1
+                detslices[det].append(slice(emin, emax))
+                detrois[det].append(roiname)
+            if len(detrois[det]) == 0:
+                detslices.pop(det)
+
+        for det, (raw, cor) in self.calc_roimaps(detslices).items():
+            for i, roiname in enumerate(detrois[det]):
+                self.save_roi(roiname, det, raw[i], cor[i], rois[roiname],
+                              'energy', unit)
         self.get_roi_list('mcasum', force=True)
 
     def del_xrfroi(self, roiname):
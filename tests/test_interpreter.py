@@ -766,6 +766,92 @@ class TestEval(TestCase):
         z = self.interp("""def foo(): return 42\nfoo()""")
         self.assertEqual(z, 42)
 
+    def test_parse_cache(self):
+        """parsed statements are cached by text"""
+        node = self.interp.parse('y = x*2 + 1')
+        self.assertTrue(self.interp.parse('y = x*2 + 1') is node)
+        self.interp.maxcache = 2
+        self.interp.parse('y = 1')
+        self.interp.parse('y = 2')
+        self.assertTrue(self.interp.parse('y = x*2 + 1') is not node)
+
+    def test_lowered_exprs(self):
+        """expressions run more than once give the same values and errors"""
+        self.interp("arr = arange(10)*1.0")
+        self.interp("b = 3")
+        for i in range(3):
+            self.interp("y = (arr[2:5]*b - 1)/2 + arr.sum()")
+            self.isvalue('y', (np.arange(2, 5)*3 - 1)/2 + 45.0)
+            self.isvalue('y', (np.arange(2, 5)*3 - 1)/2 + 45.0)
+            self.istrue("b > 2 and arr[1] == 1")
+
+        for i in range(3):
+            self.interp.error = []
+            self.interp("arr[20] + 1")
+            self.check_error('IndexError', 'out of bounds')
+            self.interp.error = []
+            self.interp("undefined_sym*2")
+            self.check_error('NameError', "'undefined_sym' is not defined")
+            self.interp.error = []
+            self.interp("arr.nosuch + 1")
+            self.check_error('AttributeError', "does not have attribute 'nosuch'")
+
+    def test_lookup_cache(self):
+        """cached symbol lookups follow set, del, and frame changes"""
+        sys = self.symtable._sys
+        self.isnear('pi', np.pi)
+        hits = sys.lookup_hits
+        self.isnear('pi', np.pi)
+        self.assertTrue(sys.lookup_hits > hits)
+
+        self.interp('pi = 3')
+        self.isvalue('pi', 3)
+        self.interp('del pi')
+        self.isnear('pi', np.pi)
+        setattr(self.symtable, 'pi', 4)
+        self.isvalue('pi', 4)
+        delattr(self.symtable, 'pi')
+        self.isnear('pi', np.pi)
+
+        # names set as members of other search groups
+        self.isvalue('sin', np.sin)
+        self.interp('_builtin.sin = 5')
+        self.isvalue('sin', 5)
+        self.interp('del _builtin.sin')
+        self.isvalue('sin', np.sin)
+        setattr(self.symtable._builtin, 'sin', 6)
+        self.isvalue('sin', 6)
+        delattr(self.symtable._builtin, 'sin')
+        self.isvalue('sin', np.sin)
+        self.interp('_sys.pi = 7')
+        self.isvalue('pi', 7)
+        self.isvalue('_sys.pi', 7)
+        self.interp('del _sys.pi')
+        self.isnear('pi', np.pi)
+
+        self.interp('g = group(a=group(b=2))')
+        self.isvalue('g.a.b', 2)
+        self.interp('g.a.b = 5')
+        self.isvalue('g.a.b', 5)
+        self.interp('g = group(a=group(b=7))')
+        self.isvalue('g.a.b', 7)
+
+        self.interp('x = 1')
+        self.interp(textwrap.dedent("""
+            def fcn(x):
+                return x*2 + pi
+            #enddef
+            """))
+        self.isnear('fcn(10)', 20+np.pi)
+        self.isvalue('x', 1)
+
+        self.interp('s1 = group(tval=1)')
+        self.interp('s2 = group(tval=2)')
+        self.interp("_sys.searchGroups = ['s1', '_main']")
+        self.isvalue('tval', 1)
+        self.interp("_sys.searchGroups = ['s2', '_main']")
+        self.isvalue('tval', 2)
+
 
 if __name__ == '__main__':
     for suite in (TestEval,):
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+""" test reading Athena Project files, including lazily reading groups"""
+from pathlib import Path
+import numpy as np
+
+from larch import Interpreter, Group
+from larch.io import read_athena, AthenaGroups
+
+base_dir = Path(__file__).parent.parent.resolve()
+
+def prj_path(fname):
+    return Path(base_dir, 'examples', 'xafsdata', 'AthenaProjectFiles', fname).as_posix()
+
+def test_lazy_read_athena():
+    path = prj_path('Ag.prj')
+    full = read_athena(path)
+    prj = read_athena(path, lazy=True)
+    assert isinstance(prj.groups, AthenaGroups)
+    assert list(prj.groups) == list(full.groups)
+    assert prj.groups.loaded() == []
+    assert 'Ag_foil' in dir(prj)
+
+    foil = prj.Ag_foil
+    assert prj.groups.loaded() == ['Ag_foil']
+    assert prj.groups['Ag_foil'] is foil
+    for attr in ('energy', 'mu'):
+        assert np.array_equal(getattr(foil, attr), getattr(full.Ag_foil, attr))
+    assert foil.sel == 1
+    assert 'Ag_foil' in prj._repr_html_()
+
+    prj.groups.load(workers=2)
+    assert prj.groups.loaded() == list(full.groups)
+    for name, group in full.groups.items():
+        assert np.array_equal(getattr(prj, name).mu, group.mu)
+
+def test_read_athena_match_and_workers():
+    _larch = Interpreter()
+    path = prj_path('cu.prj')
+    full = read_athena(path, do_bkg=True, _larch=_larch)
+    names = ['cu010k_dat', 'cu050k_dat']
+
+    prj = read_athena(path, match='cu0*', do_bkg=True, workers=2, _larch=_larch)
+    assert list(prj.groups) == names
+    for name in names:
+        this, that = prj.groups[name], full.groups[name]
+        assert isinstance(this, Group)
+        assert np.allclose(this.norm, that.norm)
+        assert np.allclose(this.chi, that.chi)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+""" test fast parsing of ASCII column files with read_ascii"""
+from pathlib import Path
+import numpy as np
+
+from larch.io import read_ascii, read_ascii_chunks
+from larch.io import columnfile
+from larch.utils import read_textfile
+
+base_dir = Path(__file__).parent.parent.resolve()
+
+TEXTS = {'ragged': "# a b c\n1 2 3\n4 5\n6 7 8 9\n10\n",
+         'commas': "# x, y\n1,2,3\n4,5,6\n,,\n7,8\n",
+         'nans': "# x y\n1 nan\ninf 2\n3 4\n",
+         'dates': "# t y\n2020-01-01 3\n2020-01-02 4\n",
+         'dashes': "# x y\n1 2\n----\n3 4\n5 6\n# end\n",
+         'footer': "#h\n1 2\n3 4\n\n  \nend of data\nmore 1\n",
+         'blanks': "#h\n1 2\n\n3 4\n   \n5 6\n",
+         'crlf': "# x y\r\n1\t2\r\n3\t4\r\n",
+         'underscore': "#h\n1_0 2\n3 4\n",
+         'nodata': "just text\nmore text\n"}
+
+def check_group(group, text):
+    headers, data, footers = columnfile._read_ascii_lines(text)
+    assert group.header == headers
+    assert np.array_equal(np.asarray(group.data), data, equal_nan=True)
+    if len(data) > 0:
+        assert getattr(group, 'footer', []) == footers
+
+def test_read_ascii_examples():
+    for fname in ('cu_rt01.xmu', 'fe.060', 'feo_xafs.dat', 'cu_chi.dat',
+                  'scorodite_as_xafs.001', 'fe_xanes_8ch.xdi', 'EMG003.txt',
+                  'mn_cpmnco3.dat', 'sno2_l3.dat'):
+        path = Path(base_dir, 'examples', 'xafsdata', fname).as_posix()
+        check_group(read_ascii(path), read_textfile(path))
+
+def test_read_ascii_special_lines(tmp_path):
+    for name, text in TEXTS.items():
+        path = Path(tmp_path, name + '.dat')
+        path.write_bytes(text.encode('utf-8'))
+        check_group(read_ascii(path.as_posix()), read_textfile(path.as_posix()))
+
+def test_read_ascii_large_file(tmp_path, monkeypatch):
+    rng = np.random.default_rng(11)
+    dat = rng.normal(size=(2000, 5))
+    path = Path(tmp_path, 'large.dat').as_posix()
+    np.savetxt(path, dat, header='-----\nenergy i0 it if ir', footer='done')
+    group = read_ascii(path)
+    assert group.array_labels == ['energy', 'i0', 'it', 'if', 'ir']
+
+    monkeypatch.setattr(columnfile, 'MAX_FILESIZE', 1000)
+    mgroup = read_ascii(path)
+    assert mgroup.header == group.header
+    assert mgroup.footer == group.footer == ['# done']
+    assert mgroup.array_labels == group.array_labels
+    assert np.array_equal(mgroup.data, group.data)
+    assert np.allclose(mgroup.data, dat.T, rtol=1.e-15)
+
+    chunks = list(read_ascii_chunks(path, chunksize=4096))
+    assert len(chunks) > 10
+    assert np.array_equal(np.concatenate(chunks, axis=1), group.data)
+
+def test_read_ascii_number_like_header(tmp_path, monkeypatch):
+    # header lines with words like '-', '1e' or 'e' are found in large files
+    rng = np.random.default_rng(5)
+    dat = rng.normal(size=(500, 2))
+    rows = '\n'.join('%.8e %.8e' % tuple(row) for row in dat)
+    for i, label in enumerate(('3 -', '1e 2', 'e 5', '1 2.5e-3.1', '+ 4')):
+        path = Path(tmp_path, 'header%d.dat' % i).as_posix()
+        with open(path, 'w') as fh:
+            fh.write('# x y\n%s\n%s\n' % (label, rows))
+        group = read_ascii(path)
+        assert group.header[-1] == label
+        assert np.allclose(group.data, dat.T, rtol=1.e-15)
+
+        monkeypatch.setattr(columnfile, 'MAX_FILESIZE', 1000)
+        mgroup = read_ascii(path)
+        assert mgroup.header == group.header
+        assert np.array_equal(mgroup.data, group.data)
+        chunks = list(read_ascii_chunks(path, chunksize=4096))
+        assert len(chunks) > 2
+        assert np.array_equal(np.concatenate(chunks, axis=1), group.data)
+        with open(path, 'rb') as fh:
+            buff = fh.read()
+        assert columnfile._ascii_sections(buff, blocksize=1000)[0] == group.header
+        monkeypatch.undo()
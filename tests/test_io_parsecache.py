@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+""" test the on-disk cache of Groups read from data files"""
+import os
+from pathlib import Path
+import numpy as np
+import pytest
+
+from larch import isgroup
+from larch.io import (read_ascii, read_xdi, read_athena, parse_cache_info,
+                      clear_parse_cache, set_parse_cache)
+from larch.io.parsecache import PARSE_CACHE
+
+base_dir = Path(__file__).parent.parent.resolve()
+
+def data_path(*parts):
+    return Path(base_dir, 'examples', 'xafsdata', *parts).as_posix()
+
+@pytest.fixture
+def parse_cache(tmp_path):
+    saved = (PARSE_CACHE.enabled, PARSE_CACHE.maxsize,
+             PARSE_CACHE.minsize, PARSE_CACHE.directory)
+    set_parse_cache(enabled=True, minsize=0, maxsize=100*1024*1024,
+                    directory=Path(tmp_path, 'cache').as_posix())
+    yield PARSE_CACHE
+    (PARSE_CACHE.enabled, PARSE_CACHE.maxsize,
+     PARSE_CACHE.minsize, PARSE_CACHE.directory) = saved
+
+def assert_same(a, b):
+    if isgroup(a):
+        assert type(a) is type(b)
+        assert sorted(a.__dict__) == sorted(b.__dict__)
+        for key, val in a.__dict__.items():
+            assert_same(val, b.__dict__[key])
+    elif isinstance(a, np.ndarray):
+        assert a.dtype == b.dtype
+        assert np.array_equal(a, b, equal_nan=True)
+    elif isinstance(a, (list, tuple)):
+        assert type(a) is type(b) and len(a) == len(b)
+        for x, y in zip(a, b):
+            assert_same(x, y)
+    elif isinstance(a, dict):
+        assert type(a) is type(b) and list(a) == list(b)
+        for key, val in a.items():
+            assert_same(val, b[key])
+    else:
+        assert a == b or (a != a and b != b)
+
+def test_cached_readers(parse_cache):
+    for reader, fname in ((read_ascii, 'cu_rt01.xmu'),
+                          (read_xdi, 'fe3c_rt.xdi'),
+                          (read_athena, 'fe_athena.prj')):
+        path = data_path(fname)
+        first = reader(path)
+        second = reader(path)
+        assert second is not first
+        assert_same(first, second)
+
+    info = parse_cache_info()
+    assert info.nfiles == 3
+    assert sorted(f[0] for f in info.files) == ['read_ascii', 'read_athena', 'read_xdi']
+
+    # groups shared in the Athena project are still shared
+    prj = read_athena(data_path('fe_athena.prj'))
+    for name, grp in prj._athena_groups.items():
+        assert getattr(prj, name) is grp
+
+    # reader options are part of the key
+    read_ascii(data_path('cu_rt01.xmu'), labels='energy mu i0')
+    assert parse_cache_info().nfiles == 4
+    assert clear_parse_cache(data_path('cu_rt01.xmu')) == 2
+    assert clear_parse_cache() == 2
+    assert parse_cache_info().nfiles == 0
+
+def test_cache_invalidation_and_eviction(parse_cache, tmp_path):
+    path = Path(tmp_path, 'data.dat')
+    x = np.linspace(0, 1, 501)
+    np.savetxt(path, np.array([x, x**2]).T, header='x y')
+    assert np.allclose(read_ascii(path.as_posix()).data[1], x**2)
+
+    # a changed file is read again
+    np.savetxt(path, np.array([x, x**3]).T, header='x y')
+    os.utime(path, ns=(1, 1))
+    assert np.allclose(read_ascii(path.as_posix()).data[1], x**3)
+    assert parse_cache_info().nfiles == 2
+
+    set_parse_cache(maxsize=parse_cache_info().files[-1][2])
+    info = parse_cache_info()
+    assert info.nfiles == 1
+    assert info.size <= parse_cache.maxsize
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+""" test decoding xMAP mapping buffers from netCDF files"""
+from pathlib import Path
+import numpy as np
+import pytest
+from scipy.io import netcdf_file
+
+from larch.io import read_xrf_netcdf, decode_xmap_buffers
+from larch.io.xrf_netcdf import CLOCKTICK
+
+def longs(vals):
+    "int32 values to pairs of 16-bit words, low word first"
+    vals = np.asarray(vals, dtype=np.int64) & 0xffffffff
+    return np.stack([vals & 0xffff, vals >> 16], axis=-1).astype(np.uint16).view(np.int16)
+
+def write_xmap(fname, npix, nmodules=1, mapmode=1, nchans=64, modpixs=124, seed=0):
+    """write xMAP mapping buffers to a netCDF file, returning
+    the times (npixels, ndet, 4) and counts (npixels, ndet, nchans)"""
+    rng = np.random.default_rng(seed)
+    blocksize = 256 + 4*nchans if mapmode == 1 else 256
+    buffersize = 256 + modpixs*blocksize
+    data = np.zeros((len(npix), nmodules, buffersize), dtype=np.int16)
+    times, counts = [], []
+    for iarr, nbuff in enumerate(npix):
+        atimes = rng.integers(0, 2**31, size=(modpixs, nmodules, 4, 4))
+        if mapmode == 1:
+            acounts = rng.integers(-2**15, 2**15, size=(modpixs, nmodules, 4, nchans))
+        else:
+            acounts = rng.integers(0, 2**15, size=(modpixs, nmodules, 4, nchans))
+        times.append(atimes[:nbuff].reshape(nbuff, 4*nmodules, 4))
+        counts.append(acounts[:nbuff].reshape(nbuff, 4*nmodules, nchans))
+        for imod in range(nmodules):
+            buff = data[iarr, imod]
+            buff[0:4] = [0x55aa, 0xaa55, 256, mapmode]
+            buff[8] = nbuff
+            buff[9:11] = longs(5 + sum(npix[:iarr]))
+            buff[11] = imod
+            buff[20:24] = nchans
+            pixels = buff[256:].reshape(modpixs, blocksize)
+            pixels[:, 3] = mapmode
+            pixels[:, 8:12] = nchans
+            pixels[:, 32:64] = longs(atimes[:, imod]).reshape(modpixs, 32)
+            if mapmode == 1:
+                pixels[:, 256:] = acounts[:, imod].reshape(modpixs, 4*nchans)
+            else:
+                pixels[:, 64:64+8*nchans] = longs(acounts[:, imod]).reshape(modpixs, -1)
+    with netcdf_file(fname, 'w') as fh:
+        fh.createDimension('narrays', len(npix))
+        fh.createDimension('nmodules', nmodules)
+        fh.createDimension('buffersize', buffersize)
+        var = fh.createVariable('array_data', 'h', ('narrays', 'nmodules', 'buffersize'))
+        var[:] = data
+    return np.concatenate(times), np.concatenate(counts)
+
+@pytest.mark.parametrize('npix, nmodules, mapmode, nchans',
+                         [((124, 124, 57), 1, 1, 128),
+                          ((124, 30), 2, 1, 64),
+                          ((124, 124, 124, 11), 2, 2, 16),
+                          ((80,), 1, 2, 8)])
+def test_read_xrf_netcdf(tmp_path, npix, nmodules, mapmode, nchans):
+    fname = Path(tmp_path, 'xmap.nc').as_posix()
+    times, counts = write_xmap(fname, npix, nmodules=nmodules,
+                               mapmode=mapmode, nchans=nchans)
+    xmapdat = read_xrf_netcdf(fname)
+    ndet = 4*nmodules
+    assert xmapdat.firstPixel == 5
+    assert xmapdat.numPixels == sum(npix)
+    assert xmapdat.counts.shape == (sum(npix), ndet, nchans)
+    assert xmapdat.counts.dtype == np.int16
+    assert np.array_equal(xmapdat.counts, counts)
+    assert np.allclose(xmapdat.realTime, CLOCKTICK*times[:, :, 0])
+    assert np.allclose(xmapdat.liveTime, CLOCKTICK*times[:, :, 1])
+    assert np.array_equal(xmapdat.inputCounts, times[:, :, 2])
+    assert np.array_equal(xmapdat.outputCounts, times[:, :, 3])
+
+    # a single buffer can be decoded from an in-memory 1d array
+    with netcdf_file(fname, 'r', mmap=False) as fh:
+        array_data = fh.variables['array_data'].data
+    first = decode_xmap_buffers(array_data[0, 0])
+    assert first.counts.shape == (npix[0], 4, nchans)
+    assert np.array_equal(first.counts, counts[:npix[0], :4])
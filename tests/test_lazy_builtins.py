@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+""" test builtins of core modules that are loaded on first use"""
+import sys
+import importlib
+import subprocess
+
+from larch import Interpreter, builtins
+from larch.symboltable import LazyGroup
+
+def test_lazy_declarations_match_modules():
+    for modname, groups in builtins.lazy_builtins.items():
+        module = importlib.import_module(modname)
+        for groupname, entries in module._larch_builtins.items():
+            declared = set(groups[groupname])
+            assert set(entries).issubset(declared), (modname, groupname)
+            # only symbols set by _larch_init may be added
+            for name in declared - set(entries):
+                assert name.startswith('_'), (modname, groupname, name)
+
+def test_interpreter_does_not_import_modules():
+    script = '\n'.join(['import sys, larch',
+                        '_larch = larch.Interpreter()',
+                        "print(' '.join(sorted(sys.modules)))"])
+    out = subprocess.run([sys.executable, '-c', script], check=True,
+                         capture_output=True, text=True).stdout.split()
+    for modname in ('larch.io', 'larch.xafs', 'larch.xrd', 'larch.xray'):
+        assert modname not in out
+
+def test_load_on_first_use():
+    _larch = Interpreter()
+    symtable = _larch.symtable
+    assert isinstance(symtable._xafs, LazyGroup)
+    assert 'autobk' in dir(symtable._xafs)
+    assert 'larch.xray' in _larch.lazy_builtins
+
+    _larch.eval("edge = xray_edge('Fe', 'K')")
+    assert len(_larch.error) == 0
+    assert abs(symtable.edge.energy - 7112.0) < 1.0
+    assert 'larch.xray' not in _larch.lazy_builtins
+    assert symtable._xray._materials is not None
+    assert 'X-ray' in symtable._xray.__doc__
+
+    # later modules override earlier ones, whichever is loaded first
+    assert symtable._math.pca_train.func.__module__ == 'larch.math.pca'
+    assert symtable._math.interp.func.__module__ == 'larch.math.utils'
+    assert symtable._math.param.func.__module__ == 'larch.fitting'
+    assert symtable._io.read_xrmmap.func.__module__ == 'larch.xrmmap.xrm_mapfile'
+    assert symtable.get_symbol('_math.transforms.identity_matrix')().shape == (4, 4)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+""" test linear combination fitting"""
+from pathlib import Path
+import numpy as np
+from scipy.optimize import lsq_linear, minimize
+
+from larch.io import read_athena, extract_athenagroup
+from larch.xafs import pre_edge
+from larch.math.lincombo_fitting import (lincombo_fit, lincombo_fitall,
+                                         lincombo_fit_batch, _lincombo_qp)
+
+base_dir = Path(__file__).parent.parent.resolve()
+
+def test_lincombo_qp_bounds():
+    rng = np.random.default_rng(11)
+    for trial in range(10):
+        amat = rng.random((80, 5))
+        ydat = amat.dot(rng.normal(0.3, 0.5, 5)) + 0.01*rng.normal(size=80)
+        gram, gvec = amat.T.dot(amat), amat.T.dot(ydat)
+        lo, hi = np.zeros(5), 0.6*np.ones(5)
+
+        wts = _lincombo_qp(gram, gvec, lo, hi, sum_to_one=False)
+        ref = lsq_linear(amat, ydat, bounds=(lo, hi), tol=1e-12).x
+        assert np.allclose(wts, ref, atol=1.e-6)
+
+        wts = _lincombo_qp(gram, gvec, lo, hi, sum_to_one=True)
+        assert abs(wts.sum() - 1) < 1.e-10
+        assert (wts >= lo).all() and (wts <= hi).all()
+        ref = minimize(lambda w: ((amat.dot(w)-ydat)**2).sum(), np.ones(5)/5,
+                       method='SLSQP', bounds=list(zip(lo, hi)),
+                       constraints=[{'type': 'eq', 'fun': lambda w: w.sum()-1}],
+                       options={'ftol': 1e-14, 'maxiter': 500})
+        chi = ((amat.dot(wts)-ydat)**2).sum()
+        assert chi <= ref.fun*(1 + 1.e-8)
+
+    assert _lincombo_qp(gram, gvec, lo, 0.1*hi, sum_to_one=True) is None
+
+def read_cyano(unknowns=('d_720',)):
+    prj = read_athena(base_dir / 'examples' / 'pca' / 'cyanobacteria.prj',
+                      do_fft=False, do_bkg=False)
+    unknowns = [extract_athenagroup(getattr(prj, name)) for name in unknowns]
+    stds = [extract_athenagroup(getattr(prj, name)) for name in
+            ('Au_foil', 'Au3_Cl_aq', 'Au_hydroxide', 'Au_sulphide',
+             'Au_thiocyanide', 'Au_thiosulphate_aq')]
+    for g in unknowns + stds:
+        pre_edge(g, pre1=-150, pre2=-30, nnorm=1, norm1=150, norm2=850)
+    return unknowns, stds
+
+def test_lincombo_fitall_matches_fit():
+    (unknown,), stds = read_cyano()
+
+    out = lincombo_fitall(unknown, stds, xmin=11870, xmax=12030, max_ncomps=3)
+    assert len(out) == 16
+    redchi = [r.redchi for r in out]
+    assert redchi == sorted(redchi)
+    best = out[0]
+    assert abs(sum(best.weights.values()) - 1) < 1.e-8
+
+    comps = [s for s in stds if s.filename in best.weights]
+    ret = lincombo_fit(unknown, comps, xmin=11870, xmax=12030)
+    assert abs(ret.redchi - best.redchi) < 1.e-6*best.redchi
+    for key, val in ret.weights.items():
+        assert abs(val - best.weights[key]) < 1.e-5
+
+def test_lincombo_fit_batch():
+    unknowns, stds = read_cyano(('d_720', 'd_0_12', 'd_20', 'd_33', 'd_4_73'))
+    stds = stds[:4]
+    out = lincombo_fit_batch(unknowns, stds, xmin=11870, xmax=12030)
+    assert out.weights.shape == (5, 4)
+    assert np.allclose(out.weights.sum(axis=1), 1)
+
+    # first group sets the x grid, so agrees with lincombo_fit
+    ret = lincombo_fit(unknowns[0], stds, xmin=11870, xmax=12030)
+    assert np.allclose(list(ret.weights.values()), out.weights[0], atol=1.e-6)
+    assert abs(ret.chisqr - out.chisqr[0]) < 1.e-6*ret.chisqr
+    assert abs(ret.rfactor - out.rfactor[0]) < 1.e-6*ret.rfactor
+
+    out = lincombo_fit_batch(unknowns, stds, xmin=11870, xmax=12030,
+                             minvals=[0]*4, maxvals=[0.5]*4, sum_to_one=False)
+    for ydat, wts in zip(out.ydata, out.weights):
+        ref = lsq_linear(out.ycomps, ydat, bounds=(0, 0.5), tol=1e-12).x
+        assert np.allclose(wts, ref, atol=1.e-6)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+""" test PCA training from groups and from chunked arrays"""
+from pathlib import Path
+import numpy as np
+
+from larch import Group
+from larch.io import read_athena, extract_athenagroup
+from larch.xafs import pre_edge
+from larch.math.pca import (pca_train, pca_train_array, pca_fit,
+                            pca_fit_batch, pca_statistics)
+
+base_dir = Path(__file__).parent.parent
+
+def read_groups():
+    prj = read_athena(base_dir / 'examples' / 'pca' / 'cyanobacteria.prj',
+                      do_fft=False, do_bkg=False)
+    groups = []
+    for name in ('d_0_12', 'd_20', 'd_2_42', 'd_33', 'd_4_73', 'd_720',
+                 'd_7_03', 'd_9_33', 'Au1_Cl', 'Au3_Cl_aq', 'Au_cyanide',
+                 'Au_foil', 'Au_hydroxide', 'Au_sulphide'):
+        group = extract_athenagroup(getattr(prj, name))
+        pre_edge(group, pre1=-150, pre2=-30, nnorm=1, norm1=150, norm2=850)
+        groups.append(group)
+    return groups
+
+def test_pca_train_chunked():
+    groups = read_groups()
+    full = pca_train(groups, xmin=11850, xmax=12050)
+
+    narr, nfreq = full.ydat.shape
+    ind = [None]
+    for r in range(narr-1):
+        nr = narr - r - 1
+        ind.append(np.sqrt(nfreq*full.eigenvalues[r:].sum()/nr)/nr**2)
+    ind[0] = ind[1]
+    assert np.allclose(full.ind, ind)
+
+    for opts in (dict(chunksize=4), dict(ncomps=5, chunksize=3)):
+        model = pca_train(groups, xmin=11850, xmax=12050, **opts)
+        assert np.allclose(model.eigenvalues[:5], full.eigenvalues[:5], rtol=1.e-6)
+        assert np.allclose(model.variances[:5], full.variances[:5], rtol=1.e-6)
+        assert np.allclose(abs(model.components[:5]), abs(full.components[:5]),
+                           atol=1.e-8)
+        assert np.allclose(model.ind[:6], full.ind[:6])
+
+        pca_fit(groups[0], full, ncomps=4)
+        yfit = groups[0].pca_result.yfit
+        pca_fit(groups[0], model, ncomps=4)
+        assert np.allclose(groups[0].pca_result.yfit, yfit, atol=1.e-9)
+
+def test_pca_train_memmap(tmp_path):
+    rng = np.random.default_rng(11)
+    x = np.linspace(0, 1, 201)
+    basis = np.array([np.exp(-(x-c)**2/0.01) for c in (0.3, 0.5, 0.7)])
+    ydat = np.dot(rng.random((500, 3)), basis) + 1.e-3*rng.standard_normal((500, 201))
+    fname = tmp_path / 'spectra.npy'
+    np.save(fname, ydat)
+
+    mdat = np.load(fname, mmap_mode='r')
+    exact = pca_train_array(x, ydat)
+    model = pca_train_array(x, mdat, ncomps=3, chunksize=64, seed=3)
+    assert model.components.shape == (3, 201)
+    assert np.allclose(model.eigenvalues, exact.eigenvalues[:3], rtol=1.e-8)
+    assert np.allclose(model.mean, ydat.mean(axis=0))
+
+def test_pca_statistics():
+    rng = np.random.default_rng(5)
+    model = Group(ydat=np.zeros((40, 12)),
+                  eigenvalues=np.sort(rng.random(40))[::-1])
+    ind, f1r = pca_statistics(model)
+
+    p, n = model.ydat.shape
+    eigv = model.eigenvalues
+    for r in range(n-1):
+        nr = n-r-1
+        assert np.isclose(ind[r], np.sqrt(eigv[r:].sum()/(p*nr))/nr**2)
+        f1sum = sum(eigv[i]/((p+1-i)*(n+1-i)) for i in range(r, n))
+        assert np.isclose(f1r[r], eigv[r]/((p+1-r)*(n-r+1)*f1sum))
+
+def test_pca_fit_batch():
+    groups = read_groups()
+    model = pca_train(groups[8:], xmin=11850, xmax=12050)
+    unknowns = groups[:8]
+
+    ydat = []
+    for group in unknowns:
+        pca_fit(group, model, ncomps=4, rescale=False)
+        ydat.append(group.pca_result.ydat)
+    ydat = np.array(ydat).reshape((2, 4, -1))
+
+    out = pca_fit_batch(ydat, model, ncomps=4)
+    assert out.weights.shape == (2, 4, 4)
+    assert out.chi_square.shape == (2, 4)
+    for i, group in enumerate(unknowns):
+        pca_fit(group, model, ncomps=4)
+        res = group.pca_result
+        assert np.allclose(out.weights.reshape((8, 4))[i], res.weights)
+        assert np.isclose(out.chi_square.ravel()[i], res.chi_square)
+        assert np.isclose(out.data_scale.ravel()[i], res.data_scale)
+
+        # scale should minimize chi-square
+        for dscale in (0.999, 1.001):
+            scale = res.data_scale*dscale
+            comps = model.components[:4].T
+            yfit = np.linalg.lstsq(comps, scale*res.ydat/res.data_scale - model.mean,
+                                   rcond=None)
+            assert yfit[1][0] > res.chi_square
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+""" Tests of autobk and autobk_batch """
+import os
+import sys
+import numpy as np
+from numpy.testing import assert_allclose
+
+from larch import Group
+from larch.io import read_ascii
+from larch.xafs import autobk, autobk_batch
+
+DATAFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        '..', 'examples', 'xafsdata', 'cu_rt01.xmu')
+
+def get_spectra(nspec=8):
+    dat = read_ascii(DATAFILE)
+    autobk(dat, rbkg=1.0)
+    rng = np.random.default_rng(7)
+    mus = np.array([dat.mu*(1 + 0.02*i) + 1.e-3*rng.normal(size=len(dat.mu))
+                    for i in range(nspec)])
+    return dat, mus
+
+def test_autobk_batch_matches_autobk():
+    dat, mus = get_spectra()
+    out = Group()
+    autobk_batch(dat.energy, mus, group=out, rbkg=1.0, e0=dat.e0,
+                 edge_step=dat.edge_step)
+    assert out.chi.shape == (len(mus), len(dat.k))
+    assert out.bkg.shape == mus.shape
+    for mu, chi, bkg in zip(mus, out.chi, out.bkg):
+        one = Group(energy=dat.energy, mu=mu)
+        autobk(one, rbkg=1.0, e0=dat.e0, edge_step=dat.edge_step,
+               calc_uncertainties=False)
+        assert_allclose(chi, one.chi, atol=2.e-6)
+        assert_allclose(bkg, one.bkg, atol=2.e-6)
+
+def test_autobk_batch_edge_step():
+    dat, mus = get_spectra(nspec=4)
+    out = Group()
+    autobk_batch(dat.energy, mus, group=out, rbkg=1.0)
+    assert abs(out.e0 - dat.e0) < 1.0
+    assert len(out.edge_step) == len(mus)
+    assert_allclose(out.edge_step, dat.edge_step*(1 + 0.02*np.arange(4)),
+                    rtol=2.e-3)
+
+def test_autobk_jacobian():
+    dat, mus = get_spectra(nspec=1)
+    det = dat.autobk_details
+    autobk_mod = sys.modules['larch.xafs.autobk']
+    grid = autobk_mod._autobk_grid(dat.energy, dat.e0, rbkg=1.0)
+    ie0, iemax, nspl = grid.ie0, grid.iemax, grid.nspl
+    model = autobk_mod.AutobkModel(grid.kraw[:iemax-ie0+1], grid.kout,
+                                   det.knots_k, 3, nspl, grid.ftwin,
+                                   grid.irbkg, nclamp=3, clamp_lo=1)
+    mu = dat.mu[ie0:iemax+1]
+    coefs = det.knots_y
+    resid, jac = model.residual(mu, coefs, with_jacobian=True)
+    eps = 1.e-6
+    for i in range(nspl):
+        step = eps*np.eye(nspl)[i]
+        numer = (model.residual(mu, coefs+step) -
+                 model.residual(mu, coefs-step))/(2*eps)
+        assert_allclose(jac[:, i], numer, rtol=1.e-5, atol=1.e-6)
+
+def test_autobk_uncertainties():
+    dat, mus = get_spectra(nspec=1)
+    assert dat.autobk_details.nfev < 20
+    assert len(dat.delta_chi) == len(dat.chi)
+    assert np.all(dat.delta_chi > 0)
+    assert np.all(np.isfinite(dat.delta_bkg))
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+""" Tests of Feff Path sums and Feffit """
+import os
+import glob
+import numpy as np
+from numpy.testing import assert_allclose
+
+from lmfit import Parameters
+
+from larch.io import read_ascii
+from larch.fitting import param_group, guess
+from larch.xafs import (feffpath, ff2chi, autobk, feffit, feffit_transform,
+                        feffit_dataset)
+from larch.xafs.feffdat import FeffPathSet
+from larch.xafs.xafsft import xftf_fast, xftr_fast, ftwindow
+
+TOPDIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+FEFFDIR = os.path.join(TOPDIR, 'examples', 'feffit')
+
+def get_paths(seed=3):
+    files = sorted(glob.glob(os.path.join(FEFFDIR, 'Feff_Cu', 'feff00*.dat')))
+    files.extend(sorted(glob.glob(os.path.join(FEFFDIR, 'Feff_ZnSe', 'feff_zn*.dat'))))
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i, fname in enumerate(files):
+        paths.append(feffpath(fname, label='p%d' % i,
+                              s02=rng.uniform(0.7, 1.1),
+                              e0=float(rng.choice([0.0, 2.5, -3.1])),
+                              sigma2=rng.uniform(0.001, 0.01),
+                              deltar=rng.uniform(-0.05, 0.05),
+                              third=rng.uniform(0, 1.e-3),
+                              fourth=rng.uniform(0, 1.e-4),
+                              ei=rng.uniform(0, 1)))
+    return paths
+
+def test_pathset_matches_calc_chi():
+    paths = get_paths()
+    k = 0.05*np.arange(361)
+    params = Parameters()
+    expected = np.zeros_like(k)
+    path_chis = []
+    for path in paths:
+        path.create_path_params(params=params)
+        path._calc_chi(k=k)
+        path_chis.append(path.chi.copy())
+        expected += path.chi
+
+    pathset = FeffPathSet(paths)
+    pathset.create_path_params(params)
+    for i in range(2):  # second pass uses cached interpolation tables
+        chi = pathset.calc_chi(k=k)
+        assert np.all(chi == expected)
+        for path, path_chi in zip(paths, path_chis):
+            assert np.all(path.chi == path_chi)
+
+def test_pathset_e0_change():
+    paths = get_paths()
+    k = 0.05*np.arange(361)
+    params = Parameters()
+    pathset = FeffPathSet(paths)
+    pathset.create_path_params(params)
+    pathset.calc_chi(k=k)
+    for path in paths:
+        params[path.pathpar_name('e0')].value = 1.5
+    chi = pathset.calc_chi(k=k)
+    expected = np.zeros_like(k)
+    for path in paths:
+        path._calc_chi(k=k)
+        expected += path.chi
+    assert np.all(chi == expected)
+
+def test_ff2chi():
+    paths = get_paths()
+    out = ff2chi(paths, kmax=18)
+    assert len(out.k) == len(out.chi) == 361
+    expected = np.zeros_like(out.k)
+    for path in paths:
+        path._calc_chi(k=out.k)
+        expected += path.chi
+    assert np.all(out.chi == expected)
+
+def test_pathset_jacobian():
+    paths = get_paths()
+    k = 0.05*np.arange(361)
+    params = Parameters()
+    params.add('amp', value=0.9)
+    params.add('de0', value=2.3)
+    params.add('ss', value=0.004)
+    params.add('alpha', value=0.01)
+    params.add('eim', value=0.7)
+    for i, path in enumerate(paths):
+        path.s02 = 'amp'
+        path.e0 = 'de0 + %.1f' % (i/10.)
+        path.sigma2 = 'ss*(1 + reff/5)' if i % 2 else 'ss'
+        path.deltar = 'alpha*reff'
+        path.ei = 'eim'
+    names = ['amp', 'de0', 'ss', 'alpha', 'eim']
+    pathset = FeffPathSet(paths)
+    pathset.create_path_params(params)
+    jac = pathset.calc_jacobian(names, k=k)
+    assert jac.shape == (len(names), len(k))
+    for i, name in enumerate(names):
+        value = params[name].value
+        step = 1.e-6*max(1, abs(value))
+        chis = []
+        for sign in (1, -1):
+            params[name].value = value + sign*step
+            params.update_constraints()
+            chis.append(pathset.calc_chi(k=k))
+        params[name].value = value
+        params.update_constraints()
+        assert_allclose(jac[i], (chis[0]-chis[1])/(2*step),
+                        rtol=1.e-5, atol=1.e-6*abs(jac[i]).max())
+
+def test_feffit_jacobian():
+    data = read_ascii(os.path.join(TOPDIR, 'examples', 'xafsdata', 'cu_10k.xmu'))
+    autobk(data, rbkg=1.0, kweight=2)
+    results = []
+    for dfun in ({}, {'Dfun': None}):
+        pars = param_group(amp=guess(1), del_e0=guess(2.0),
+                           sig2=guess(0.005), alpha=guess(0.0))
+        paths = [feffpath(os.path.join(FEFFDIR, 'Feff_Cu', 'feff%4.4d.dat' % i),
+                          s02='amp', e0='del_e0', sigma2='sig2',
+                          deltar='alpha*reff') for i in (1, 2, 3)]
+        trans = feffit_transform(kmin=3, kmax=17, kw=2, dk=4,
+                                 window='kaiser', rmin=1.4, rmax=3.0)
+        dset = feffit_dataset(data=data, paths=paths, transform=trans)
+        results.append(feffit(pars, dset, **dfun))
+    analytic, numeric = results
+    assert analytic.nfev < numeric.nfev
+    for name in ('amp', 'del_e0', 'sig2', 'alpha'):
+        apar, npar = analytic.params[name], numeric.params[name]
+        assert_allclose(apar.value, npar.value, rtol=1.e-4, atol=1.e-6)
+        assert_allclose(apar.stderr, npar.stderr, rtol=1.e-3)
+
+def test_feffit_workers():
+    data = read_ascii(os.path.join(TOPDIR, 'examples', 'xafsdata', 'cu_10k.xmu'))
+    autobk(data, rbkg=1.0, kweight=2)
+    results = []
+    for workers in (1, 3):
+        pars = param_group(amp=guess(1), sig2=guess(0.005), alpha=guess(0.0),
+                           del_e0=guess(2.0), del_e0b=guess(2.0))
+        dsets = []
+        for e0 in ('del_e0', 'del_e0b'):
+            paths = [feffpath(os.path.join(FEFFDIR, 'Feff_Cu', 'feff%4.4d.dat' % i),
+                              s02='amp', e0=e0, sigma2='sig2',
+                              deltar='alpha*reff') for i in (1, 2, 3)]
+            trans = feffit_transform(kmin=3, kmax=17, kw=2, dk=4,
+                                     window='kaiser', rmin=1.4, rmax=3.0)
+            dsets.append(feffit_dataset(data=data, paths=paths, transform=trans))
+        results.append(feffit(pars, dsets, workers=workers))
+    serial, threaded = results
+    assert serial.nfev == threaded.nfev
+    for name in ('amp', 'sig2', 'alpha', 'del_e0', 'del_e0b'):
+        assert serial.params[name].value == threaded.params[name].value
+        assert serial.params[name].stderr == threaded.params[name].stderr
+    for sds, tds in zip(serial.datasets, threaded.datasets):
+        assert np.all(sds.model.chi == tds.model.chi)
+        for spath, tpath in zip(sds.paths.values(), tds.paths.values()):
+            assert np.all(spath.chi == tpath.chi)
+
+def test_transform_cache():
+    trans = feffit_transform(kmin=3, kmax=17, kw=2, dk=4, window='kaiser',
+                             rmin=1.4, rmax=3.0)
+    chi = np.random.default_rng(7).normal(size=361)
+    for kmin, kweight, window in ((3, 2, 'kaiser'), (5, 2, 'kaiser'),
+                                  (5, 3, 'kaiser'), (5, 3, 'hanning')):
+        trans.kmin, trans.kweight, trans.window = kmin, kweight, window
+        kwin = ftwindow(trans.k_, xmin=kmin, xmax=17, dx=4, window=window)
+        expected = xftf_fast(chi * kwin[:361] * trans.k_[:361]**kweight)
+        chir = trans.fftf(chi)
+        assert_allclose(chir, expected, rtol=1.e-12, atol=1.e-12)
+        assert np.all(trans.kwin == kwin)
+
+    trans.rmax = 4.0
+    rwin = ftwindow(trans.r_, xmin=1.4, xmax=4.0, dx=0, window='hanning')
+    assert_allclose(trans.fftr(chir), xftr_fast(chir*rwin[:len(chir)]),
+                    rtol=1.e-12, atol=1.e-12)
+
+def test_transform_cwt():
+    trans = feffit_transform(kmin=3, kmax=17, kw=2, dk=4, window='kaiser',
+                             rmin=1.4, rmax=3.0, fitspace='w')
+    chi = np.random.default_rng(5).normal(size=361)
+    for rmax in (3.0, 4.0):
+        trans.rmax = rmax
+        out = trans.cwt(chi)
+        # direct calculation, one R value at a time
+        nrpts = int(np.round(rmax/trans.rstep))
+        irmin = int(0.01 + 1.4/trans.rstep)
+        irmax = int(0.01 + rmax/trans.rstep)
+        ikmin, ikmax = int(0.01 + 3/trans.kstep), int(0.01 + 17/trans.kstep)
+        omega = np.pi*np.arange(trans.nfft)/(trans.kstep*trans.nfft)
+        omega[0] = 1.e-19
+        cx = np.zeros(trans.nfft//2)
+        cx[:361] = chi*trans.kwin[:361]*trans.k_[:361]**2
+        ffchi = np.fft.fft(cx, n=2*trans.nfft)[:trans.nfft]
+        csum = np.log(2*np.pi) - np.log(1.0+np.arange(nrpts)).sum()
+        assert out.shape == (irmax-irmin, ikmax-ikmin)
+        for i, ir in enumerate(range(irmin, irmax)):
+            aom = nrpts*omega/(2*ir*trans.rstep)
+            filt = np.exp(csum + nrpts*np.log(aom) - aom)
+            expected = np.fft.ifft(filt*ffchi, 2*trans.nfft)[ikmin:ikmax]
+            assert_allclose(out[i], expected, rtol=1.e-10, atol=1.e-12)
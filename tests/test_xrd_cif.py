@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+""" test XRD structure factors from CIF files"""
+import os
+import numpy as np
+
+from larch.xrd import xrd_cif
+from larch.xrd.cifdb import get_cifdb
+from larch.xrd.xrd_tools import generate_hkl
+from larch.utils.physical_constants import PI
+
+def get_cif(index=0):
+    dbname = os.path.join(os.path.dirname(xrd_cif.__file__), 'amcsd_cif0.db')
+    cifdb = get_cifdb(dbname=dbname)
+    row = cifdb.query(cifdb.ciftbl).all()[index]
+    return xrd_cif.create_xrdcif(text=row.cif)
+
+def test_calc_fhkl():
+    cif = get_cif()
+    elems, uvw = cif.atom_positions()
+    assert len(elems) == len(uvw) > 0
+    hkls = generate_hkl(hmax=4, kmax=4, lmax=4, positive_only=False)
+    fvals = np.linspace(1, 2, len(uvw))[:, None] * np.ones(len(hkls))
+    fhkl = xrd_cif.calc_fhkl(hkls, uvw, fvals, chunksize=100)
+    for i, hkl in enumerate(hkls):
+        fsum = 0.0
+        for j, pos in enumerate(uvw):
+            fsum += fvals[j, i]*np.exp(2*1j*PI*(hkl[0]*pos[0] + hkl[1]*pos[1] + hkl[2]*pos[2]))
+        assert fsum == fhkl[i]
+
+def test_structure_factors():
+    cif = get_cif()
+    sfact = cif.structure_factors(wavelength=1.0, qmin=0.5, qmax=6.0)
+    assert len(sfact.q) > 5
+    assert np.all(np.diff(sfact.q) > 0)
+    assert sfact.q.min() > 0.5 and sfact.q.max() < 6.0
+    assert np.all(sfact.f2hkl > 1.e-4)
+    assert np.all(sfact.hkl >= 0)
+    scale = sfact.intensity/(sfact.degen*sfact.f2hkl*sfact.lorentz)
+    assert np.allclose(scale, scale[0])
+
+    # the calculated q values match those with structure factors
+    qvals = np.array(cif.calc_q(q_min=0.5, q_max=6.0))
+    assert np.all(np.diff(qvals) > 0)
+    assert np.all(np.abs(qvals[:, None] - sfact.q).min(axis=1) < 1.e-6)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+""" test matching q peaks to the CIFs of the AMCSD database"""
+import os
+import numpy as np
+
+from larch.xrd import cifdb as cifdb_mod
+from larch.xrd.cifdb import cifDB, QPeakIndex, qindex_file
+
+def get_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(cifdb_mod, 'QINDEX_DIR', tmp_path.as_posix())
+    return cifDB(dbname='amcsd_cif0.db')
+
+def dense_scores(db, peaks, qstep, qmin=0.2, qmax=10.0):
+    "scores from the dense (CIF x q) matrix"
+    amcsd, qmat = db.match_qc(qmin=qmin, qmax=qmax)
+    qmat = np.array(qmat)
+    imin, imax = 0, len(db.axis)
+    if qmax < max(db.axis): imax = abs(db.axis-qmax).argmin()
+    if qmin > min(db.axis): imin = abs(db.axis-qmin).argmin()
+    qaxis = db.axis[imin:imax]
+    if qstep > qaxis[1]-qaxis[0]:
+        new_qaxis = np.arange(min(qaxis), max(qaxis)+qaxis[1]-qaxis[0], qstep)
+        new_qmat = np.zeros((len(qmat), len(new_qaxis)), dtype=int)
+        for m, n in zip(*np.nonzero(qmat)):
+            new_qmat[m, abs(new_qaxis-qaxis[n]).argmin()] = 1
+        qaxis, qmat = new_qaxis, new_qmat
+    weights = -np.ones(len(qaxis), dtype=int)
+    for p in peaks:
+        weights[abs(qaxis-p).argmin()] = 1
+    total = qmat.sum(axis=1)
+    match = qmat[:, weights > 0].sum(axis=1)
+    return sorted(zip(qmat.dot(weights), amcsd, total, match, total-match), reverse=True)
+
+def test_amcsd_by_q(tmp_path, monkeypatch):
+    db = get_db(tmp_path, monkeypatch)
+    rng = np.random.default_rng(7)
+    for qstep, qmin, qmax in ((0.01, 0.2, 10.0), (0.05, 0.2, 10.0), (0.1, 1.0, 5.5)):
+        for npeaks in (0, 3, 20):
+            peaks = rng.uniform(0.3, 8.0, size=npeaks)
+            assert (db.amcsd_by_q(peaks, qmin=qmin, qmax=qmax, qstep=qstep)
+                    == dense_scores(db, peaks, qstep, qmin=qmin, qmax=qmax))
+
+def test_qindex_file_and_batch(tmp_path, monkeypatch):
+    db = get_db(tmp_path, monkeypatch)
+    qindex = db.get_qindex()
+    fname = qindex_file(db.dbname)
+    assert os.path.exists(fname)
+    assert os.path.dirname(fname) == tmp_path.as_posix()
+    assert QPeakIndex.read(fname, 'other database') is None
+    saved = cifDB(dbname='amcsd_cif0.db').get_qindex()
+    for attr in ('amcsd', 'axis', 'indptr', 'rows'):
+        assert np.array_equal(getattr(saved, attr), getattr(qindex, attr))
+
+    rng = np.random.default_rng(11)
+    patterns = [rng.uniform(0.3, 8.0, size=n) for n in rng.integers(0, 30, size=40)]
+    ids = qindex.amcsd[::3].tolist()
+    for kws in ({}, {'qstep': 0.05, 'list': ids}):
+        best = db.amcsd_by_q_batch(patterns, top=5, **kws)
+        assert len(best) == len(patterns)
+        for peaks, rows in zip(patterns, best):
+            assert rows == db.amcsd_by_q(peaks, **kws)[:5]
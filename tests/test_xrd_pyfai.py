@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+""" test 1D integration of stacks of XRD images with XRDIntegrator"""
+from pathlib import Path
+import numpy as np
+import pytest
+
+pyFAI = pytest.importorskip('pyFAI')
+from pyFAI.azimuthalIntegrator import AzimuthalIntegrator
+from pyFAI.detectors import Detector
+
+from larch.xrd import XRDIntegrator, get_xrd_integrator, integrate_xrd_row
+
+SHAPE = (120, 100)
+
+def make_poni(tmp_path):
+    detector = Detector(pixel1=1.e-4, pixel2=1.e-4, max_shape=SHAPE)
+    ai = AzimuthalIntegrator(dist=0.05, poni1=0.004, poni2=0.006, rot1=0.05,
+                             detector=detector, wavelength=0.6e-10)
+    calfile = Path(tmp_path, 'test.poni').as_posix()
+    ai.save(calfile)
+    return calfile
+
+def test_integrate_stack(tmp_path):
+    calfile = make_poni(tmp_path)
+    rng = np.random.default_rng(3)
+    frames = rng.poisson(40, size=(10,) + SHAPE).astype(np.uint32)
+    mask = np.zeros(SHAPE, dtype=np.int8)
+    mask[:, 40:45] = 1
+
+    ai = pyFAI.load(calfile)
+    for kws in ({}, {'mask': mask, 'wedge_limits': (-90, 45), 'flip': False}):
+        flip = -1 if kws.get('flip', True) else 1
+        attrs = dict(method='csr', unit='q_A^-1', polarization_factor=0.999,
+                     correctSolidAngle=True, mask=kws.get('mask', None),
+                     azimuth_range=kws.get('wedge_limits', None))
+        integrator = XRDIntegrator(calfile, steps=256, **kws)
+        q, counts = integrator.integrate(frames, batchsize=3, workers=2)
+        assert counts.shape == (10, 256)
+        for frame, row in zip(frames, counts):
+            ref_q, ref_i = ai.integrate1d(frame[::flip, :], 256, **attrs)
+            assert np.allclose(q, ref_q)
+            assert np.allclose(row, ref_i, rtol=1.e-5, atol=1.e-6)
+
+        q1, counts1 = integrator.integrate(frames[4])
+        assert np.allclose(counts1, counts[4])
+
+        # the pool of workers is kept for the next stack of images
+        pool = integrator._pool
+        assert pool is not None
+        q2, counts2 = integrator.integrate(frames[::-1], batchsize=3, workers=2)
+        assert integrator._pool is pool
+        assert np.allclose(counts2, counts[::-1])
+        integrator.close()
+        assert integrator._pool is None
+
+    with XRDIntegrator(calfile, steps=256) as integrator:
+        integrator.integrate(frames, batchsize=4, workers=2)
+        assert integrator._pool is not None
+    assert integrator._pool is None
+
+def test_integrate_xrd_row(tmp_path):
+    calfile = make_poni(tmp_path)
+    frames = np.random.default_rng(5).poisson(20, size=(4,) + SHAPE)
+    assert get_xrd_integrator(calfile, steps=128) is get_xrd_integrator(calfile, steps=128)
+    q, counts = integrate_xrd_row(frames, calfile, steps=128)
+    assert q.shape == counts.shape == (4, 128)
+    assert np.allclose(counts, XRDIntegrator(calfile, steps=128).integrate(frames)[1])
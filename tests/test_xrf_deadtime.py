@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+""" test solving for input count rates for deadtime corrections"""
+import numpy as np
+
+from larch.xrf import calc_icr, solve_icr, detector_taus, MCA
+
+def test_solve_icr():
+    rng = np.random.default_rng(2)
+    taus = detector_taus([1.e-7, 2.e-7, 5.e-7], 4)
+    assert np.allclose(taus, [1.e-7, 2.e-7, 5.e-7, 5.e-7])
+    icr = rng.uniform(1.e3, 1.e6, size=(50, 4))
+    ocr = icr*np.exp(-icr*taus)
+    low = icr < 1/taus
+    for method in ('newton', 'lambertw'):
+        out, converged = solve_icr(ocr, taus, method=method)
+        assert out.shape == ocr.shape
+        assert converged[low].all()
+        assert np.allclose(out[low], icr[low], rtol=1.e-5)
+        # above 1/tau, the icr on the low side of the deadtime curve is found
+        upper = converged & ~low
+        assert (out[upper] < (1/taus + 0*ocr)[upper]).all()
+        assert np.allclose((out*np.exp(-out*taus))[converged], ocr[converged], rtol=1.e-5)
+
+    # each value is what calc_icr gives for scalars
+    icr = calc_icr(ocr, taus)
+    for i, j in zip(range(50), [0, 1, 2, 3]*13):
+        val = calc_icr(ocr[i, j], taus[j])
+        assert icr[i, j] == val or (val is None and np.isnan(icr[i, j]))
+
+    ocr = np.array([-1.0, 0.0, 1.e5, 1.e7])
+    icr, converged = solve_icr(ocr, 1.e-6)
+    assert list(converged) == [False, True, True, False]
+    assert icr[1] == 0 and np.isclose(icr[3], 1.e6)
+    assert np.isnan(calc_icr(ocr, 1.e-6)[3])
+    assert calc_icr(-1.0, 1.e-6) is None and calc_icr(1.e7, 1.e-6) is None
+    assert calc_icr(1.e5, 0) == 1.e5
+
+def test_mca_correction():
+    counts = np.ones(2048)*10.0
+    mca = MCA(counts=counts, real_time=1.0, live_time=0.9, tau=2.e-6)
+    ocr = counts.sum()/0.9
+    icr = calc_icr(ocr, 2.e-6)
+    assert np.isclose(icr*np.exp(-icr*2.e-6), ocr)
+    assert np.isclose(mca.dt_factor, (icr/ocr)/0.9)
@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+""" test splitting map areas into rectangles"""
+import numpy as np
+
+from larch.xrmmap.xrm_mapfile import area_rectangles
+
+def test_area_rectangles_cover_area():
+    area = np.zeros((40, 30), dtype=bool)
+    for i in range(40):
+        area[i, (i*3)//4] = True
+    area[5:20, 10:25] = True
+    area[25:31, 2:6] = True
+    area[33, :] = True
+
+    cover = np.zeros(area.shape, dtype=int)
+    for ymin, ymax, xmin, xmax in area_rectangles(area):
+        cover[ymin:ymax, xmin:xmax] += 1
+    assert np.array_equal(cover, area.astype(int))
+
+def test_area_rectangles_merge_rows():
+    area = np.zeros((10, 10), dtype=bool)
+    area[2:8, 3:6] = True
+    assert area_rectangles(area) == [(2, 8, 3, 6)]
+    assert area_rectangles(np.zeros((4, 4), dtype=bool)) == []
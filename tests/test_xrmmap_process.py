@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+""" test building XRF map files from a folder of raw map data"""
+import os
+from pathlib import Path
+import numpy as np
+import h5py
+from scipy.io import netcdf_file
+
+from larch.xrmmap.xrm_mapfile import GSEXRM_MapFile
+
+SCAN_INI = """[general]
+basedir =
+envfile =
+[xps]
+type = NewportXPS
+[scan]
+filename = testmap
+comments =
+dimension = 2
+pos1 = 13XRM:m1
+start1 = 0.0
+stop1 = {stop1:.3f}
+step1 = 0.01
+time1 = 10.0
+pos2 = 13XRM:m2
+start2 = 0.0
+stop2 = 1.0
+step2 = 0.01
+[fast_positioners]
+1 = 13XRM:m1 | Fine X
+2 = 13XRM:m2 | Fine Y
+[slow_positioners]
+1 = 13XRM:m1 | Fine X
+2 = 13XRM:m2 | Fine Y
+"""
+
+ROI_DAT = """[rois]
+roi00 = Fe Ka | 10 20 10 20 11 21 10 20
+roi01 = Zn Ka | 30 45 30 45 30 45 31 46
+[calibration]
+offset = -0.01 -0.01 -0.01 -0.01
+slope = 0.1 0.1 0.1 0.1
+quad = 0.0 0.0 0.0 0.0
+"""
+
+def longs(vals):
+    "int32 values to pairs of 16-bit words, low word first"
+    vals = np.asarray(vals, dtype=np.int64) & 0xffffffff
+    return np.stack([vals & 0xffff, vals >> 16], axis=-1).astype(np.uint16).view(np.int16)
+
+def write_xmap(fname, counts, times):
+    "write xMAP full spectrum buffers for one module of 4 detectors"
+    npix, ndet, nchan = counts.shape
+    modpixs, blocksize = 124, 256 + 4*nchan
+    narrays = -(-npix // modpixs)
+    data = np.zeros((narrays, 1, 256 + modpixs*blocksize), dtype=np.int16)
+    for iarr in range(narrays):
+        pix = slice(iarr*modpixs, min(npix, (iarr+1)*modpixs))
+        nbuff = pix.stop - pix.start
+        buff = data[iarr, 0]
+        buff[0:4] = [0x55aa, 0xaa55, 256, 1]
+        buff[8] = nbuff
+        buff[9:11] = longs(pix.start)
+        buff[20:24] = nchan
+        pixels = buff[256:].reshape(modpixs, blocksize)[:nbuff]
+        pixels[:, 3] = 1
+        pixels[:, 32:64] = longs(times[pix]).reshape(nbuff, 32)
+        pixels[:, 256:] = counts[pix].reshape(nbuff, 4*nchan)
+    with netcdf_file(fname, 'w') as fh:
+        fh.createDimension('narrays', narrays)
+        fh.createDimension('nmodules', 1)
+        fh.createDimension('buffersize', data.shape[2])
+        var = fh.createVariable('array_data', 'h', ('narrays', 'nmodules', 'buffersize'))
+        var[:] = data
+
+def make_map_folder(folder, nrows=6, npts=20, nchan=64, seed=0):
+    """write a folder of raw map data, with xMAP, struck and
+    XPS files for each row"""
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder)
+    for fname, text in (('Scan.ini', SCAN_INI.format(stop1=0.01*(npts-1))),
+                        ('ROI.dat', ROI_DAT),
+                        ('Environ.dat', '; Ring Current (S:SRcurrentAI.VAL) = 102.0\n')):
+        with open(Path(folder, fname), 'w') as fh:
+            fh.write(text)
+
+    master = ['# Scan.version = 2.0', '# Scan.nrows_expected = %d' % nrows,
+              '# ypos  xrf_file  struck_file  xps_file  xrd_file  time']
+    npix = npts + 1
+    for irow in range(nrows):
+        counts = rng.integers(0, 200, size=(npix, 4, nchan)).astype(np.int16)
+        times = np.zeros((npix, 4, 4), dtype=np.int64)
+        times[:, :, 0] = 31250
+        times[:, :, 1] = rng.integers(28000, 31000, size=(npix, 4))
+        times[:, :, 3] = counts.sum(axis=2)
+        times[:, :, 2] = times[:, :, 3]*rng.uniform(1.0, 1.2, size=(npix, 4))
+        xrff, sisf, xpsf = 'xmap.%04d' % irow, 'struck.%04d' % irow, 'xps.%04d' % irow
+        write_xmap(Path(folder, xrff), counts, times)
+        sis = np.column_stack((np.full(npix+1, 1.e5),
+                               rng.integers(1000, 5000, size=(npix+1, 2))))
+        np.savetxt(Path(folder, sisf), sis, fmt='%d',
+                   header='Column.1: TSCALER | 13IDE:scaler1.S1 | \n'
+                   'Column.2: I0 | 13IDE:scaler1.S2 | \n'
+                   'Column.3: I1 | 13IDE:scaler1.S3 | \nTSCALER | I0 | I1')
+        xps = np.column_stack((np.linspace(0, 0.01*npts, npix), np.full(npix, 0.01*irow)))
+        np.savetxt(Path(folder, xpsf), xps, fmt='%.5f', header='X Y')
+        master.append('%.4f %s %s %s _unused_ 1.0' % (0.01*irow, xrff, sisf, xpsf))
+    with open(Path(folder, 'Master.dat'), 'w') as fh:
+        fh.write('\n'.join(master) + '\n')
+
+def process_map(**kws):
+    """process the raw map folder 'raw' in the current folder,
+    returning the full path of the map file"""
+    xrmfile = GSEXRM_MapFile(folder='raw', all_mcas=True)
+    xrmfile.process(**kws)
+    xrmfile.close()
+    return os.path.abspath(xrmfile.filename)
+
+def h5_datasets(fname):
+    "dict of all datasets in an HDF5 file"
+    out = {}
+    with h5py.File(fname, 'r') as h5:
+        h5.visititems(lambda name, obj: out.update({name: obj[()]})
+                      if isinstance(obj, h5py.Dataset) else None)
+    return out
+
+def test_process_workers(tmp_path, monkeypatch):
+    # rows without raw data (rowdata_args returning None) are skipped
+    rowdata_args = GSEXRM_MapFile.rowdata_args
+    def skip_row3(self, irow, offset=None):
+        return None if irow == 3 else rowdata_args(self, irow, offset=offset)
+    monkeypatch.setattr(GSEXRM_MapFile, 'rowdata_args', skip_row3)
+
+    results = []
+    for nworkers in (1, 2):
+        path = Path(tmp_path, 'nworkers%d' % nworkers)
+        make_map_folder(Path(path, 'raw').as_posix(), nrows=7)
+        monkeypatch.chdir(path)
+        fname = process_map(nworkers=nworkers, nrows_buffer=4)
+        results.append(h5_datasets(fname))
+
+    serial, pooled = results
+    assert serial['xrmmap/mcasum/counts'].shape == (6, 20, 64)
+    assert sorted(serial) == sorted(pooled)
+    for name, val in serial.items():
+        assert np.array_equal(val, pooled[name]), name
+
+def test_spectral_index(tmp_path, monkeypatch):
+    make_map_folder(Path(tmp_path, 'raw').as_posix(), nrows=7)
+    monkeypatch.chdir(tmp_path)
+    xrmfile = GSEXRM_MapFile(filename=process_map())
+
+    area = np.zeros((7, 20), dtype=bool)
+    area[1:6, 3:9] = True
+    area[2:7, 12:14] = True
+    area[6, :] = True
+    xrmfile.add_area(area, name='area1')
+
+    rects = [(0, 7, 0, 20), (1, 6, 2, 15), (3, 4, 5, 6),
+             (4, 12, 15, 28), (0, 3, 18, 40), (2, 5, 7, 7)]
+    results = []
+    for blocksize in (None, 2, 3):
+        if blocksize is not None:
+            for det in (None, 2):
+                xrmfile.build_spectral_index(det=det, blocksize=blocksize)
+        out = []
+        for det in (None, 2):
+            for dtcorrect in (False, True):
+                opts = dict(det=det, dtcorrect=dtcorrect)
+                out.append(xrmfile.get_mca_area('area1', **opts).counts)
+                for ymin, ymax, xmin, xmax in rects:
+                    out.append(xrmfile.get_mca_rect(ymin, ymax, xmin, xmax, **opts).counts)
+        results.append(out)
+    assert xrmfile.get_spectral_index(2) is not None
+    xrmfile.close()
+
+    counts, indexed = results[0], results[1:]
+    assert counts[0].sum() > 0
+    for out in indexed:
+        for this, that in zip(out, counts):
+            assert np.allclose(this, that)
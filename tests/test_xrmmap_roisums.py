@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+""" test ROI sums of MCA counts from cumulative sums"""
+import numpy as np
+
+from larch.xrmmap.xrm_mapfile import calc_roi_sums
+
+def test_roi_sums_match_slice_sums():
+    rng = np.random.default_rng(3)
+    counts = rng.integers(0, 2**20, (5, 40, 512)).astype(np.uint32)
+    slices = [slice(10, 50), slice(0, 512), slice(200, 201),
+              slice(300, 300), slice(450, 900), slice(None, 30)]
+    out = calc_roi_sums(counts, slices)
+    assert out.shape == (len(slices), 5, 40)
+    for sl, roi in zip(slices, out):
+        assert np.array_equal(roi, counts[:, :, sl].sum(axis=2))
+
+def test_roi_sums_float_counts():
+    rng = np.random.default_rng(4)
+    counts = 100*rng.random((30, 256))
+    slices = [slice(5, 25), slice(100, 250)]
+    out = calc_roi_sums(counts, slices)
+    for sl, roi in zip(slices, out):
+        assert np.allclose(roi, counts[:, sl].sum(axis=1), rtol=1.e-12)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+""" test writing map rows through a GSEXRM_RowBuffer"""
+import numpy as np
+import h5py
+
+from larch.xrmmap.gsexrm_utils import GSEXRM_RowBuffer
+
+def test_rowbuffer_matches_direct_writes(tmp_path):
+    rng = np.random.default_rng(7)
+    nrows, npts, nchan = 11, 20, 32
+    counts = rng.integers(0, 1000, (nrows, npts, nchan)).astype(np.uint32)
+    dtfact = rng.random((nrows, npts)).astype(np.float32)
+
+    with h5py.File(tmp_path / 'rows.h5', 'w') as h5:
+        for name in ('direct', 'buffered'):
+            grp = h5.create_group(name)
+            grp.create_dataset('counts', (16, npts, nchan), np.uint32,
+                               chunks=(1, npts, nchan), maxshape=(None, npts, nchan))
+            grp.create_dataset('dtfactor', (16, npts), np.float32,
+                               maxshape=(None, npts))
+
+        direct = h5['direct']
+        for irow in range(nrows):
+            # partial rows, as for rows with fewer points than the map
+            n = npts - (irow % 3)
+            direct['counts'][irow, :n, :] = counts[irow, :n, :]
+            direct['dtfactor'][irow, :n] = dtfact[irow, :n]
+
+        buff = GSEXRM_RowBuffer(row0=0, maxrows=4)
+        bcounts = buff.dataset(h5['buffered/counts'])
+        bdtfact = buff.dataset(h5['buffered/dtfactor'])
+        assert bcounts.shape == (16, npts, nchan)
+        for irow in range(nrows):
+            n = npts - (irow % 3)
+            bcounts[irow, :n, :] = counts[irow, :n, :]
+            bdtfact[irow, :n] = dtfact[irow, :n]
+            if buff.full():
+                buff.write()
+        assert buff.row0 == 8
+        assert buff.nrows == 3
+        buff.write()
+        assert buff.row0 == nrows
+
+        for name in ('counts', 'dtfactor'):
+            assert np.array_equal(h5['direct'][name][()], h5['buffered'][name][()])